@@ -23,6 +23,44 @@ class Config:
 
     REDIS_URL = os.getenv("REDIS_URL")
 
+    SCHEDULER_LOCK_KEY = os.getenv("SCHEDULER_LOCK_KEY", "scheduler:leader")
+    SCHEDULER_LOCK_TTL = int(os.getenv("SCHEDULER_LOCK_TTL", 30))
+
+    RECOMMENDER_MODEL_DIR = os.getenv("RECOMMENDER_MODEL_DIR", "data/recommender")
+    RECOMMENDER_RANK = int(os.getenv("RECOMMENDER_RANK", 16))
+    RECOMMENDER_ALS_ITERATIONS = int(os.getenv("RECOMMENDER_ALS_ITERATIONS", 15))
+
+    ANALYTICS_MEMORY_BUDGET_MB = int(os.getenv("ANALYTICS_MEMORY_BUDGET_MB", 256))
+
+    EXPORT_DIR = os.getenv("EXPORT_DIR", "data/exports")
+
+    # local - рассылка WebSocket-событий в пределах процесса, redis - между всеми воркерами через pub/sub
+    REALTIME_BACKPLANE = os.getenv("REALTIME_BACKPLANE", "local")
+    # Очередь исходящих сообщений на подключение и поведение при ее переполнении:
+    # drop_oldest - отбросить самое старое, coalesce - заменять ожидающие обновления той же сущности
+    # (новый кадр встает в конец очереди, номера замененных событий перечислены в его поле superseded),
+    # disconnect - отключить клиента после WS_MAX_OVERFLOWS переполнений
+    WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", 100))
+    WS_OVERFLOW_POLICY = os.getenv("WS_OVERFLOW_POLICY", "coalesce")
+    WS_MAX_OVERFLOWS = int(os.getenv("WS_MAX_OVERFLOWS", 3))
+    WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", 5))
+    # Окно объединения обновлений одной сущности перед рассылкой, мс (0 - отправлять сразу)
+    WS_COALESCE_WINDOW_MS = int(os.getenv("WS_COALESCE_WINDOW_MS", 50))
+    # Журнал событий с номерами для догрузки после переподключения: redis - ограниченный поток Redis,
+    # общий для воркеров, local - память процесса. Размер потока и максимум событий, догружаемых клиенту
+    REALTIME_EVENT_LOG = os.getenv("REALTIME_EVENT_LOG", "redis")
+    REALTIME_STREAM_MAXLEN = int(os.getenv("REALTIME_STREAM_MAXLEN", 10000))
+    REALTIME_REPLAY_LIMIT = int(os.getenv("REALTIME_REPLAY_LIMIT", 1000))
+    # Heartbeat на уровне приложения (кадры ping/pong): интервал и ожидание pong, секунды (0 - выключен).
+    # Оборванные соединения закрывает ping протокола WebSocket (uvicorn, WS_PROTOCOL_PING_* в scripts/start.sh),
+    # а по этому heartbeat отключаются только клиенты, которые на него уже отвечали.
+    # Отключение сессий без сообщений клиента дольше WS_IDLE_TIMEOUT секунд (0 - не отключать)
+    # и предел одновременных сессий пользователя
+    WS_PING_INTERVAL = float(os.getenv("WS_PING_INTERVAL", 0))
+    WS_PONG_TIMEOUT = float(os.getenv("WS_PONG_TIMEOUT", 10))
+    WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", 0))
+    WS_MAX_SESSIONS_PER_USER = int(os.getenv("WS_MAX_SESSIONS_PER_USER", 5))
+
     DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     
     @classmethod
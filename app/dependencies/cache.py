@@ -25,7 +25,7 @@ class CacheManager:
             return json.loads(cached)
         return None
     
-    async def set_cached(self, key: str, data: Any, ttl: int = 3600):
+    async def set_cached(self, key: str, data: Any, ttl: int | None = 3600):
         try:
             serialized_data = json.dumps(data, cls=JSONEncoder, ensure_ascii=False)
             await self.redis.set(key, serialized_data, ex=ttl)
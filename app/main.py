@@ -9,7 +9,7 @@ from app.realtime.websocket_manager import manager
 from app.realtime.events import handle_event
 from jose import JWTError, jwt
 
-from app.routers import users, auth, menu, orders, reviews, shifts, ingredients, booking, recommendations, statistics
+from app.routers import users, auth, menu, orders, reviews, shifts, ingredients, booking, recommendations, statistics, monitoring, exports
 
 from app.config import Config
 
@@ -18,10 +18,11 @@ import os
 if os.getenv("TESTING"):
     scheduler = None
 else:
-    from app.scheduler.scheduler import schedule_booking_updater, start_scheduler, scheduler
+    from app.scheduler.scheduler import schedule_booking_updater, schedule_popularity_rebuild, schedule_recommender_training, schedule_staff_stats_backfill, schedule_eta_refresh, schedule_export_cleanup, start_scheduler, stop_scheduler, scheduler
 
 
-# Планировщик завершения бронирований по итсечении времени
+# Планировщик завершения бронирований по итсечении времени.
+# Задачи выполняются только в воркере, удерживающем блокировку лидера в Redis
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("[LIFESPAN] Запуск планировщика")
@@ -30,13 +31,32 @@ async def lifespan(app: FastAPI):
     print("[LIFESPAN] Планирование задачи обновления бронирований")
     schedule_booking_updater()
 
+    print("[LIFESPAN] Планирование пересборки счетчиков популярности")
+    schedule_popularity_rebuild()
+
+    print("[LIFESPAN] Планирование обучения модели персональных рекомендаций")
+    schedule_recommender_training()
+
+    print("[LIFESPAN] Планирование догрузки дневной статистики персонала")
+    schedule_staff_stats_backfill()
+
+    print("[LIFESPAN] Планирование пересчета параметров оценки готовности заказов")
+    schedule_eta_refresh()
+
+    print("[LIFESPAN] Планирование удаления файлов истекших выгрузок")
+    schedule_export_cleanup()
+
+    print("[LIFESPAN] Подключение шины рассылки WebSocket-событий")
+    await manager.start()
+
     try:
         print("[LIFESPAN] Передача управления")
         yield
     finally:
+        await manager.stop()
         print("[LIFESPAN] Остановка планировщика")
         if scheduler:
-            scheduler.shutdown(wait=False)
+            await stop_scheduler()
 
 app = FastAPI(docs_url=None, redoc_url=None, openapi_url=None, lifespan=lifespan)
 
@@ -71,6 +91,8 @@ app.include_router(shifts.router)
 app.include_router(booking.router)
 app.include_router(recommendations.router)
 app.include_router(statistics.router)
+app.include_router(monitoring.router)
+app.include_router(exports.router)
 
 #Проверка токенов
 async def verify_websocket_token(token: str):
@@ -88,6 +110,7 @@ async def verify_websocket_token(token: str):
 async def websocket_endpoint(websocket: WebSocket, client_id: str):
     await websocket.accept()
 
+    session = None
     try:
         init_msg = await websocket.receive_json()
         token = init_msg.get("token")
@@ -104,14 +127,18 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
             await websocket.close(code=1008)
             return
         
-        await manager.connect(client_id, websocket, user_data["role"])
+        session = await manager.connect(client_id, websocket, user_data["role"])
 
         while True:
             data = await websocket.receive_json()
-            await handle_event(client_id, data)
+            await handle_event(client_id, data, session)
 
     except WebSocketDisconnect:
-        await manager.disconnect(client_id)
+        pass
+    finally:
+        # Удаляется только сессия этого сокета, остальные сессии пользователя продолжают получать события
+        if session is not None:
+            await manager.disconnect(session.session_id)
 
 # health-check
 @app.get("/health")
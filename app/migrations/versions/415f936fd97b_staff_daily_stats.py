@@ -0,0 +1,40 @@
+"""Staff daily stats rollup
+
+Revision ID: 415f936fd97b
+Revises: 1fc7ee2f3a88
+Create Date: 2026-10-19 10:12:41.503218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '415f936fd97b'
+down_revision: Union[str, Sequence[str], None] = '1fc7ee2f3a88'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('staff_daily_stats',
+    sa.Column('stat_date', sa.Date(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('role', postgresql.ENUM('WAITER', 'COOK', 'BARKEEPER', name='staffrole', create_type=False), nullable=False),
+    sa.Column('assigned_count', sa.Integer(), nullable=False),
+    sa.Column('ready_count', sa.Integer(), nullable=False),
+    sa.Column('completed_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('stat_date', 'user_id', 'role')
+    )
+    op.create_index('ix_orders_order_date', 'orders', ['order_date'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_orders_order_date', table_name='orders')
+    op.drop_table('staff_daily_stats')
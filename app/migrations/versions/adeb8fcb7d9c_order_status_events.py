@@ -0,0 +1,50 @@
+"""Order status events
+
+Revision ID: adeb8fcb7d9c
+Revises: 415f936fd97b
+Create Date: 2026-10-19 11:02:17.318402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'adeb8fcb7d9c'
+down_revision: Union[str, Sequence[str], None] = '415f936fd97b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    order_status = postgresql.ENUM('PENDING', 'IN_PROGRESS', 'READY', 'COMPLETED', 'CANCELLED', name='orderstatus', create_type=False)
+    op.create_table('order_status_events',
+    sa.Column('event_id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('order_item_id', sa.Integer(), nullable=True),
+    sa.Column('previous_status', order_status, nullable=True),
+    sa.Column('status', order_status, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.TIMESTAMP(), nullable=False),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.order_id'], ),
+    sa.ForeignKeyConstraint(['order_item_id'], ['order_items.order_item_id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('event_id')
+    )
+    op.create_index(op.f('ix_order_status_events_event_id'), 'order_status_events', ['event_id'], unique=False)
+    op.create_index(op.f('ix_order_status_events_order_id'), 'order_status_events', ['order_id'], unique=False)
+    op.create_index(op.f('ix_order_status_events_order_item_id'), 'order_status_events', ['order_item_id'], unique=False)
+    op.create_index(op.f('ix_order_status_events_created_at'), 'order_status_events', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_order_status_events_created_at'), table_name='order_status_events')
+    op.drop_index(op.f('ix_order_status_events_order_item_id'), table_name='order_status_events')
+    op.drop_index(op.f('ix_order_status_events_order_id'), table_name='order_status_events')
+    op.drop_index(op.f('ix_order_status_events_event_id'), table_name='order_status_events')
+    op.drop_table('order_status_events')
@@ -0,0 +1,28 @@
+"""Ingredient unit cost
+
+Revision ID: c41d7e9a2b58
+Revises: adeb8fcb7d9c
+Create Date: 2026-10-19 12:20:44.901377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41d7e9a2b58'
+down_revision: Union[str, Sequence[str], None] = 'adeb8fcb7d9c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('ingredients', sa.Column('unit_cost', sa.Numeric(precision=10, scale=4), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('ingredients', 'unit_cost')
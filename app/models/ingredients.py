@@ -9,4 +9,5 @@ class Ingredient(Base):
     name = Column(String, nullable=False)
     unit = Column(String, nullable=False)
     quantity = Column(Numeric, nullable=False)
-    threshold = Column(Numeric, nullable=False)
\ No newline at end of file
+    threshold = Column(Numeric, nullable=False)
+    unit_cost = Column(Numeric(10, 4), nullable=True)
\ No newline at end of file
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, ForeignKey, Integer, TIMESTAMP
+from sqlalchemy import Enum as SQLEnum
+from datetime import datetime
+
+from app.database import Base
+from app.models.orders import OrderStatus
+
+# Журнал смен статусов заказов и позиций заказа (только добавление).
+# Статусы позиций совпадают с частью статусов заказа, поэтому используется один тип
+class OrderStatusEvent(Base):
+    __tablename__ = "order_status_events"
+
+    event_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    order_id = Column(Integer, ForeignKey('orders.order_id'), nullable=False, index=True)
+    order_item_id = Column(Integer, ForeignKey('order_items.order_item_id'), nullable=True, index=True)
+    previous_status = Column(SQLEnum(OrderStatus), nullable=True)
+    status = Column(SQLEnum(OrderStatus), nullable=False)
+    user_id = Column(Integer, ForeignKey('users.user_id'), nullable=True)
+    created_at = Column(TIMESTAMP, default=datetime.now, nullable=False, index=True)
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Date, ForeignKey, Integer
+from sqlalchemy import Enum as SQLEnum
+
+from app.database import Base
+from app.models.order_assignments import StaffRole
+
+class StaffDailyStats(Base):
+    __tablename__ = "staff_daily_stats"
+
+    stat_date = Column(Date, primary_key=True, nullable=False)
+    user_id = Column(Integer, ForeignKey('users.user_id'), primary_key=True, nullable=False)
+    role = Column(SQLEnum(StaffRole), primary_key=True, nullable=False)
+    assigned_count = Column(Integer, nullable=False, default=0)
+    ready_count = Column(Integer, nullable=False, default=0)
+    completed_count = Column(Integer, nullable=False, default=0)
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, Date, Time, ForeignKey, CheckConstraint
+from sqlalchemy import Column, Integer, Date, Time, ForeignKey, CheckConstraint, and_
 from sqlalchemy.ext.hybrid import hybrid_method, hybrid_property
 
 from app.database import Base
@@ -28,6 +28,11 @@ class StaffShift(Base):
         
         return (self.shift_date == today and 
                 self.shift_start <= current_time <= self.shift_end)
+
+    @is_active.expression
+    def is_active(cls):
+        now = datetime.now()
+        return and_(cls.shift_date == now.date(), cls.shift_start <= now.time(), cls.shift_end >= now.time())
     
     @hybrid_property
     def is_future(self):
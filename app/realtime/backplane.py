@@ -0,0 +1,93 @@
+import asyncio
+import json
+import os
+import socket
+import uuid
+from typing import Awaitable, Callable, Optional
+
+import redis.asyncio as redis
+
+from app.config import Config
+
+CHANNEL = "realtime:events"
+RECONNECT_DELAY = 1
+
+Deliver = Callable[[dict], Awaitable[None]]
+
+class LocalBackplane:
+    """Рассылка в пределах одного процесса: события доставляются только локальным сокетам"""
+
+    async def start(self, deliver: Deliver) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def publish(self, envelope: dict) -> None:
+        pass
+
+class RedisBackplane:
+    """Рассылка между воркерами через pub/sub Redis.
+
+    Воркер-отправитель доставляет событие своим сокетам сразу, остальные получают его из канала;
+    собственные сообщения, вернувшиеся из канала, пропускаются по метке origin.
+    """
+
+    def __init__(self, url: str, channel: str = CHANNEL):
+        self.url = url
+        self.channel = channel
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._redis: Optional[redis.Redis] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Deliver) -> None:
+        if self._task is None:
+            self._redis = redis.from_url(self.url, decode_responses=True)
+            self._task = asyncio.get_running_loop().create_task(self._listen(deliver))
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._redis:
+            await self._redis.aclose()
+            self._redis = None
+
+    async def publish(self, envelope: dict) -> None:
+        if self._redis is None:
+            return
+        try:
+            await self._redis.publish(self.channel, json.dumps({**envelope, "origin": self.origin}, ensure_ascii=False))
+        except Exception as e:
+            # Локальные сокеты уже получили событие, теряется только доставка в другие воркеры
+            print(f"[BACKPLANE Error] Не удалось опубликовать событие: {e}")
+
+    async def _listen(self, deliver: Deliver) -> None:
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                print(f"[BACKPLANE] {self.origin} подписан на канал {self.channel}")
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    envelope = json.loads(message["data"])
+                    if envelope.pop("origin", None) == self.origin:
+                        continue
+                    await deliver(envelope)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[BACKPLANE Error] {e}")
+                await asyncio.sleep(RECONNECT_DELAY)
+            finally:
+                await pubsub.aclose()
+
+def create_backplane() -> LocalBackplane | RedisBackplane:
+    if Config.REALTIME_BACKPLANE == "redis":
+        return RedisBackplane(Config.REDIS_URL)
+    return LocalBackplane()
@@ -0,0 +1,144 @@
+import asyncio
+from typing import Awaitable, Callable
+
+from app.realtime.connection import event_entity
+from app.realtime.deltas import combine_events
+
+Emit = Callable[..., Awaitable[None]]
+
+def coalesce_key(message: dict) -> str | None:
+    """Сущность события в окне объединения: семейство по префиксу типа и сущность (event_entity).
+
+    Позиции заказа относятся к заказу, а события разных типов одного семейства делят ключ, поскольку окно
+    сворачивает их в одно событие заказа; очередь подключения (entity_key) различает типы и позиции.
+    """
+    entity = event_entity(message, items_as_order=True)
+    if entity is None:
+        return None
+    family = str(message.get("type", "")).split("_")[0]
+    return f"{family}:{entity}"
+
+def _route_key(route: dict) -> tuple:
+    return tuple((name, tuple(value) if isinstance(value, list) else value) for name, value in sorted(route.items()))
+
+def _covers(route: dict, item_route: dict) -> bool:
+    """Получают ли все адресаты события позиции и событие заказа: тот же маршрут или темы позиции входят в темы заказа"""
+    if route == item_route:
+        return True
+    topics, item_topics = route.get("topics"), item_route.get("topics")
+    return topics is not None and item_topics is not None and set(item_topics) <= set(topics)
+
+class _Pending:
+    """Накопленные за окно события одной сущности; события с разными адресатами хранятся раздельно"""
+
+    def __init__(self):
+        # Маршрут -> [последнее событие, маршрут, порядковый номер]
+        self.messages: dict[tuple, list] = {}
+        # Маршрут -> (order_id, {order_item_id: (порядковый номер, последнее состояние позиции)})
+        self.items: dict[tuple, tuple[int, dict[int, tuple[int, dict]]]] = {}
+        self.routes: dict[tuple, dict] = {}
+        self.count = 0
+
+class EventCoalescer:
+    """Объединение всплесков обновлений одной сущности в пределах окна.
+
+    Обновления (action=update) одной сущности с одними и теми же адресатами, пришедшие за окно, уходят одним
+    кадром с последним состоянием; последовательные дельты заказа (action=delta) складываются в одну дельту.
+    Обновления позиций заказа, пришедшие до события заказа в том же окне, сворачиваются в него, если событие
+    заказа получают все их адресаты (перечень измененных позиций - в changed_items), остальные - в один кадр
+    order_items_update на маршрут. Остальные события
+    отправляются сразу, предварительно сбросив накопленное по той же сущности, чтобы не нарушить порядок.
+    """
+
+    def __init__(self, window: float, emit: Emit):
+        self.window = window
+        self.emit = emit
+        self.merged = 0
+        self._pending: dict[str, _Pending] = {}
+        self._timers: dict[str, asyncio.TimerHandle] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, message: dict, **route) -> None:
+        key = coalesce_key(message)
+        payload = message.get("payload")
+        if self.window <= 0 or key is None or not isinstance(payload, dict) or payload.get("action") not in ("update", "delta"):
+            if key is not None and key in self._pending:
+                await self._flush(key)
+            await self.emit(message, **route)
+            return
+
+        pending = self._pending.get(key)
+        route_key = _route_key(route)
+        is_item = message.get("type") == "order_item_update" and payload.get("order_item_id") is not None
+        if pending is not None and not is_item and route_key in pending.messages:
+            combined = combine_events(pending.messages[route_key][0], message)
+            if combined is None:
+                # Дельта не продолжает накопленную версию: накопленное уходит отдельно
+                await self._flush(key)
+                pending = None
+            else:
+                message = combined
+        if pending is None:
+            pending = self._pending[key] = _Pending()
+            self._timers[key] = asyncio.get_running_loop().call_later(self.window, self._schedule_flush, key)
+        pending.count += 1
+
+        if is_item:
+            order_id, items = pending.items.setdefault(route_key, (payload.get("order_id"), {}))
+            state = {field: value for field, value in payload.items() if field not in ("action", "order_id")}
+            items[payload["order_item_id"]] = (pending.count, state)
+            pending.routes[route_key] = route
+        else:
+            pending.messages[route_key] = [message, route, pending.count]
+
+    def _schedule_flush(self, key: str) -> None:
+        task = asyncio.get_running_loop().create_task(self._flush(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self, key: str) -> None:
+        pending = self._pending.pop(key, None)
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        if pending is None:
+            return
+
+        frames = []
+        folded_items: dict[tuple, set[int]] = {}
+        for message, route, seq in pending.messages.values():
+            if message.get("type") in ("order_update", "order_delta"):
+                # Снимок или дельта заказа уже содержит позиции, измененные до него
+                folded = set()
+                for route_key, (_, items) in pending.items.items():
+                    if _covers(route, pending.routes[route_key]):
+                        earlier = {item_id for item_id, (item_seq, _) in items.items() if item_seq < seq}
+                        folded |= earlier
+                        folded_items.setdefault(route_key, set()).update(earlier)
+                message = {**message, "payload": {**message["payload"], "changed_items": sorted(folded)}}
+            frames.append((message, route))
+        for route_key, item_ids in folded_items.items():
+            for item_id in item_ids:
+                del pending.items[route_key][1][item_id]
+
+        for route_key, (order_id, items) in pending.items.items():
+            if not items:
+                continue
+            if len(items) == 1:
+                (item_id, (_, item)), = items.items()
+                message = {"type": "order_item_update", "payload": {"action": "update", "order_id": order_id, "order_item_id": item_id, **item}}
+            else:
+                message = {"type": "order_items_update", "payload": {
+                    "action": "update",
+                    "order_id": order_id,
+                    "items": [{"order_item_id": item_id, **item} for item_id, (_, item) in items.items()],
+                }}
+            frames.append((message, pending.routes[route_key]))
+
+        self.merged += pending.count - len(frames)
+        for message, route in frames:
+            await self.emit(message, **route)
+
+    async def flush_all(self) -> None:
+        for key in list(self._pending):
+            await self._flush(key)
@@ -0,0 +1,180 @@
+import asyncio
+import time
+import uuid
+from collections import Counter, deque
+from enum import Enum
+from typing import Awaitable, Callable, Optional
+
+from fastapi import WebSocket
+
+from app.realtime.event_log import with_superseded
+
+class OverflowPolicy(str, Enum):
+    DROP_OLDEST = "drop_oldest"
+    COALESCE = "coalesce"
+    DISCONNECT = "disconnect"
+
+# Поля полезной нагрузки, по которым определяется сущность события, в порядке приоритета
+ENTITY_FIELDS = ("order_item_id", "order_id", "booking_id", "shift_id", "item_id")
+
+def event_entity(message: dict, items_as_order: bool = False) -> str | None:
+    """Сущность события ("<поле>:<идентификатор>") по полезной нагрузке и вложенным в нее объектам.
+
+    Единственное определение сущности для окна объединения (coalesce_key) и очереди подключения (entity_key);
+    items_as_order=True относит позицию заказа к самому заказу.
+    """
+    payload = message.get("payload")
+    if not isinstance(payload, dict):
+        return None
+    fields = ENTITY_FIELDS[1:] if items_as_order else ENTITY_FIELDS
+    for source in (payload, *(value for value in payload.values() if isinstance(value, dict))):
+        for field in fields:
+            if source.get(field) is not None:
+                return f"{field}:{source[field]}"
+    return None
+
+def entity_key(message: dict) -> str | None:
+    """Ключ замены в очереди подключения для событий-снимков (action=update): более новое событие заменяет старое.
+
+    Заменяются только кадры того же типа: снимок заказа и пакет его позиций (order_items_update) не взаимозаменяемы.
+    """
+    payload = message.get("payload")
+    if not isinstance(payload, dict) or payload.get("action") != "update":
+        return None
+    entity = event_entity(message)
+    return f"{message.get('type')}:{entity}" if entity is not None else None
+
+class Connection:
+    """WebSocket-подключение с ограниченной очередью готовых текстовых кадров и собственной задачей записи.
+
+    Рассылка только кладет сообщение в очередь, поэтому медленный клиент не задерживает остальных.
+    """
+
+    def __init__(
+        self,
+        client_id: str,
+        websocket: WebSocket,
+        role: str,
+        counters: Counter,
+        queue_size: int,
+        policy: OverflowPolicy,
+        max_overflows: int,
+        send_timeout: float,
+        on_failed: Callable[["Connection", str], Awaitable[None]] | None = None
+    ):
+        self.session_id = uuid.uuid4().hex
+        self.client_id = client_id
+        self.websocket = websocket
+        self.role = role
+        self.counters = counters
+        self.queue_size = queue_size
+        self.policy = policy
+        self.max_overflows = max_overflows
+        self.send_timeout = send_timeout
+        self.on_failed = on_failed
+        self.topics: set[str] = set()
+        # Время подключения, последнего входящего сообщения (включая pong) и последнего сообщения не-heartbeat
+        self.connected_at = self.last_seen = self.last_active = time.monotonic()
+        # Клиент поддерживает heartbeat приложения: ответил хотя бы на один ping
+        self.answers_ping = False
+        self.queue: deque[list] = deque()
+        self.overflows = 0
+        self.closed = False
+        self._pending: dict[str, list] = {}
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._fail_task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._write_loop())
+
+    async def close(self) -> None:
+        self.closed = True
+        if self._task and self._task is not asyncio.current_task():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self.queue.clear()
+        self._pending.clear()
+
+    def mark_received(self, heartbeat: bool = False) -> None:
+        self.last_seen = time.monotonic()
+        if heartbeat:
+            self.answers_ping = True
+        else:
+            self.last_active = self.last_seen
+
+    def enqueue(self, frame: str, key: str | None = None, seq: int | None = None) -> None:
+        if self.closed:
+            return
+        if self.policy == OverflowPolicy.COALESCE and key is not None:
+            entry = self._pending.get(key)
+            if entry is not None:
+                self.counters["coalesced"] += 1
+                if seq is None and entry[2] is None:
+                    entry[1] = frame
+                    return
+                # Кадр с номером не занимает место замененного: номера уходят клиенту по возрастанию,
+                # а пропущенные номера перечислены в superseded, чтобы клиент не запрашивал их догрузку
+                self.queue.remove(entry)
+                superseded = entry[3] + ([entry[2]] if entry[2] is not None else [])
+                if seq is not None and superseded:
+                    frame = with_superseded(frame, superseded)
+                entry = [key, frame, seq, superseded]
+                self.queue.append(entry)
+                self._pending[key] = entry
+                self._ready.set()
+                return
+
+        if len(self.queue) >= self.queue_size:
+            self.overflows += 1
+            self.counters["overflows"] += 1
+            if self.policy == OverflowPolicy.DISCONNECT and self.overflows >= self.max_overflows:
+                self.counters["dropped"] += len(self.queue) + 1
+                self._fail(f"очередь переполнена {self.overflows} раз")
+                return
+            dropped = self.queue.popleft()
+            self._forget(dropped)
+            self.counters["dropped"] += 1
+
+        # Ключ замены, кадр, номер события и номера замененных им событий
+        entry = [key, frame, seq, []]
+        self.queue.append(entry)
+        if key is not None:
+            self._pending[key] = entry
+        self._ready.set()
+
+    def _forget(self, entry: list) -> None:
+        if entry[0] is not None and self._pending.get(entry[0]) is entry:
+            del self._pending[entry[0]]
+
+    def _fail(self, reason: str) -> None:
+        if self._fail_task is not None:
+            return
+        self.closed = True
+        self.counters["disconnected"] += 1
+        if self.on_failed:
+            self._fail_task = asyncio.get_running_loop().create_task(self.on_failed(self, reason))
+
+    async def _write_loop(self) -> None:
+        while not self.closed:
+            if not self.queue:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            entry = self.queue.popleft()
+            self._forget(entry)
+            try:
+                # asyncio.timeout, а не wait_for: в 3.11 wait_for может поглотить отмену задачи записи
+                async with asyncio.timeout(self.send_timeout):
+                    await self.websocket.send_text(entry[1])
+                self.counters["sent"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[WebSocket] Ошибка отправки пользователю {self.client_id} (сессия {self.session_id}): {e!r}")
+                self._fail(f"ошибка отправки: {e!r}")
@@ -0,0 +1,134 @@
+import json
+from typing import Iterable
+
+from fastapi.encoders import jsonable_encoder
+from redis.asyncio import Redis
+
+# Версия и последний разосланный снимок заказа хранятся в Redis и общие для всех воркеров
+ORDER_VERSION_KEY = "realtime:order:{order_id}"
+ORDER_VERSION_TTL = 86400
+MAX_RESYNC_ORDERS = 200
+
+def order_version_key(order_id: int) -> str:
+    return ORDER_VERSION_KEY.format(order_id=order_id)
+
+def diff_order(previous: dict, current: dict) -> dict:
+    """Изменившиеся поля заказа и его позиций (позиции - по order_item_id); новые позиции передаются целиком"""
+    changes = {field: value for field, value in current.items() if field != "items" and previous.get(field) != value}
+    previous_items = {str(item["order_item_id"]): item for item in previous.get("items", [])}
+    items = {}
+    for item in current.get("items", []):
+        item_id = str(item["order_item_id"])
+        before = previous_items.pop(item_id, None)
+        changed = item if before is None else {field: value for field, value in item.items() if before.get(field) != value}
+        if changed:
+            items[item_id] = changed
+    delta = {"changes": changes, "items": items}
+    if previous_items:
+        delta["removed_items"] = sorted(int(item_id) for item_id in previous_items)
+    return delta
+
+def merge_deltas(first: dict, second: dict) -> dict:
+    """Одна дельта вместо двух последовательных (second.base_version == first.version)"""
+    items = {item_id: dict(fields) for item_id, fields in first["items"].items()}
+    for item_id, fields in second["items"].items():
+        items[item_id] = {**items.get(item_id, {}), **fields}
+    removed = set(first.get("removed_items", [])) | set(second.get("removed_items", []))
+    for item_id in removed:
+        items.pop(str(item_id), None)
+    merged = {**second, "base_version": first["base_version"], "changes": {**first["changes"], **second["changes"]}, "items": items}
+    if removed:
+        merged["removed_items"] = sorted(removed)
+    return merged
+
+def apply_delta(order: dict, delta: dict) -> dict:
+    """Снимок заказа после применения дельты"""
+    removed = {str(item_id) for item_id in delta.get("removed_items", [])}
+    pending = dict(delta["items"])
+    items = []
+    for item in order.get("items", []):
+        item_id = str(item["order_item_id"])
+        if item_id not in removed:
+            items.append({**item, **pending.pop(item_id, {})})
+    items.extend(pending.values())
+    return {**order, **delta["changes"], "items": items}
+
+def combine_events(previous: dict, message: dict) -> dict | None:
+    """Событие, заменяющее два последовательных события одной сущности.
+
+    None - если дельта не продолжает версию предыдущего события и накопленное нужно отправить отдельно.
+    """
+    if message.get("type") != "order_delta":
+        return message
+    held, delta = previous["payload"], message["payload"]
+    if held.get("version") != delta["base_version"]:
+        return None
+    if previous.get("type") == "order_delta":
+        return {**message, "payload": merge_deltas(held, delta)}
+    if previous.get("type") == "order_update" and isinstance(held.get("order"), dict):
+        return {**previous, "payload": {**held, "version": delta["version"], "order": apply_delta(held["order"], delta)}}
+    return None
+
+async def record_order(redis: Redis, order: dict) -> tuple[int, dict, dict | None]:
+    """Новая версия заказа (словарь OrderOut): номер версии, снимок в JSON-представлении и предыдущий снимок.
+
+    Чтение предыдущего снимка и запись нового выполняются в одной транзакции, поэтому дельта версии N
+    всегда строится от снимка версии N-1, даже если заказ одновременно меняют несколько воркеров.
+    """
+    snapshot = jsonable_encoder(order)
+    key = order_version_key(snapshot["order_id"])
+    pipe = redis.pipeline(transaction=True)
+    pipe.hget(key, "snapshot")
+    pipe.hincrby(key, "version", 1)
+    pipe.hset(key, "snapshot", json.dumps(snapshot, ensure_ascii=False))
+    pipe.expire(key, ORDER_VERSION_TTL)
+    previous, version, _, _ = await pipe.execute()
+    return version, snapshot, json.loads(previous) if previous else None
+
+async def order_created(redis: Redis, order: dict) -> dict:
+    version, snapshot, _ = await record_order(redis, order)
+    return {"type": "order_create", "payload": {"action": "create", "version": version, "order": snapshot}}
+
+async def order_changed(redis: Redis, order: dict) -> dict:
+    """Событие изменения заказа: дельта к предыдущей версии или полный снимок, если предыдущей версии нет"""
+    version, snapshot, previous = await record_order(redis, order)
+    if previous is None:
+        return {"type": "order_update", "payload": {"action": "update", "version": version, "order": snapshot}}
+    return {"type": "order_delta", "payload": {
+        "action": "delta",
+        "order_id": snapshot["order_id"],
+        "base_version": version - 1,
+        "version": version,
+        **diff_order(previous, snapshot),
+    }}
+
+async def forget_order(redis: Redis, order_id: int) -> None:
+    await redis.delete(order_version_key(order_id))
+
+async def stored_snapshots(redis: Redis, order_ids: Iterable[int]) -> dict[int, dict]:
+    """Сохраненные снимки заказов с версиями: {order_id: {"version": ..., "order": ...}}"""
+    order_ids = list(dict.fromkeys(order_ids))
+    pipe = redis.pipeline(transaction=False)
+    for order_id in order_ids:
+        pipe.hmget(order_version_key(order_id), "version", "snapshot")
+    snapshots = {}
+    for order_id, (version, snapshot) in zip(order_ids, await pipe.execute()):
+        if version is not None and snapshot is not None:
+            snapshots[order_id] = {"version": int(version), "order": json.loads(snapshot)}
+    return snapshots
+
+async def order_snapshots(redis: Redis, orders: list[dict]) -> list[dict]:
+    """Полные снимки для пересинхронизации клиента.
+
+    Если версия заказа сохранена, отдается ее снимок: он согласован с номером версии, и следующие дельты
+    к нему применимы. Заказы без сохраненной версии получают ее сейчас.
+    """
+    stored = await stored_snapshots(redis, [order["order_id"] for order in orders])
+    snapshots = []
+    for order in orders:
+        snapshot = stored.get(order["order_id"])
+        if snapshot is None:
+            version, order_json, _ = await record_order(redis, order)
+            snapshot = {"version": version, "order": order_json}
+        snapshots.append(snapshot)
+    return snapshots
@@ -0,0 +1,125 @@
+import json
+from collections import deque
+from typing import Optional
+
+import redis.asyncio as redis
+
+from app.config import Config
+
+SEQUENCE_KEY = "realtime:seq"
+STREAM_KEY = "realtime:stream"
+
+# Номер выдается и запись в поток добавляется одним скриптом, поэтому порядок записей в потоке совпадает
+# с порядком номеров даже при нескольких воркерах; id записи - "<номер>-0"
+APPEND_SCRIPT = """
+local seq = redis.call('INCR', KEYS[1])
+local frame = '{"seq":' .. seq .. ',' .. string.sub(ARGV[1], 2)
+redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[3], seq .. '-0', 'frame', frame, 'route', ARGV[2])
+return seq
+"""
+
+# (номер, маршрут события, готовый кадр)
+Entry = tuple[int, dict, str]
+
+def with_sequence(frame: str, seq: int) -> str:
+    """Кадр с номером события первым полем; совпадает с кадром, который скрипт записывает в поток"""
+    return f'{{"seq":{seq},{frame[1:]}'
+
+def with_superseded(frame: str, superseded: list[int]) -> str:
+    """Кадр с перечнем номеров событий, которые он заменил в очереди подключения (сразу после номера)"""
+    position = frame.index(",") + 1
+    return f'{frame[:position]}"superseded":{json.dumps(superseded)},{frame[position:]}'
+
+def _check_replay(last_seq: int, current: int, entries: list[Entry], limit: int) -> list[Entry] | None:
+    if last_seq > current:
+        # Клиент помнит номер больше выданного: счетчик был сброшен
+        return None
+    if last_seq == current:
+        return []
+    if len(entries) > limit or not entries or entries[0][0] != last_seq + 1:
+        # Клиент отстал сильнее, чем хранит поток, или больше лимита догрузки
+        return None
+    return entries
+
+class LocalEventLog:
+    """Журнал событий в памяти процесса: для одного воркера и тестов"""
+
+    def __init__(self, maxlen: int | None = None):
+        self.last_seq = 0
+        self.entries: deque[Entry] = deque(maxlen=maxlen or Config.REALTIME_STREAM_MAXLEN)
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def append(self, frame: str, route: dict) -> int | None:
+        self.last_seq += 1
+        self.entries.append((self.last_seq, route, with_sequence(frame, self.last_seq)))
+        return self.last_seq
+
+    async def replay(self, last_seq: int, limit: int) -> list[Entry] | None:
+        """События после last_seq; None - догрузка невозможна и нужна полная пересинхронизация"""
+        entries = [entry for entry in self.entries if entry[0] > last_seq][:limit + 1]
+        return _check_replay(last_seq, self.last_seq, entries, limit)
+
+class RedisEventLog:
+    """Журнал событий в ограниченном потоке Redis (XADD MAXLEN ~), общий для всех воркеров"""
+
+    def __init__(self, url: str, maxlen: int | None = None, stream: str = STREAM_KEY, sequence: str = SEQUENCE_KEY):
+        self.url = url
+        self.maxlen = maxlen or Config.REALTIME_STREAM_MAXLEN
+        self.stream = stream
+        self.sequence = sequence
+        self.last_seq = 0
+        self._redis: Optional[redis.Redis] = None
+        self._append = None
+
+    async def start(self) -> None:
+        if self._redis is None:
+            self._redis = redis.from_url(self.url, decode_responses=True)
+            self._append = self._redis.register_script(APPEND_SCRIPT)
+
+    async def stop(self) -> None:
+        if self._redis:
+            await self._redis.aclose()
+            self._redis = None
+
+    async def append(self, frame: str, route: dict) -> int | None:
+        if self._redis is None:
+            return None
+        try:
+            seq = int(await self._append(
+                keys=[self.sequence, self.stream],
+                args=[frame, json.dumps(route, ensure_ascii=False), self.maxlen]
+            ))
+        except Exception as e:
+            # Событие все равно доставляется, но без номера: догрузить его после переподключения не получится
+            print(f"[EVENT LOG Error] Не удалось записать событие в поток: {e}")
+            return None
+        self.last_seq = max(self.last_seq, seq)
+        return seq
+
+    async def replay(self, last_seq: int, limit: int) -> list[Entry] | None:
+        """События после last_seq; None - догрузка невозможна и нужна полная пересинхронизация"""
+        if self._redis is None:
+            return None
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.get(self.sequence)
+        pipe.xrange(self.stream, min=f"{last_seq + 1}-0", max="+", count=limit + 1)
+        try:
+            current, records = await pipe.execute()
+        except Exception as e:
+            print(f"[EVENT LOG Error] Не удалось прочитать поток: {e}")
+            return None
+        entries = [
+            (int(record_id.split("-")[0]), json.loads(fields["route"]), fields["frame"])
+            for record_id, fields in records
+        ]
+        return _check_replay(last_seq, int(current or 0), entries, limit)
+
+def create_event_log() -> LocalEventLog | RedisEventLog:
+    if Config.REALTIME_EVENT_LOG == "redis":
+        return RedisEventLog(Config.REDIS_URL)
+    return LocalEventLog()
@@ -1,7 +1,79 @@
+from app.database import SessionLocal
+from app.realtime import deltas
+from app.realtime.connection import Connection
+from app.realtime.topics import SUBSCRIBER_ROLES
 from app.realtime.websocket_manager import manager
+from app.redis import get_redis
+from app.schemas.order import OrderOut
+from app.services import order_service
+from app.services.eta_service import eta_model
 
-async def handle_event(sender_id: str, data: dict):
+# Полные снимки заказов для клиента, обнаружившего пропуск версии; заказы без сохраненной версии читаются из БД
+async def resync_orders(session: Connection, order_ids: list[int]) -> None:
+    redis = await get_redis()
+    try:
+        snapshots = await deltas.stored_snapshots(redis, order_ids)
+        missing = [order_id for order_id in order_ids if order_id not in snapshots]
+        if missing:
+            async with SessionLocal() as db:
+                orders = await order_service.get_orders_by_ids(missing, db)
+            await eta_model.ensure_loaded(redis)
+            orders_out = [eta_model.with_eta(OrderOut.model_validate(order).model_dump()) for order in orders]
+            for snapshot in await deltas.order_snapshots(redis, orders_out):
+                snapshots[snapshot["order"]["order_id"]] = snapshot
+    finally:
+        await redis.aclose()
+
+    for order_id in dict.fromkeys(order_ids):
+        if order_id in snapshots:
+            manager.reply(session, {"type": "order_snapshot", "payload": snapshots[order_id]})
+        else:
+            manager.reply(session, {"type": "order_delete", "payload": {"action": "delete", "order_id": order_id}})
+
+async def handle_event(sender_id: str, data: dict, session: Connection | None = None):
     event_type = data.get("type")
+    if session is not None:
+        session.mark_received(heartbeat=event_type == "pong")
+
+    # Ответ на ping сервера: {"type": "pong"}; время ответа уже отмечено в сессии
+    if event_type == "pong":
+        return
+
+    # Подписка сессии на темы: {"type": "subscribe", "topics": ["table:5", "station:bar"]}
+    if event_type in {"subscribe", "unsubscribe"} and session is not None:
+        topics = data.get("topics")
+        if not isinstance(topics, list):
+            manager.reply(session, {"type": "error", "payload": {"detail": "Поле topics должно быть списком"}})
+        elif event_type == "subscribe":
+            manager.subscribe(session, topics)
+        else:
+            manager.unsubscribe(session, topics)
+        return
+
+    # Догрузка пропущенных событий после переподключения: {"type": "resume", "last_seq": 1520}
+    if event_type == "resume" and session is not None:
+        last_seq = data.get("last_seq")
+        if not isinstance(last_seq, int) or isinstance(last_seq, bool) or last_seq < 0:
+            manager.reply(session, {"type": "error", "payload": {"detail": "Поле last_seq должно быть неотрицательным числом"}})
+        else:
+            await manager.resume(session, last_seq)
+        return
+
+    # Пересинхронизация после пропуска версии: {"type": "resync", "orders": [12, 15]}
+    if event_type == "resync" and session is not None:
+        order_ids = data.get("orders")
+        if session.role not in SUBSCRIBER_ROLES:
+            manager.reply(session, {"type": "error", "payload": {"detail": "Пересинхронизация доступна только персоналу"}})
+        elif (
+            not isinstance(order_ids, list)
+            or not all(isinstance(order_id, int) for order_id in order_ids)
+            or len(order_ids) > deltas.MAX_RESYNC_ORDERS
+        ):
+            manager.reply(session, {"type": "error", "payload": {"detail": f"Поле orders должно быть списком из не более {deltas.MAX_RESYNC_ORDERS} id заказов"}})
+        else:
+            await resync_orders(session, order_ids)
+        return
+
     action = data.get("action")
     payload = data.get("payload", {})
 
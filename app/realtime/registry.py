@@ -0,0 +1,103 @@
+from collections import defaultdict
+from typing import Iterable
+
+from app.realtime.connection import Connection
+
+class ConnectionRegistry:
+    """Активные сессии с индексами по пользователю и по роли.
+
+    У пользователя может быть несколько одновременных сессий (телефон, планшет, рабочее место).
+    Рассылка по ролям и темам выбирает сессии через индексы и не перебирает остальные подключения.
+    """
+
+    def __init__(self):
+        self.sessions: dict[str, Connection] = {}
+        self.by_user: dict[str, set[str]] = defaultdict(set)
+        self.by_role: dict[str, set[str]] = defaultdict(set)
+        self.by_topic: dict[str, set[str]] = defaultdict(set)
+        # Сессии без подписок получают события тем по старой схеме (как раньше - всем)
+        self.unsubscribed: set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def add(self, connection: Connection) -> None:
+        self.sessions[connection.session_id] = connection
+        self.by_user[connection.client_id].add(connection.session_id)
+        self.by_role[connection.role].add(connection.session_id)
+        if not connection.topics:
+            self.unsubscribed.add(connection.session_id)
+
+    def remove(self, session_id: str) -> Connection | None:
+        connection = self.sessions.pop(session_id, None)
+        if connection is None:
+            return None
+        for index, key in ((self.by_user, connection.client_id), (self.by_role, connection.role)):
+            self._discard(index, key, session_id)
+        for topic in connection.topics:
+            self._discard(self.by_topic, topic, session_id)
+        self.unsubscribed.discard(session_id)
+        return connection
+
+    @staticmethod
+    def _discard(index: dict[str, set[str]], key: str, session_id: str) -> None:
+        members = index[key]
+        members.discard(session_id)
+        if not members:
+            del index[key]
+
+    def subscribe(self, connection: Connection, topics: Iterable[str]) -> None:
+        for topic in topics:
+            if topic not in connection.topics:
+                connection.topics.add(topic)
+                self.by_topic[topic].add(connection.session_id)
+        if connection.topics:
+            self.unsubscribed.discard(connection.session_id)
+
+    def unsubscribe(self, connection: Connection, topics: Iterable[str]) -> None:
+        for topic in topics:
+            if topic in connection.topics:
+                connection.topics.discard(topic)
+                self._discard(self.by_topic, topic, connection.session_id)
+        if not connection.topics and connection.session_id in self.sessions:
+            self.unsubscribed.add(connection.session_id)
+
+    def get(self, session_id: str) -> Connection | None:
+        return self.sessions.get(session_id)
+
+    def for_user(self, client_id: str) -> list[Connection]:
+        return [self.sessions[session_id] for session_id in self.by_user.get(client_id, ())]
+
+    def for_roles(self, roles: Iterable[str] | None) -> list[Connection]:
+        if roles is None:
+            return list(self.sessions.values())
+        return [
+            self.sessions[session_id]
+            for role in roles
+            for session_id in self.by_role.get(role, ())
+        ]
+
+    def for_topics(self, topics: Iterable[str]) -> list[Connection]:
+        """Подписчики любой из тем (каждая сессия один раз) и сессии без подписок"""
+        targets = set(self.unsubscribed)
+        for topic in topics:
+            targets |= self.by_topic.get(topic, set())
+        return [self.sessions[session_id] for session_id in targets]
+
+    @staticmethod
+    def accepts(connection: Connection, route: dict) -> bool:
+        """Получает ли сессия событие с маршрутом route - те же правила, что при рассылке через индексы"""
+        if route.get("user_id") is not None:
+            return connection.client_id == route["user_id"]
+        if route.get("topics") is not None:
+            return not connection.topics or bool(connection.topics & set(route["topics"]))
+        return route.get("roles") is None or connection.role in route["roles"]
+
+    def stats(self) -> dict:
+        return {
+            "total": len(self.sessions),
+            "users": len(self.by_user),
+            "roles": {role: len(members) for role, members in self.by_role.items()},
+            "topics": len(self.by_topic),
+            "subscriptions": sum(len(members) for members in self.by_topic.values()),
+        }
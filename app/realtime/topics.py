@@ -0,0 +1,40 @@
+import re
+from typing import Iterable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.menu_items import MenuItem
+from app.services.prep_time_service import station
+
+# Темы подписки: заказ, стол и цех (кухня/бар)
+TOPIC_PATTERN = re.compile(r"^(order:\d+|table:\d+|station:(kitchen|bar))$")
+MAX_TOPICS_PER_SESSION = 200
+SUBSCRIBER_ROLES = {"Admin", "Waiter", "Cook", "Barkeeper"}
+
+def order_topic(order_id: int) -> str:
+    return f"order:{order_id}"
+
+def table_topic(table_number: int) -> str:
+    return f"table:{table_number}"
+
+def station_topic(name: str) -> str:
+    return f"station:{name}"
+
+# Цеха позиций определяются по категории меню: напитки - бар, остальное - кухня
+async def station_topics(db: AsyncSession, item_ids: Iterable[int]) -> list[str]:
+    item_ids = set(item_ids)
+    if not item_ids:
+        return []
+    result = await db.execute(select(MenuItem.category).where(MenuItem.item_id.in_(item_ids)).distinct())
+    return sorted({station_topic(station(category)) for category in result.scalars().all()})
+
+async def order_topics(db: AsyncSession, order: dict, item_ids: Iterable[int] | None = None) -> list[str]:
+    """Темы события заказа (словарь OrderOut): сам заказ, его стол и цеха, которые готовят его позиции"""
+    if item_ids is None:
+        item_ids = [item["item_id"] for item in order.get("items", [])]
+    return [
+        order_topic(order["order_id"]),
+        table_topic(order["table_number"]),
+        *await station_topics(db, item_ids),
+    ]
@@ -1,37 +1,275 @@
-from typing import Dict
+import asyncio
+import json
+from collections import Counter
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum
+from time import monotonic
+
 from fastapi import WebSocket
 from fastapi.encoders import jsonable_encoder
 
+from app.config import Config
+from app.realtime.backplane import LocalBackplane, RedisBackplane, create_backplane
+from app.realtime.coalescer import EventCoalescer
+from app.realtime.connection import Connection, OverflowPolicy, entity_key
+from app.realtime.event_log import LocalEventLog, RedisEventLog, create_event_log, with_sequence
+from app.realtime.registry import ConnectionRegistry
+from app.realtime.topics import MAX_TOPICS_PER_SESSION, SUBSCRIBER_ROLES, TOPIC_PATTERN
+
+def _encode_default(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    # Редкие типы (модели pydantic и т.п.) - через общий кодировщик FastAPI
+    return jsonable_encoder(value)
+
+def encode_frame(message: dict) -> str:
+    """Сериализация события в текстовый кадр: выполняется один раз на событие, а не на каждого получателя"""
+    return json.dumps(message, default=_encode_default, ensure_ascii=False, separators=(",", ":"))
+
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, dict] = {}
+    def __init__(
+        self,
+        backplane: LocalBackplane | RedisBackplane | None = None,
+        queue_size: int | None = None,
+        policy: OverflowPolicy | str | None = None,
+        max_overflows: int | None = None,
+        send_timeout: float | None = None,
+        coalesce_window_ms: int | None = None,
+        event_log: LocalEventLog | RedisEventLog | None = None,
+        replay_limit: int | None = None,
+        ping_interval: float | None = None,
+        pong_timeout: float | None = None,
+        idle_timeout: float | None = None,
+        max_sessions_per_user: int | None = None
+    ):
+        self.registry = ConnectionRegistry()
+        self.backplane = backplane or LocalBackplane()
+        self.event_log = event_log or LocalEventLog()
+        self.replay_limit = replay_limit or Config.REALTIME_REPLAY_LIMIT
+        self.queue_size = queue_size or Config.WS_QUEUE_SIZE
+        self.policy = OverflowPolicy(policy or Config.WS_OVERFLOW_POLICY)
+        self.max_overflows = max_overflows or Config.WS_MAX_OVERFLOWS
+        self.send_timeout = send_timeout or Config.WS_SEND_TIMEOUT
+        self.counters: Counter = Counter()
+        window_ms = Config.WS_COALESCE_WINDOW_MS if coalesce_window_ms is None else coalesce_window_ms
+        self.coalescer = EventCoalescer(window_ms / 1000, self._publish)
+        # Нулевые значения отключают heartbeat, отключение по простою и ограничение сессий соответственно
+        self.ping_interval = Config.WS_PING_INTERVAL if ping_interval is None else ping_interval
+        self.pong_timeout = Config.WS_PONG_TIMEOUT if pong_timeout is None else pong_timeout
+        self.idle_timeout = Config.WS_IDLE_TIMEOUT if idle_timeout is None else idle_timeout
+        self.max_sessions_per_user = Config.WS_MAX_SESSIONS_PER_USER if max_sessions_per_user is None else max_sessions_per_user
+        self._heartbeat_task: asyncio.Task | None = None
 
-    async def connect(self, client_id: str, websocket: WebSocket, role: str) -> None:
-        self.active_connections[client_id] = {"ws": websocket, "role": role}
-        print(f"[WebSocket] Подключен пользователь {client_id} с ролью '{role}'")
+    async def start(self) -> None:
+        await self.event_log.start()
+        await self.backplane.start(self.deliver)
+        if self.ping_interval > 0 and self._heartbeat_task is None:
+            self._heartbeat_task = asyncio.get_running_loop().create_task(self._heartbeat_loop())
 
-    async def disconnect(self, client_id: str) -> None:
-        self.active_connections.pop(client_id, None)
-        print(f"[WebSocket] Отключен пользователь {client_id}")
+    async def stop(self) -> None:
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+        await self.coalescer.flush_all()
+        await self.backplane.stop()
+        await self.event_log.stop()
+        for connection in list(self.registry.sessions.values()):
+            await connection.close()
 
-    async def send_json(self, client_id: str, message: dict) -> None:
-        conn = self.active_connections.get(client_id)
-        if conn:
+    # Новая сессия пользователя; предыдущие сессии того же пользователя остаются активными,
+    # пока их не больше WS_MAX_SESSIONS_PER_USER - иначе закрываются самые старые
+    async def connect(self, client_id: str, websocket: WebSocket, role: str) -> Connection:
+        if self.max_sessions_per_user > 0:
+            sessions = sorted(self.registry.for_user(client_id), key=lambda session: session.connected_at)
+            for oldest in sessions[:max(len(sessions) - self.max_sessions_per_user + 1, 0)]:
+                self.counters["evicted"] += 1
+                await self._close(oldest, 1008, "превышено число сессий пользователя")
+        connection = Connection(
+            client_id, websocket, role, self.counters,
+            queue_size=self.queue_size,
+            policy=self.policy,
+            max_overflows=self.max_overflows,
+            send_timeout=self.send_timeout,
+            on_failed=self._drop_failed
+        )
+        self.registry.add(connection)
+        connection.start()
+        connection.enqueue(encode_frame({"type": "connected", "payload": {"session_id": connection.session_id}}))
+        print(f"[WebSocket] Подключен пользователь {client_id} с ролью '{role}' (сессия {connection.session_id})")
+        return connection
+
+    # Закрывается только указанная сессия
+    async def disconnect(self, session_id: str) -> None:
+        connection = self.registry.remove(session_id)
+        if connection is not None:
+            await connection.close()
+            print(f"[WebSocket] Отключен пользователь {connection.client_id} (сессия {session_id})")
+
+    # Закрытие сессии по инициативе сервера
+    async def _close(self, connection: Connection, code: int, reason: str) -> None:
+        self.registry.remove(connection.session_id)
+        await connection.close()
+        try:
+            await connection.websocket.close(code=code)
+        except Exception:
+            pass
+        print(f"[WebSocket] Сессия {connection.session_id} пользователя {connection.client_id} отключена: {reason}")
+
+    # Отключение клиента, который не успевает принимать сообщения или чей сокет сломан
+    async def _drop_failed(self, connection: Connection, reason: str) -> None:
+        await self._close(connection, 1011, reason)
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.ping_interval)
             try:
-                await conn["ws"].send_json(message)
-                print(f"[WebSocket] Отправлено сообщение пользователю {client_id}: {message}")
+                await self.check_heartbeats()
             except Exception as e:
-                print(f"[WebSocket] Ошибка отправки пользователю {client_id}: {e}")
+                print(f"[WebSocket Error] Проверка heartbeat: {e}")
+
+    async def check_heartbeats(self) -> None:
+        """Отключение сессий без ответа на ping и простаивающих сессий, ping остальным.
+
+        Сессия считается неотвечающей, если она уже отвечала на ping, но от нее ничего не приходило дольше
+        интервала ping и таймаута pong; клиенты без поддержки pong остаются на ping протокола WebSocket.
+        Простаивающая сессия - кроме pong от нее ничего не приходило дольше WS_IDLE_TIMEOUT.
+        """
+        now = monotonic()
+        ping = encode_frame({"type": "ping", "payload": {"ts": int(datetime.now().timestamp() * 1000)}})
+        for connection in list(self.registry.sessions.values()):
+            if connection.answers_ping and now - connection.last_seen > self.ping_interval + self.pong_timeout:
+                self.counters["reaped"] += 1
+                await self._close(connection, 1001, "нет ответа на ping")
+            elif self.idle_timeout > 0 and now - connection.last_active > self.idle_timeout:
+                self.counters["reaped"] += 1
+                await self._close(connection, 1001, "простой")
+            else:
+                connection.enqueue(ping)
+
+    async def send_json(self, client_id: str, message: dict) -> None:
+        await self.coalescer.submit(message, user_id=client_id)
 
     async def broadcast(self, message: dict, roles: set = None) -> None:
-        json_ready_message = jsonable_encoder(message)
         print(f"[WebSocket] Рассылка события (фильтр ролей: {roles})")
-        for client_id, conn_info in list(self.active_connections.items()):
-            try:
-                if roles is None or conn_info["role"] in roles:
-                    await conn_info["ws"].send_json(json_ready_message)
-            except Exception as e:
-                print(f"Ошибка при отправке сообщения через WebSocket клиенту {client_id}: {e}")
-                continue
+        await self.coalescer.submit(message, roles=sorted(roles) if roles is not None else None)
+
+    async def publish(self, message: dict, topics: list[str]) -> None:
+        """Рассылка подписчикам тем; сессии без подписок получают событие как при broadcast без фильтра ролей"""
+        await self.coalescer.submit(message, topics=sorted(set(topics)))
+
+    # Событие кодируется один раз, получает номер в журнале, доставляется локальным сокетам
+    # и публикуется для остальных воркеров
+    async def _publish(
+        self,
+        message: dict,
+        roles: list[str] | None = None,
+        user_id: str | None = None,
+        topics: list[str] | None = None
+    ) -> None:
+        route = {"roles": roles, "user_id": user_id, "topics": topics}
+        frame = encode_frame(message)
+        seq = await self.event_log.append(frame, route)
+        envelope = {
+            **route,
+            "key": entity_key(message),
+            "seq": seq,
+            "frame": with_sequence(frame, seq) if seq is not None else frame,
+        }
+        await self.deliver(envelope)
+        await self.backplane.publish(envelope)
+
+    # Доставка события сокетам текущего воркера: один и тот же кадр ставится в очереди подключений
+    async def deliver(self, envelope: dict) -> None:
+        user_id = envelope.get("user_id")
+        if user_id is not None:
+            targets = self.registry.for_user(user_id)
+        elif envelope.get("topics") is not None:
+            targets = self.registry.for_topics(envelope["topics"])
+        else:
+            targets = self.registry.for_roles(envelope.get("roles"))
+
+        frame, key, seq = envelope["frame"], envelope.get("key"), envelope.get("seq")
+        for connection in targets:
+            connection.enqueue(frame, key, seq)
+
+    # Ответ в конкретную сессию (подтверждения подписки, ошибки)
+    def reply(self, connection: Connection, message: dict) -> None:
+        connection.enqueue(encode_frame(message))
+
+    async def resume(self, connection: Connection, last_seq: int) -> None:
+        """Догрузка событий, пропущенных после last_seq, с учетом роли, пользователя и подписок сессии.
+
+        Если журнал уже не хранит нужные события или их больше лимита, клиент получает resync_required
+        и перечитывает состояние целиком (GET /orders/sync).
+        """
+        entries = await self.event_log.replay(last_seq, self.replay_limit)
+        if entries is None:
+            self.counters["resyncs"] += 1
+            self.reply(connection, {"type": "resync_required", "payload": {"last_seq": last_seq}})
+            return
+        replayed = 0
+        for _, route, frame in entries:
+            if self.registry.accepts(connection, route):
+                connection.enqueue(frame)
+                replayed += 1
+        self.counters["replayed"] += replayed
+        self.reply(connection, {"type": "resumed", "payload": {"last_seq": last_seq, "replayed": replayed}})
+
+    def subscribe(self, connection: Connection, topics: list) -> None:
+        if connection.role not in SUBSCRIBER_ROLES:
+            self.reply(connection, {"type": "error", "payload": {"detail": "Подписка на темы доступна только персоналу"}})
+            return
+        invalid = [topic for topic in topics if not isinstance(topic, str) or not TOPIC_PATTERN.match(topic)]
+        if invalid:
+            self.reply(connection, {"type": "error", "payload": {"detail": "Неизвестные темы", "topics": invalid}})
+            return
+        if len(connection.topics | set(topics)) > MAX_TOPICS_PER_SESSION:
+            self.reply(connection, {"type": "error", "payload": {"detail": f"Не более {MAX_TOPICS_PER_SESSION} тем на сессию"}})
+            return
+        self.registry.subscribe(connection, topics)
+        self.reply(connection, {"type": "subscribed", "payload": {"topics": sorted(connection.topics)}})
+
+    def unsubscribe(self, connection: Connection, topics: list) -> None:
+        self.registry.unsubscribe(connection, [topic for topic in topics if isinstance(topic, str)])
+        self.reply(connection, {"type": "subscribed", "payload": {"topics": sorted(connection.topics)}})
+
+    def stats(self) -> dict:
+        depths = [len(connection.queue) for connection in self.registry.sessions.values()]
+        now = monotonic()
+        # Живые сессии - отвечавшие на ping в пределах интервала; клиенты без поддержки pong считаются живыми,
+        # пока их соединение не закрыл ping протокола
+        live_window = self.ping_interval + self.pong_timeout if self.ping_interval > 0 else None
+        return {
+            **self.registry.stats(),
+            "live": sum(
+                1 for connection in self.registry.sessions.values()
+                if live_window is None or not connection.answers_ping or now - connection.last_seen <= live_window
+            ),
+            "queue_depth": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "policy": self.policy.value,
+            "sent": self.counters["sent"],
+            "dropped": self.counters["dropped"],
+            "coalesced": self.counters["coalesced"],
+            "overflows": self.counters["overflows"],
+            "disconnected": self.counters["disconnected"],
+            "merged": self.coalescer.merged,
+            "last_seq": self.event_log.last_seq,
+            "replayed": self.counters["replayed"],
+            "resyncs": self.counters["resyncs"],
+            "reaped": self.counters["reaped"],
+            "evicted": self.counters["evicted"],
+        }
 
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager(create_backplane(), event_log=create_event_log())
@@ -1,12 +1,15 @@
 import asyncio
+from datetime import date
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 
 from app.models.table_booking import TableBooking
-from app.models.user import User
+from app.models.user import User, UserRole
 from app.realtime.websocket_manager import manager
+from app.schemas.export import ExportDataset, StreamFormat
 from app.schemas.booking import (
     TableBookingCreate,
     TableBookingUpdate,
@@ -24,6 +27,7 @@ from app.services.booking_service import (
     delete_booking,
 )
 from app.database import get_db
+from app.services import export_service
 
 router = APIRouter(prefix="/bookings", tags=["Бронирование столиков"])
 
@@ -52,6 +56,19 @@ async def get_bookings(user_id: Optional[int] = Query(None),
         return await get_bookings_by_status(db, status)
     return await get_all_bookings(db)
 
+# Потоковая выгрузка бронирований в CSV/NDJSON
+@router.get("/export")
+async def export_bookings(
+    format: StreamFormat = Query(StreamFormat.CSV, description="Формат выгрузки"),
+    start_date: date | None = Query(None, description="Фильтр: от даты (включительно)"),
+    end_date: date | None = Query(None, description="Фильтр: до даты (включительно)"),
+    gzip: bool = Query(False, description="Сжимать выгрузку gzip на лету"),
+    current_user: User = Depends(get_current_user)
+) -> StreamingResponse:
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Доступ запрещен")
+    return export_service.export_response(ExportDataset.BOOKINGS, format, start_date, end_date, gzip)
+
 # Получение брони по id
 @router.get("/{booking_id}", response_model=TableBookingResponse)
 async def get_booking(booking_id: int, db: AsyncSession = Depends(get_db)) -> TableBooking:
@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+from redis.asyncio import Redis
+
+from app.models.user import User, UserRole
+from app.redis import get_redis_client
+from app.schemas.export import ExportJobCreate, ExportJobOut
+from app.services import export_service
+from app.services.auth_service import get_current_user
+
+router = APIRouter(prefix="/exports", tags=["Выгрузки"])
+
+# Запуск выгрузки истории в Parquet/Arrow (выполняется в фоне)
+@router.post("/", response_model=ExportJobOut, status_code=202)
+async def create_export(
+    data: ExportJobCreate,
+    current_user: User = Depends(get_current_user),
+    redis: Redis = Depends(get_redis_client)
+) -> ExportJobOut:
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Доступ запрещен")
+    job = await export_service.create_export_job(redis, data)
+    export_service.start_export_job(job)
+    return job
+
+# Статус выгрузки и список файлов
+@router.get("/{job_id}", response_model=ExportJobOut)
+async def get_export(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    redis: Redis = Depends(get_redis_client)
+) -> ExportJobOut:
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Доступ запрещен")
+    return await export_service.get_export_job(redis, job_id)
+
+# Скачивание файла выгрузки
+@router.get("/{job_id}/files")
+async def download_export_file(
+    job_id: str,
+    path: str = Query(..., description="Путь файла из списка files или _manifest.json"),
+    current_user: User = Depends(get_current_user),
+    redis: Redis = Depends(get_redis_client)
+) -> FileResponse:
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Доступ запрещен")
+    job = await export_service.get_export_job(redis, job_id)
+    full_path = export_service.resolve_export_file(job, path)
+    return FileResponse(full_path, filename=path.replace("/", "_"), media_type="application/octet-stream")
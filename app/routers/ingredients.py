@@ -5,7 +5,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.dependencies.cache import CacheManager, get_cache_manager
 from app.models.user import User
 from app.services import ingredients_service
-from app.schemas.ingredient import MenuItemIngredientCreate, MenuItemIngredientOut
+from app.schemas.ingredient import IngredientCostUpdate, IngredientOut, MenuItemIngredientCreate, MenuItemIngredientOut
 from app.database import get_db
 from app.services.auth_service import get_current_user
 
@@ -49,11 +49,28 @@ async def create_menu_item_ingredient(item_id: int,
     
     await cache.redis.delete(f"ingredients:menu_item:{item_id}")
     await cache.invalidate_pattern("ingredients:all")
+    await cache.invalidate_pattern("statistics:menu_engineering:*")
     await cache.redis.delete(f"menu:item:{item_id}")
     await cache.invalidate_pattern("menu:all:*")
     
     return ingredient_out
 
+# Изменение себестоимости ингредиента
+@router.patch("/ingredients/{ingredient_id}/cost", response_model=IngredientOut)
+async def update_ingredient_cost(ingredient_id: int,
+                                 cost: IngredientCostUpdate,
+                                 db: AsyncSession = Depends(get_db),
+                                 current_user: User = Depends(get_current_user),
+                                 cache: CacheManager = Depends(get_cache_manager)) -> IngredientOut:
+    if current_user.role != "Admin":
+        raise HTTPException(status_code=403, detail="Только админы могут менять себестоимость ингредиентов")
+    ingredient_out = await ingredients_service.update_ingredient_cost(ingredient_id, cost, db)
+
+    await cache.invalidate_pattern("ingredients:*")
+    await cache.invalidate_pattern("statistics:menu_engineering:*")
+
+    return ingredient_out
+
 # Удаление ингердиента из позиции меню
 @router.delete("/{item_id}/{ingredient_id}", status_code=204)
 async def delete_menu_item_ingredient(item_id: int, 
@@ -67,6 +84,7 @@ async def delete_menu_item_ingredient(item_id: int,
     
     await cache.redis.delete(f"ingredients:menu_item:{item_id}")
     await cache.invalidate_pattern("ingredients:all")
+    await cache.invalidate_pattern("statistics:menu_engineering:*")
     await cache.redis.delete(f"menu:item:{item_id}")
     await cache.invalidate_pattern("menu:all:*")
     
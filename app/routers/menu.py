@@ -9,6 +9,7 @@ from app.models.user import User
 from app.models.menu_items import MenuItem, MenuItemImage
 from app.schemas import menu as schemas
 from app.services import menu_service as service
+from app.services.recommendation_service import forget_menu_item
 from app.realtime.websocket_manager import manager
 from app.services.auth_service import get_current_user
 from app.services.yandex_storage import upload_image_to_yandex
@@ -101,6 +102,7 @@ async def update_menu_item(
     await cache.redis.delete(f"menu:item:{item_id}")
     await cache.invalidate_pattern("menu:all:*")
     await cache.invalidate_pattern("recommendations:*")
+    await forget_menu_item(item_id, cache.redis)
     
     await manager.broadcast({
         "type": "menu_update",
@@ -123,6 +125,7 @@ async def delete_menu_item(
     await cache.redis.delete(f"menu:item:{item_id}")
     await cache.invalidate_pattern("menu:all:*")
     await cache.invalidate_pattern("recommendations:*")
+    await forget_menu_item(item_id, cache.redis, deleted=True)
     
     await manager.broadcast({
         "type": "menu_delete",
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, HTTPException
+
+from app.models.user import User, UserRole
+from app.realtime.websocket_manager import manager
+from app.schemas.monitoring import AnalyticsMetricsOut, RealtimeStatsOut, SchedulerMetricsOut
+from app.scheduler.scheduler import get_scheduler_metrics
+from app.services.analytics_engine import analytics_engine
+from app.services.auth_service import get_current_user
+
+router = APIRouter(prefix="/monitoring", tags=["Мониторинг"])
+
+# Метрики планировщика текущего воркера
+@router.get("/scheduler", response_model=SchedulerMetricsOut)
+async def scheduler_metrics(current_user: User = Depends(get_current_user)) -> dict:
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Доступ запрещен")
+    return get_scheduler_metrics()
+
+# Размер и возраст колоночного снимка аналитики текущего воркера
+@router.get("/analytics", response_model=AnalyticsMetricsOut)
+async def analytics_metrics(current_user: User = Depends(get_current_user)) -> dict:
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Доступ запрещен")
+    return analytics_engine.metrics()
+
+# Число WebSocket-подключений текущего воркера по ролям
+@router.get("/realtime", response_model=RealtimeStatsOut)
+async def realtime_stats(current_user: User = Depends(get_current_user)) -> dict:
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Доступ запрещен")
+    return manager.stats()
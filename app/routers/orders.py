@@ -1,7 +1,8 @@
 import asyncio
-from datetime import date
 import time
+from datetime import date
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import List
@@ -10,12 +11,17 @@ from app.dependencies.cache import CacheManager, get_cache_manager
 from app.models.order_items import OrderItem, OrderItemStatus
 from app.models.orders import Order
 from app.schemas import order as schema
+from app.schemas.export import ExportDataset, StreamFormat
 from app.models.order_assignments import OrderAssignment, StaffRole
-from app.services import order_service
+from app.services import export_service, order_service, recommendation_service, statistics_service
 from app.database import get_db
 from app.services.auth_service import get_current_user
 from app.models.user import User, UserRole
+from app.realtime import deltas
+from app.realtime.topics import SUBSCRIBER_ROLES, order_topic, order_topics, station_topics, table_topic
 from app.realtime.websocket_manager import manager
+from app.services.popularity_engine import popularity_engine
+from app.services.eta_service import eta_model
 
 router = APIRouter(prefix="/orders", tags=["Заказы"])
 
@@ -27,10 +33,11 @@ async def get_orders(db: AsyncSession = Depends(get_db),
     start_time = time.time()
     cache_key = f"orders:user:{current_user.user_id}:role:{current_user.role}"
 
+    await eta_model.ensure_loaded(cache.redis)
     cached_orders = await cache.get_cached(cache_key)
     if cached_orders:
         print(f"[REDIS] Orders from cache - {time.time() - start_time:.3f}s")
-        return cached_orders
+        return [eta_model.with_eta(order) for order in cached_orders]
 
     if current_user.role == "Client":
         orders = await order_service.get_orders_by_user(current_user.user_id, db)
@@ -39,11 +46,12 @@ async def get_orders(db: AsyncSession = Depends(get_db),
     db_time = time.time() - start_time
     print(f"[REDIS] Orders from database - {db_time:.3f}s")
 
-    orders_out = [schema.OrderOut.model_validate(order) for order in orders]
+    orders_out = [schema.OrderOut.model_validate(order).model_dump() for order in orders]
     ttl = 15 if current_user.role == "Client" else 30
-    await cache.set_cached(cache_key, [order.model_dump() for order in orders_out], ttl=ttl)
+    await cache.set_cached(cache_key, orders_out, ttl=ttl)
 
-    return orders_out
+    # Оценка готовности не кешируется: она считается в памяти при каждом ответе
+    return [eta_model.with_eta(order) for order in orders_out]
 
 # Получить все назначения персонала
 @router.get("/assigned_staff", response_model=list[schema.AssignedStaffWithOrder])
@@ -73,6 +81,32 @@ async def get_all_assigned_staff_for_in_progress_orders(
 
     return assignments_out
 
+# Потоковая выгрузка заказов в CSV/NDJSON
+@router.get("/export")
+async def export_orders(
+    format: StreamFormat = Query(StreamFormat.CSV, description="Формат выгрузки"),
+    start_date: date | None = Query(None, description="Фильтр: от даты (включительно)"),
+    end_date: date | None = Query(None, description="Фильтр: до даты (включительно)"),
+    gzip: bool = Query(False, description="Сжимать выгрузку gzip на лету"),
+    current_user: User = Depends(get_current_user)
+) -> StreamingResponse:
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Доступ запрещен")
+    return export_service.export_response(ExportDataset.ORDERS, format, start_date, end_date, gzip)
+
+# Полные снимки активных заказов с версиями для пересинхронизации нового подписчика
+@router.get("/sync", response_model=List[schema.OrderSnapshotOut])
+async def sync_orders(db: AsyncSession = Depends(get_db),
+                      current_user: User = Depends(get_current_user),
+                      cache: CacheManager = Depends(get_cache_manager)) -> list[dict]:
+    if current_user.role not in SUBSCRIBER_ROLES:
+        raise HTTPException(status_code=403, detail="Доступ запрещен")
+
+    await eta_model.ensure_loaded(cache.redis)
+    orders = await order_service.get_active_orders(db)
+    orders_out = [eta_model.with_eta(schema.OrderOut.model_validate(order).model_dump()) for order in orders]
+    return await deltas.order_snapshots(cache.redis, orders_out)
+
 # Получить заказ по id
 @router.get("/{order_id}", response_model=schema.OrderOut)
 async def get_order(order_id: int, 
@@ -85,20 +119,21 @@ async def get_order(order_id: int,
     start_time = time.time()
     cache_key = f"order:{order_id}"
 
+    await eta_model.ensure_loaded(cache.redis)
     cached_order = await cache.get_cached(cache_key)
     if cached_order:
         print(f"[REDIS] Order from cache - {time.time() - start_time:.3f}s")
-        return cached_order
+        return eta_model.with_eta(cached_order)
 
     order = await order_service.get_order_by_id(order_id, db)
     db_time = time.time() - start_time
     print(f"[REDIS] Order from database - {db_time:.3f}s")
     
-    order_out = schema.OrderOut.model_validate(order)
+    order_out = schema.OrderOut.model_validate(order).model_dump()
     
-    await cache.set_cached(cache_key, order_out.model_dump(), ttl=60)
+    await cache.set_cached(cache_key, order_out, ttl=60)
     
-    return order_out
+    return eta_model.with_eta(order_out)
 
 # Создать заказ
 @router.post("/", response_model=schema.OrderOut)
@@ -110,33 +145,43 @@ async def create_order(order: schema.OrderCreate,
         raise HTTPException(status_code=403, detail="Доступ запрещен")
     new_order = await order_service.create_order(order, db)
 
-    await cache.invalidate_pattern("recommendations:popular:*")
-    await cache.invalidate_pattern("recommendations:drinks:popular:*")
+    try:
+        await recommendation_service.record_order_popularity(new_order.order_id, db, cache.redis)
+    except Exception as e:
+        print(f"[REDIS] Popularity counters update error: {e}")
+    try:
+        await popularity_engine.notify_new_orders(db)
+    except Exception as e:
+        print(f"[POPULARITY] New orders sync error: {e}")
     await cache.invalidate_pattern("orders:user:*")
     await cache.invalidate_pattern("orders:assigned_staff:*")
-    if current_user.role == UserRole.CLIENT:
-        await cache.redis.delete(f"recommendations:personal:{current_user.user_id}:*")
-        await cache.redis.delete(f"recommendations:drinks:personal:{current_user.user_id}:*")
-        
-    asyncio.create_task(manager.broadcast({
-        "type": "order_create",
-        "payload": {"action": "create", "order": schema.OrderOut.model_validate(new_order).model_dump()}
-    }))
-    return new_order
+
+    await eta_model.ensure_loaded(cache.redis)
+    order_out = eta_model.with_eta(schema.OrderOut.model_validate(new_order).model_dump())
+    message = await deltas.order_created(cache.redis, order_out)
+    asyncio.create_task(manager.publish(message, await order_topics(db, order_out)))
+    return order_out
 
 # Удаление заказа по id
 @router.delete("/{order_id}")
 async def delete_order(order_id: int, 
                        db: AsyncSession = Depends(get_db),
-                       current_user: User = Depends(get_current_user)) -> dict[str, str]:
+                       current_user: User = Depends(get_current_user),
+                       cache: CacheManager = Depends(get_cache_manager)) -> dict[str, str]:
     if current_user.role != "Admin":
         raise HTTPException(status_code=403, detail="Доступ запрещен")
 
+    order = await order_service.get_order_by_id(order_id, db)
+    order_date = order.order_date
+    topics = await order_topics(db, {"order_id": order_id, "table_number": order.table_number}, [item.item_id for item in order.items])
     result = await order_service.delete_order(order_id, db)
-    asyncio.create_task(manager.broadcast({
+    await deltas.forget_order(cache.redis, order_id)
+    await statistics_service.refresh_order_day(db, cache.redis, order_date)
+    await statistics_service.invalidate_sales_cache(cache.redis, order_date)
+    asyncio.create_task(manager.publish({
         "type": "order_delete",
         "payload": {"action": "delete", "order_id": order_id}
-    }))
+    }, topics))
     return result
 
 # Изменить статус заказа
@@ -162,20 +207,20 @@ async def update_status(order_id: int,
         if order.status == schema.OrderStatus.READY:
             raise HTTPException(status_code=400, detail="Нельзя отменить готовый заказ")
 
-    updated_order = await order_service.update_order_status(order_id, status, db)
+    updated_order = await order_service.update_order_status(order_id, status, db, user_id=current_user.user_id)
+    await statistics_service.refresh_order_day(db, cache.redis, updated_order.order_date)
+    if status == schema.OrderStatus.CANCELLED:
+        await statistics_service.invalidate_sales_cache(cache.redis, updated_order.order_date)
 
-    today = date.today().isoformat()
     await cache.redis.delete(f"order:{order_id}")
     await cache.invalidate_pattern("orders:user:*") 
     await cache.invalidate_pattern("orders:assigned_staff:*")
-    await cache.invalidate_pattern(f"statistics:staff:*:start:{today}*")
-    await cache.invalidate_pattern(f"statistics:staff:*admin:True*")
-    
-    asyncio.create_task(manager.broadcast({
-        "type": "order_update",
-        "payload": {"action": "update", "order": schema.OrderOut.model_validate(updated_order).model_dump()}
-    }))
-    return updated_order
+
+    await eta_model.ensure_loaded(cache.redis)
+    order_out = eta_model.with_eta(schema.OrderOut.model_validate(updated_order).model_dump())
+    message = await deltas.order_changed(cache.redis, order_out)
+    asyncio.create_task(manager.publish(message, await order_topics(db, order_out)))
+    return order_out
 
 # Назначить исполнителя к заказу
 @router.patch("/{order_id}/assign", response_model=schema.OrderOut)
@@ -194,16 +239,17 @@ async def assign_self_to_order(order_id: int,
         staff_role,
         db
     )
+    await statistics_service.refresh_order_day(db, cache.redis, updated_order.order_date)
 
-    asyncio.create_task(manager.broadcast({
-        "type": "order_update",
-        "payload": {"action": "update", "order": schema.OrderOut.model_validate(updated_order).model_dump()}
-    }))
+    await eta_model.ensure_loaded(cache.redis)
+    order_out = eta_model.with_eta(schema.OrderOut.model_validate(updated_order).model_dump())
+    message = await deltas.order_changed(cache.redis, order_out)
+    asyncio.create_task(manager.publish(message, await order_topics(db, order_out)))
 
     await cache.redis.delete(f"order:{order_id}")
     await cache.invalidate_pattern("orders:assigned_staff:*")
 
-    return updated_order
+    return order_out
 
 # Изменить статус позиции заказа
 @router.patch("/order-items/{order_item_id}/status")
@@ -227,45 +273,57 @@ async def update_order_item_status(order_item_id: int,
     if not order_item:
         raise HTTPException(status_code=404, detail="Позиция не найдена")
 
+    order_service.record_status_event(
+        db, order_item.order_id, order_item.status, update_data.status,
+        order_item_id=order_item.order_item_id, user_id=current_user.user_id
+    )
     order_item.status = update_data.status
     await db.commit()
     await db.refresh(order_item)
 
     order_result = await db.execute(select(Order).where(Order.order_id == order_item.order_id))
     order = order_result.scalar_one_or_none()
-    
+
+    # Событие позиции (раньше события заказа, которое оно вызвало) получает только цех, который ее готовит,
+    # а также подписчики заказа и стола
+    item_topics = [order_topic(order_item.order_id), *await station_topics(db, [order_item.item_id])]
+    if order:
+        item_topics.append(table_topic(order.table_number))
+    asyncio.create_task(manager.publish({
+        "type": "order_item_update",
+        "payload": {
+            "action": "update",
+            "order_id": order_item.order_id,
+            "order_item_id": order_item.order_item_id,
+            "item_status": order_item.status
+        }
+    }, item_topics))
+
     items_result = await db.execute(select(OrderItem).where(OrderItem.order_id == order_item.order_id))
     order_items = items_result.scalars().all()
 
     if order and all(item.status == OrderItemStatus.READY for item in order_items):
+        order_service.record_status_event(db, order.order_id, order.status, schema.OrderStatus.READY)
         order.status = schema.OrderStatus.READY
         await db.commit()
         await db.refresh(order)
 
-        asyncio.create_task(manager.broadcast({
-            "type": "order_update",
-            "payload": {"action": "update", "order": schema.OrderOut.model_validate(order).model_dump()}
-        }))
+        order_out = eta_model.with_eta(schema.OrderOut.model_validate(order).model_dump())
+        message = await deltas.order_changed(cache.redis, order_out)
+        asyncio.create_task(manager.publish(message, await order_topics(db, order_out)))
         
     if order and all(item.status == OrderItemStatus.COMPLETED for item in order_items):
+        order_service.record_status_event(db, order.order_id, order.status, schema.OrderStatus.COMPLETED)
         order.status = schema.OrderStatus.COMPLETED
         await db.commit()
         await db.refresh(order)
 
-        asyncio.create_task(manager.broadcast({
-            "type": "order_update",
-            "payload": {"action": "update", "order": schema.OrderOut.model_validate(order).model_dump()}
-        }))
+        order_out = eta_model.with_eta(schema.OrderOut.model_validate(order).model_dump())
+        message = await deltas.order_changed(cache.redis, order_out)
+        asyncio.create_task(manager.publish(message, await order_topics(db, order_out)))
 
-    asyncio.create_task(manager.broadcast({
-        "type": "order_item_update",
-        "payload": {
-            "action": "update",
-            "order_id": order_item.order_id,
-            "order_item_id": order_item.order_item_id,
-            "item_status": order_item.status
-        }
-    }))
+    if order and order.status in (schema.OrderStatus.READY, schema.OrderStatus.COMPLETED):
+        await statistics_service.refresh_order_day(db, cache.redis, order.order_date)
 
     await cache.redis.delete(f"order:{order_item.order_id}")
     await cache.invalidate_pattern("orders:assigned_staff:*")
@@ -1,41 +1,70 @@
 import time
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 from app.models.user import User, UserRole
-from app.schemas.recommendation import RecommendedItem
+from app.schemas.recommendation import HomeRecommendations, PopularityDecay, RecommendedItem
 from app.services.auth_service import get_current_user
 from app.services.recommendation_service import (
     get_most_popular_items,
     get_user_recommendations,
     get_most_popular_drinks,
-    get_user_drink_recommendations
+    get_user_drink_recommendations,
+    get_home_recommendations
 )
+from app.services.popularity_engine import popularity_engine
+from app.services.cooccurrence_service import cooccurrence_index
+from app.services.collaborative_service import factor_model
 from app.dependencies.cache import get_cache_manager, CacheManager
 
 router = APIRouter(prefix="/recommendations", tags=["Рекомендации"])
 
+# Получение всех рекомендаций главного экрана одним запросом
+@router.get("/home", response_model=HomeRecommendations)
+async def home_recommendations(
+    limit: int = 5,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    cache: CacheManager = Depends(get_cache_manager)
+) -> HomeRecommendations:
+    start_time = time.time()
+    user_id = current_user.user_id if current_user.role == UserRole.CLIENT else None
+    cache_key = f"recommendations:home:{user_id}:limit:{limit}"
+
+    cached_recommendations = await cache.get_cached(cache_key)
+    if cached_recommendations:
+        print(f"[REDIS] Home recommendations from cache - {time.time() - start_time:.3f}s")
+        return cached_recommendations
+
+    recommendations = await get_home_recommendations(db=db, user_id=user_id, limit=limit)
+    db_time = time.time() - start_time
+    print(f"[REDIS] Home recommendations from database - {db_time:.3f}s")
+
+    await cache.set_cached(cache_key, recommendations.model_dump(), ttl=300)
+
+    return recommendations
+
 # Получение популярных блюд ресторана
 @router.get("/popular", response_model=list[RecommendedItem])
 async def popular_items(
     limit: int = 5, 
+    decay: PopularityDecay | None = Query(None, description="Затухание популярности со временем"),
+    at: datetime | None = Query(None, description="Учитывать популярность в этот день недели и час"),
     db: AsyncSession = Depends(get_db),
     cache: CacheManager = Depends(get_cache_manager)
 ) -> list[RecommendedItem]:
     start_time = time.time()
-    cache_key = f"recommendations:popular:limit:{limit}"
-    
-    cached_recommendations = await cache.get_cached(cache_key)
-    if cached_recommendations:
-        print(f"[REDIS] Popular recommendations from cache - {time.time() - start_time:.3f}s")
-        return cached_recommendations
-    
-    recommendations = await get_most_popular_items(db=db, limit=limit)
+    if decay is not None or at is not None:
+        await popularity_engine.ensure_fresh(db)
+        recommendations = popularity_engine.top(drinks=False, decay=decay or PopularityDecay.NONE, at=at, limit=limit)
+        print(f"[MEMORY] Popular recommendations from popularity table - {time.time() - start_time:.3f}s")
+        return recommendations
+
+    recommendations = await get_most_popular_items(db=db, redis=cache.redis, limit=limit)
     db_time = time.time() - start_time
-    print(f"[REDIS] Popular recommendations from database - {db_time:.3f}s")
-    
-    await cache.set_cached(cache_key, [item.model_dump() for item in recommendations], ttl=600)
+    print(f"[REDIS] Popular recommendations from counters - {db_time:.3f}s")
     
     return recommendations
 
@@ -54,18 +83,17 @@ async def personal_recommendations(
             detail="Только клиенты получают персональные рекомендации"
         )
     
-    cache_key = f"recommendations:personal:{current_user.user_id}:limit:{limit}"
-    
-    cached_recommendations = await cache.get_cached(cache_key)
-    if cached_recommendations:
-        print(f"[REDIS] Personal recommendations from cache - {time.time() - start_time:.3f}s")
-        return cached_recommendations
+    # Факторная модель -> собственные заказы пользователя -> общая популярность
+    recommendations = factor_model.recommend(current_user.user_id, drinks=False, limit=limit)
+    if recommendations is not None:
+        print(f"[MEMORY] Personal recommendations from factor model - {time.time() - start_time:.3f}s")
+        return recommendations
 
-    recommendations = await get_user_recommendations(user_id=current_user.user_id, db=db, limit=limit)
+    recommendations = await get_user_recommendations(user_id=current_user.user_id, db=db, redis=cache.redis, limit=limit)
+    if not recommendations:
+        recommendations = await get_most_popular_items(db=db, redis=cache.redis, limit=limit)
     db_time = time.time() - start_time
-    print(f"[REDIS] Personal recommendations from database - {db_time:.3f}s")
-
-    await cache.set_cached(cache_key, [item.model_dump() for item in recommendations], ttl=300)
+    print(f"[REDIS] Personal recommendations from counters - {db_time:.3f}s")
     
     return recommendations
 
@@ -73,22 +101,21 @@ async def personal_recommendations(
 @router.get("/drinks/popular", response_model=list[RecommendedItem])
 async def popular_drinks(
     limit: int = 5, 
+    decay: PopularityDecay | None = Query(None, description="Затухание популярности со временем"),
+    at: datetime | None = Query(None, description="Учитывать популярность в этот день недели и час"),
     db: AsyncSession = Depends(get_db),
     cache: CacheManager = Depends(get_cache_manager)
 ) -> list[RecommendedItem]:
     start_time = time.time()
-    cache_key = f"recommendations:drinks:popular:limit:{limit}"
-    
-    cached_recommendations = await cache.get_cached(cache_key)
-    if cached_recommendations:
-        print(f"[REDIS] Popular drinks from cache - {time.time() - start_time:.3f}s")
-        return cached_recommendations
-    
-    recommendations = await get_most_popular_drinks(db=db, limit=limit)
-    db_time = time.time() - start_time
-    print(f"[REDIS] Popular drinks from database - {db_time:.3f}s")
+    if decay is not None or at is not None:
+        await popularity_engine.ensure_fresh(db)
+        recommendations = popularity_engine.top(drinks=True, decay=decay or PopularityDecay.NONE, at=at, limit=limit)
+        print(f"[MEMORY] Popular drinks from popularity table - {time.time() - start_time:.3f}s")
+        return recommendations
 
-    await cache.set_cached(cache_key, [item.model_dump() for item in recommendations], ttl=600)
+    recommendations = await get_most_popular_drinks(db=db, redis=cache.redis, limit=limit)
+    db_time = time.time() - start_time
+    print(f"[REDIS] Popular drinks from counters - {db_time:.3f}s")
     
     return recommendations
 
@@ -107,17 +134,29 @@ async def personal_drink_recommendations(
             detail="Только клиенты получают персональные рекомендации"
         )
     
-    cache_key = f"recommendations:drinks:personal:{current_user.user_id}:limit:{limit}"
-    
-    cached_recommendations = await cache.get_cached(cache_key)
-    if cached_recommendations:
-        print(f"[REDIS] Personal drinks from cache - {time.time() - start_time:.3f}s")
-        return cached_recommendations
-    
-    recommendations = await get_user_drink_recommendations(user_id=current_user.user_id, db=db, limit=limit)
-    db_time = time.time() - start_time
-    print(f"[REDIS] Personal drinks from database - {db_time:.3f}s")
+    # Факторная модель -> собственные заказы пользователя -> общая популярность
+    recommendations = factor_model.recommend(current_user.user_id, drinks=True, limit=limit)
+    if recommendations is not None:
+        print(f"[MEMORY] Personal drinks from factor model - {time.time() - start_time:.3f}s")
+        return recommendations
 
-    await cache.set_cached(cache_key, [item.model_dump() for item in recommendations], ttl=300)
+    recommendations = await get_user_drink_recommendations(user_id=current_user.user_id, db=db, redis=cache.redis, limit=limit)
+    if not recommendations:
+        recommendations = await get_most_popular_drinks(db=db, redis=cache.redis, limit=limit)
+    db_time = time.time() - start_time
+    print(f"[REDIS] Personal drinks from counters - {db_time:.3f}s")
     
-    return recommendations
\ No newline at end of file
+    return recommendations
+
+# Получение позиций, которые часто заказывают вместе с позициями корзины
+@router.get("/together", response_model=list[RecommendedItem])
+async def ordered_together(
+    item_ids: list[int] = Query(..., description="Позиции, уже добавленные в заказ"),
+    limit: int = 5,
+    db: AsyncSession = Depends(get_db)
+) -> list[RecommendedItem]:
+    start_time = time.time()
+    await cooccurrence_index.ensure_ready(db)
+    recommendations = cooccurrence_index.recommend(item_ids, limit=limit)
+    print(f"[MEMORY] Ordered together from co-occurrence index - {time.time() - start_time:.3f}s")
+    return recommendations
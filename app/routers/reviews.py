@@ -1,14 +1,17 @@
 import time
+from datetime import date
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 from app.dependencies.cache import CacheManager, get_cache_manager
-from app.models.user import User
+from app.models.user import User, UserRole
+from app.schemas.export import ExportDataset, StreamFormat
 from app.schemas.review import AdminReviewResponse, ReviewCreate, ReviewUpdate, Review
 from app.services.auth_service import get_current_user
-from app.services import review_service as service
+from app.services import export_service, review_service as service
 
 router = APIRouter(prefix="/reviews", tags=["Отзывы"])
 
@@ -71,6 +74,19 @@ async def create_review(review_data: ReviewCreate,
     
     return review_out
 
+# Потоковая выгрузка отзывов в CSV/NDJSON
+@router.get("/export")
+async def export_reviews(
+    format: StreamFormat = Query(StreamFormat.CSV, description="Формат выгрузки"),
+    start_date: date | None = Query(None, description="Фильтр: от даты (включительно)"),
+    end_date: date | None = Query(None, description="Фильтр: до даты (включительно)"),
+    gzip: bool = Query(False, description="Сжимать выгрузку gzip на лету"),
+    current_user: User = Depends(get_current_user)
+) -> StreamingResponse:
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Доступ запрещен")
+    return export_service.export_response(ExportDataset.REVIEWS, format, start_date, end_date, gzip)
+
 # Получение отзывов пользователя по его id
 @router.get("/user/{user_id}", response_model=list[Review])
 async def get_reviews_by_user(user_id: int, 
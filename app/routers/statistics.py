@@ -1,14 +1,15 @@
 import time
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from datetime import date
+from datetime import date, timedelta
 
 from app.database import get_db
-from app.services import statistics_service
-from app.schemas.statistics import StaffStatsWithRankOut, StaffStatsOut
+from app.services import menu_engineering_service, prep_time_service, statistics_service
+from app.schemas.statistics import AnalyticsAggregation, AnalyticsReportOut, AnalyticsTable, MenuEngineeringItemOut, PrepTimeGroup, PrepTimeOut, SalesBucketOut, SalesGranularity, StaffStatsWithRankOut, StaffStatsOut, StaffStatsSort
 from app.models.user import User, UserRole
 from app.services.auth_service import get_current_user
 from app.dependencies.cache import get_cache_manager, CacheManager
+from app.services.analytics_engine import analytics_engine
 
 router = APIRouter(prefix="/statistics", tags=["Статистика"])
 
@@ -19,6 +20,10 @@ async def get_staff_statistics(
     current_user: User = Depends(get_current_user),
     start_date: date | None = Query(None, description="Фильтр: от даты (включительно)"),
     end_date: date | None = Query(None, description="Фильтр: до даты (включительно)"),
+    limit: int = Query(50, ge=1, le=500, description="Размер страницы (только для администратора)"),
+    offset: int = Query(0, ge=0, description="Смещение страницы (только для администратора)"),
+    sort_by: StaffStatsSort = Query(StaffStatsSort.ORDERS_COUNT, description="Поле сортировки (только для администратора)"),
+    descending: bool = Query(True, description="Сортировка по убыванию (только для администратора)"),
     cache: CacheManager = Depends(get_cache_manager)
 ) -> (list[StaffStatsOut] | dict):
     start_time = time.time()
@@ -28,38 +33,139 @@ async def get_staff_statistics(
     
     is_admin = current_user.role == UserRole.ADMIN
 
-    cache_key = f"statistics:staff:user:{current_user.user_id}:admin:{is_admin}"
+    # Закрытые периоды, целиком попавшие в дневную статистику, кешируются без TTL (кеш сбрасывается
+    # при ее пересчете), периоды с текущим днем или еще не догруженными днями - коротко
+    closed = end_date is not None and end_date < date.today()
+    if closed:
+        rolled_to = await statistics_service.last_rolled_up_day(db)
+        closed = rolled_to is not None and end_date <= rolled_to
+    cache_key = f"{statistics_service.CLOSED_CACHE_PREFIX if closed else 'statistics:staff:live:'}user:{current_user.user_id}:admin:{is_admin}"
     if start_date:
         cache_key += f":start:{start_date}"
     if end_date:
         cache_key += f":end:{end_date}"
+    if is_admin:
+        cache_key += f":page:{limit}:{offset}:{sort_by.value}:{'desc' if descending else 'asc'}"
 
-    if not is_admin and (not start_date or start_date == date.today()):
-        cached_stats = await cache.get_cached(cache_key)
-        if cached_stats:
-            print(f"[REDIS] Staff statistics from cache (short TTL) - {time.time() - start_time:.3f}s")
-            return cached_stats
-        
-        stats = await statistics_service.get_staff_statistics(
-            db, current_user.user_id, current_user.role, is_admin, start_date, end_date
-        )
-        await cache.set_cached(cache_key, [item.model_dump() for item in stats], ttl=60)
-        db_time = time.time() - start_time
-        print(f"[REDIS] Staff statistics from database (short TTL) - {db_time:.3f}")
-
-        return stats
-    else:
-        cached_stats = await cache.get_cached(cache_key)
-        if cached_stats:
-            print(f"[REDIS] Staff statistics from cache (long TTL) - {time.time() - start_time:.3f}s")
-            return cached_stats
-        
-        stats = await statistics_service.get_staff_statistics(
-            db, current_user.user_id, current_user.role, is_admin, start_date, end_date
+    cached_stats = await cache.get_cached(cache_key)
+    if cached_stats:
+        print(f"[REDIS] Staff statistics from cache - {time.time() - start_time:.3f}s")
+        return cached_stats
+
+    stats = await statistics_service.get_staff_statistics(
+        db, current_user.user_id, current_user.role, is_admin, start_date, end_date,
+        limit=limit, offset=offset, sort_by=sort_by, descending=descending
+    )
+    db_time = time.time() - start_time
+    print(f"[REDIS] Staff statistics from database - {db_time:.3f}")
+
+    await cache.set_cached(cache_key, [item.model_dump() for item in stats], ttl=None if closed else 60)
+    return stats
+
+# Продажи по интервалам времени
+@router.get("/sales", response_model=list[SalesBucketOut])
+async def get_sales_statistics(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    granularity: SalesGranularity = Query(SalesGranularity.DAY, description="Шаг интервала"),
+    start_date: date | None = Query(None, description="От даты (включительно), по умолчанию 30 дней назад"),
+    end_date: date | None = Query(None, description="До даты (включительно), по умолчанию сегодня"),
+    by_category: bool = Query(False, description="Разбивка по категориям меню"),
+    by_table: bool = Query(False, description="Разбивка по столам"),
+    cache: CacheManager = Depends(get_cache_manager)
+) -> list[SalesBucketOut]:
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Доступ запрещен")
+
+    start_time = time.time()
+    end_date = end_date or date.today()
+    start_date = start_date or end_date - timedelta(days=30)
+    sales = await statistics_service.get_sales_statistics(
+        db, cache.redis, granularity, start_date, end_date, by_category=by_category, by_table=by_table
+    )
+    print(f"[REDIS] Sales statistics - {time.time() - start_time:.3f}s")
+    return sales
+
+# Перцентили времени приготовления позиций по журналу смен статусов
+@router.get("/prep-times", response_model=list[PrepTimeOut])
+async def get_prep_times(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    group_by: PrepTimeGroup = Query(PrepTimeGroup.ITEM, description="Группировка: позиция, категория, цех или час заказа"),
+    start_date: date | None = Query(None, description="Фильтр: от даты (включительно)"),
+    end_date: date | None = Query(None, description="Фильтр: до даты (включительно)"),
+    cache: CacheManager = Depends(get_cache_manager)
+) -> list[PrepTimeOut]:
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Доступ запрещен")
+
+    start_time = time.time()
+    cache_key = f"statistics:prep_times:{group_by.value}:start:{start_date}:end:{end_date}"
+    cached = await cache.get_cached(cache_key)
+    if cached:
+        print(f"[REDIS] Prep time statistics from cache - {time.time() - start_time:.3f}s")
+        return cached
+
+    stats = await prep_time_service.get_prep_time_percentiles(db, group_by, start_date, end_date)
+    print(f"[REDIS] Prep time statistics from database - {time.time() - start_time:.3f}s")
+    await cache.set_cached(cache_key, [item.model_dump() for item in stats], ttl=300)
+    return stats
+
+# Произвольный отчет по колоночному снимку в памяти: группировка, фильтр по значению и top-k
+@router.get("/report", response_model=AnalyticsReportOut)
+async def get_report(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    table: AnalyticsTable = Query(AnalyticsTable.ORDERS, description="Таблица снимка"),
+    group_by: list[str] = Query([], description="Колонки группировки, а также day, hour, weekday"),
+    aggregation: AnalyticsAggregation = Query(AnalyticsAggregation.COUNT, description="Агрегат"),
+    column: str | None = Query(None, description="Колонка для sum и mean"),
+    status: str | None = Query(None, description="Фильтр по статусу"),
+    item_id: int | None = Query(None, description="Фильтр по позиции меню"),
+    user_id: int | None = Query(None, description="Фильтр по пользователю"),
+    start_date: date | None = Query(None, description="Фильтр: от даты (включительно)"),
+    end_date: date | None = Query(None, description="Фильтр: до даты (включительно)"),
+    descending: bool = Query(True, description="Сортировка по убыванию значения"),
+    limit: int = Query(50, ge=1, le=1000, description="Число строк (top-k)")
+) -> dict:
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Доступ запрещен")
+
+    start_time = time.time()
+    await analytics_engine.ensure_fresh(db)
+    filters = {key: value for key, value in (("status", status), ("item_id", item_id), ("user_id", user_id)) if value is not None}
+    try:
+        rows = analytics_engine.aggregate(
+            table.value, group_by, aggregation.value, column, filters,
+            date_from=start_date, date_to=end_date, descending=descending, limit=limit
         )
-        db_time = time.time() - start_time
-        print(f"[REDIS] Staff statistics from database (long TTL) - {db_time:.3f}")
-        
-        ttl = 300 if is_admin else 180
-        await cache.set_cached(cache_key, [item.model_dump() for item in stats], ttl=ttl)
-        return stats
\ No newline at end of file
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    print(f"[ANALYTICS] Report {table.value} - {time.time() - start_time:.3f}s")
+    return {"snapshot_age_seconds": analytics_engine.metrics()["snapshot_age_seconds"], "rows": rows}
+
+# Меню-инжиниринг: продажи, выручка, себестоимость и маржа позиций с классификацией
+@router.get("/menu-engineering", response_model=list[MenuEngineeringItemOut])
+async def get_menu_engineering(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    start_date: date | None = Query(None, description="Фильтр: от даты (включительно)"),
+    end_date: date | None = Query(None, description="Фильтр: до даты (включительно)"),
+    cache: CacheManager = Depends(get_cache_manager)
+) -> list[MenuEngineeringItemOut]:
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Доступ запрещен")
+
+    start_time = time.time()
+    cache_key = f"statistics:menu_engineering:start:{start_date}:end:{end_date}"
+    cached = await cache.get_cached(cache_key)
+    if cached:
+        print(f"[REDIS] Menu engineering from cache - {time.time() - start_time:.3f}s")
+        return cached
+
+    report = await menu_engineering_service.get_menu_engineering(db, start_date, end_date)
+    print(f"[REDIS] Menu engineering from database - {time.time() - start_time:.3f}s")
+    # Закрытый период меняется только при правке состава или цен, открытый - с каждым заказом
+    closed = end_date is not None and end_date < date.today()
+    await cache.set_cached(cache_key, [item.model_dump() for item in report], ttl=3600 if closed else 300)
+    return report
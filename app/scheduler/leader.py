@@ -0,0 +1,96 @@
+import asyncio
+import os
+import socket
+import uuid
+from typing import Awaitable, Callable, Optional
+
+import redis.asyncio as redis
+
+from app.config import Config
+
+# Продление блокировки только если ей владеет текущий процесс
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Освобождение блокировки только если ей владеет текущий процесс
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+class LeaderElector:
+    """Выбор лидера среди воркеров через блокировку в Redis с TTL и продлением"""
+
+    def __init__(self, key: str, ttl: int,
+                 on_elected: Callable[[], Awaitable[None] | None] | None = None,
+                 on_demoted: Callable[[], Awaitable[None] | None] | None = None):
+        self.key = key
+        self.ttl_ms = ttl * 1000
+        self.renew_interval = max(ttl / 3, 1)
+        self.token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.is_leader = False
+        self._redis: Optional[redis.Redis] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._redis:
+            try:
+                if self.is_leader:
+                    await self._redis.eval(RELEASE_SCRIPT, 1, self.key, self.token)
+                    print(f"[LEADER] {self.token} освободил блокировку")
+            finally:
+                await self._redis.aclose()
+                self._redis = None
+        await self._set_leader(False)
+
+    async def _run(self) -> None:
+        self._redis = redis.from_url(Config.REDIS_URL, decode_responses=True)
+        while True:
+            await self._tick()
+            await asyncio.sleep(self.renew_interval)
+
+    # Один шаг выбора: захват свободной блокировки или продление своей
+    async def _tick(self) -> None:
+        try:
+            await self._set_leader(await self._try_acquire_or_renew())
+        except Exception as e:
+            # Без связи с Redis нельзя гарантировать единственность лидера
+            print(f"[LEADER Error] {e}")
+            await self._set_leader(False)
+
+    async def _try_acquire_or_renew(self) -> bool:
+        if self.is_leader:
+            renewed = await self._redis.eval(RENEW_SCRIPT, 1, self.key, self.token, self.ttl_ms)
+            return bool(renewed)
+        acquired = await self._redis.set(self.key, self.token, nx=True, px=self.ttl_ms)
+        return bool(acquired)
+
+    async def _set_leader(self, value: bool) -> None:
+        if value == self.is_leader:
+            return
+        self.is_leader = value
+        callback = self.on_elected if value else self.on_demoted
+        print(f"[LEADER] {self.token} {'стал лидером' if value else 'потерял лидерство'}")
+        if callback:
+            result = callback()
+            if asyncio.iscoroutine(result):
+                await result
@@ -0,0 +1,77 @@
+import time
+from datetime import datetime
+from typing import Dict
+
+from apscheduler.events import (
+    EVENT_JOB_ERROR,
+    EVENT_JOB_EXECUTED,
+    EVENT_JOB_MISSED,
+    EVENT_JOB_SUBMITTED,
+    JobExecutionEvent,
+    JobSubmissionEvent,
+)
+
+class JobMetrics:
+    """Метрики выполнения периодических задач: длительность, задержка запуска, пропуски"""
+
+    def __init__(self):
+        self.jobs: Dict[str, dict] = {}
+        self._started: Dict[str, float] = {}
+
+    def _job(self, job_id: str) -> dict:
+        return self.jobs.setdefault(job_id, {
+            "runs": 0,
+            "errors": 0,
+            "misfires": 0,
+            "last_duration": None,
+            "max_duration": 0.0,
+            "total_duration": 0.0,
+            "last_lag": None,
+            "max_lag": 0.0,
+            "last_run_at": None,
+        })
+
+    def on_submitted(self, job_id: str, scheduled_run_time: datetime, now: datetime) -> None:
+        stats = self._job(job_id)
+        lag = max((now - scheduled_run_time).total_seconds(), 0.0)
+        stats["last_lag"] = lag
+        stats["max_lag"] = max(stats["max_lag"], lag)
+        stats["last_run_at"] = now
+        self._started[job_id] = time.perf_counter()
+
+    def on_finished(self, job_id: str, failed: bool) -> None:
+        stats = self._job(job_id)
+        started = self._started.pop(job_id, None)
+        stats["runs"] += 1
+        if failed:
+            stats["errors"] += 1
+        if started is not None:
+            duration = time.perf_counter() - started
+            stats["last_duration"] = duration
+            stats["max_duration"] = max(stats["max_duration"], duration)
+            stats["total_duration"] += duration
+
+    def on_missed(self, job_id: str) -> None:
+        self._job(job_id)["misfires"] += 1
+
+    def listener(self, event) -> None:
+        if event.code == EVENT_JOB_SUBMITTED and isinstance(event, JobSubmissionEvent):
+            scheduled = event.scheduled_run_times[-1]
+            self.on_submitted(event.job_id, scheduled, datetime.now(scheduled.tzinfo))
+        elif event.code == EVENT_JOB_MISSED:
+            self.on_missed(event.job_id)
+        elif isinstance(event, JobExecutionEvent):
+            self.on_finished(event.job_id, failed=event.code == EVENT_JOB_ERROR)
+
+    def snapshot(self) -> list[dict]:
+        result = []
+        for job_id, stats in self.jobs.items():
+            runs = stats["runs"]
+            result.append({
+                "job_id": job_id,
+                **stats,
+                "avg_duration": stats["total_duration"] / runs if runs else None,
+            })
+        return result
+
+JOB_EVENTS_MASK = EVENT_JOB_SUBMITTED | EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED
@@ -4,13 +4,56 @@ from zoneinfo import ZoneInfo
 from datetime import datetime, timedelta
 from sqlalchemy import select
 
+from app.config import Config
 from app.database import SessionLocal
 from app.models.table_booking import TableBooking, BookingStatus
+from app.redis import get_redis
+from app.services.recommendation_service import rebuild_popularity_counters
+from app.services.collaborative_service import train_factor_model
+from app.services.statistics_service import backfill_staff_daily_stats
+from app.services.eta_service import refresh_eta_parameters
+from app.services.export_service import purge_expired_exports
+from app.scheduler.leader import LeaderElector
+from app.scheduler.metrics import JobMetrics, JOB_EVENTS_MASK
 
 scheduler = AsyncIOScheduler()
+job_metrics = JobMetrics()
+
+# Задачи выполняет только воркер-лидер, остальные держат планировщик на паузе
+def _on_elected():
+    print("[SCHEDULER] Воркер стал лидером, задачи возобновлены")
+    if scheduler.running:
+        scheduler.resume()
+
+def _on_demoted():
+    print("[SCHEDULER] Воркер не является лидером, задачи приостановлены")
+    if scheduler.running:
+        scheduler.pause()
+
+leader_elector = LeaderElector(
+    key=Config.SCHEDULER_LOCK_KEY,
+    ttl=Config.SCHEDULER_LOCK_TTL,
+    on_elected=_on_elected,
+    on_demoted=_on_demoted,
+)
 
 def start_scheduler():
-    scheduler.start()
+    scheduler.add_listener(job_metrics.listener, JOB_EVENTS_MASK)
+    scheduler.start(paused=True)
+    leader_elector.start()
+
+async def stop_scheduler():
+    await leader_elector.stop()
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+
+def get_scheduler_metrics() -> dict:
+    return {
+        "is_leader": leader_elector.is_leader,
+        "worker": leader_elector.token,
+        "running": scheduler.running,
+        "jobs": job_metrics.snapshot(),
+    }
 
 def schedule_booking_updater():
     print("[SCHEDULER] schedule_booking_updater вызван")
@@ -22,6 +65,71 @@ def schedule_booking_updater():
         replace_existing=True,
     )
 
+def schedule_popularity_rebuild():
+    print("[SCHEDULER] schedule_popularity_rebuild вызван")
+    scheduler.add_job(
+        rebuild_popularity,
+        trigger=IntervalTrigger(hours=1),
+        id="rebuild_popularity",
+        name="Rebuild popularity counters",
+        next_run_time=datetime.now(),
+        misfire_grace_time=None,
+        coalesce=True,
+        replace_existing=True,
+    )
+
+def schedule_recommender_training():
+    print("[SCHEDULER] schedule_recommender_training вызван")
+    scheduler.add_job(
+        train_recommender,
+        trigger=IntervalTrigger(hours=6),
+        id="train_recommender",
+        name="Train collaborative filtering model",
+        next_run_time=datetime.now(),
+        misfire_grace_time=None,
+        coalesce=True,
+        replace_existing=True,
+    )
+
+def schedule_staff_stats_backfill():
+    print("[SCHEDULER] schedule_staff_stats_backfill вызван")
+    scheduler.add_job(
+        backfill_staff_stats,
+        trigger=IntervalTrigger(hours=1),
+        id="backfill_staff_stats",
+        name="Backfill daily staff statistics",
+        next_run_time=datetime.now(),
+        misfire_grace_time=None,
+        coalesce=True,
+        replace_existing=True,
+    )
+
+def schedule_eta_refresh():
+    print("[SCHEDULER] schedule_eta_refresh вызван")
+    scheduler.add_job(
+        refresh_eta_model,
+        trigger=IntervalTrigger(minutes=1),
+        id="refresh_eta_model",
+        name="Refresh order ETA model parameters",
+        next_run_time=datetime.now(),
+        misfire_grace_time=None,
+        coalesce=True,
+        replace_existing=True,
+    )
+
+def schedule_export_cleanup():
+    print("[SCHEDULER] schedule_export_cleanup вызван")
+    scheduler.add_job(
+        cleanup_exports,
+        trigger=IntervalTrigger(hours=1),
+        id="cleanup_exports",
+        name="Remove files of expired exports",
+        next_run_time=datetime.now(),
+        misfire_grace_time=None,
+        coalesce=True,
+        replace_existing=True,
+    )
+
 async def update_bookings_status():
     print("[SCHEDULER] update_bookings_status вызван")
     async with SessionLocal() as db:
@@ -57,4 +165,61 @@ async def update_bookings_status():
                 
         except Exception as e:
             print(f"[BookingUpdater Error] {e}")
-            await db.rollback()
\ No newline at end of file
+            await db.rollback()
+
+async def rebuild_popularity():
+    print("[SCHEDULER] rebuild_popularity вызван")
+    redis_client = await get_redis()
+    async with SessionLocal() as db:
+        try:
+            rows = await rebuild_popularity_counters(db, redis_client)
+            print(f"[SCHEDULER] Счетчики популярности пересобраны, строк агрегата: {rows}")
+        except Exception as e:
+            print(f"[PopularityRebuild Error] {e}")
+        finally:
+            await redis_client.aclose()
+
+async def train_recommender():
+    print("[SCHEDULER] train_recommender вызван")
+    async with SessionLocal() as db:
+        try:
+            version = await train_factor_model(db)
+            if version is None:
+                print("[SCHEDULER] Недостаточно данных для обучения модели рекомендаций")
+        except Exception as e:
+            print(f"[RecommenderTraining Error] {e}")
+
+async def backfill_staff_stats():
+    print("[SCHEDULER] backfill_staff_stats вызван")
+    redis_client = await get_redis()
+    async with SessionLocal() as db:
+        try:
+            rows = await backfill_staff_daily_stats(db, redis_client)
+            print(f"[SCHEDULER] Дневная статистика персонала обновлена, строк: {rows}")
+        except Exception as e:
+            print(f"[StaffStatsBackfill Error] {e}")
+            await db.rollback()
+        finally:
+            await redis_client.aclose()
+
+async def refresh_eta_model():
+    redis_client = await get_redis()
+    async with SessionLocal() as db:
+        try:
+            await refresh_eta_parameters(db, redis_client)
+        except Exception as e:
+            print(f"[EtaRefresh Error] {e}")
+        finally:
+            await redis_client.aclose()
+
+async def cleanup_exports():
+    print("[SCHEDULER] cleanup_exports вызван")
+    redis_client = await get_redis()
+    try:
+        removed = await purge_expired_exports(redis_client)
+        if removed:
+            print(f"[SCHEDULER] Удалено каталогов истекших выгрузок: {removed}")
+    except Exception as e:
+        print(f"[ExportCleanup Error] {e}")
+    finally:
+        await redis_client.aclose()
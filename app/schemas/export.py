@@ -0,0 +1,50 @@
+from datetime import date, datetime
+from enum import Enum
+from pydantic import BaseModel, Field
+
+class ExportFormat(str, Enum):
+    PARQUET = "parquet"
+    ARROW = "arrow"
+
+class ExportDataset(str, Enum):
+    ORDERS = "orders"
+    ORDER_ITEMS = "order_items"
+    ORDER_ASSIGNMENTS = "order_assignments"
+    REVIEWS = "reviews"
+    BOOKINGS = "bookings"
+
+class StreamFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+class ExportJobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class ExportJobCreate(BaseModel):
+    start_date: date
+    end_date: date
+    datasets: list[ExportDataset] = Field(default_factory=lambda: list(ExportDataset))
+    format: ExportFormat = ExportFormat.PARQUET
+
+class ExportFileOut(BaseModel):
+    dataset: ExportDataset
+    path: str
+    partition: date
+    rows: int
+    size_bytes: int
+
+class ExportJobOut(BaseModel):
+    job_id: str
+    status: ExportJobStatus
+    format: ExportFormat
+    datasets: list[ExportDataset]
+    start_date: date
+    end_date: date
+    rows: int = 0
+    files: list[ExportFileOut] = []
+    error: str | None = None
+    created_at: datetime
+    finished_at: datetime | None = None
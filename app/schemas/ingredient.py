@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from decimal import Decimal
 
 class IngredientCreate(BaseModel):
@@ -6,11 +6,16 @@ class IngredientCreate(BaseModel):
     unit: str
     quantity: Decimal
     threshold: Decimal
+    unit_cost: Decimal | None = None
     
+class IngredientCostUpdate(BaseModel):
+    unit_cost: Decimal = Field(ge=0)  # Себестоимость единицы измерения
+
 class IngredientOut(BaseModel):
     ingredient_id: int
     name: str
     unit: str
+    unit_cost: Decimal | None = None
 
     model_config = {
         "from_attributes": True
@@ -0,0 +1,51 @@
+from datetime import datetime
+from pydantic import BaseModel
+
+class JobMetricsOut(BaseModel):
+    job_id: str
+    runs: int
+    errors: int
+    misfires: int
+    last_duration: float | None
+    avg_duration: float | None
+    max_duration: float
+    last_lag: float | None
+    max_lag: float
+    last_run_at: datetime | None
+
+class SchedulerMetricsOut(BaseModel):
+    is_leader: bool
+    worker: str
+    running: bool
+    jobs: list[JobMetricsOut]
+
+class AnalyticsMetricsOut(BaseModel):
+    rows: dict[str, int]
+    memory_bytes: int
+    memory_budget_bytes: int
+    watermark: int
+    snapshot_age_seconds: float | None
+    rebuild_age_seconds: float | None
+    coverage_from: datetime | None
+
+class RealtimeStatsOut(BaseModel):
+    total: int
+    users: int
+    live: int
+    roles: dict[str, int]
+    topics: int
+    subscriptions: int
+    queue_depth: int
+    max_queue_depth: int
+    policy: str
+    sent: int
+    dropped: int
+    coalesced: int
+    overflows: int
+    disconnected: int
+    merged: int
+    last_seq: int
+    replayed: int
+    resyncs: int
+    reaped: int
+    evicted: int
@@ -37,11 +37,16 @@ class OrderOut(BaseModel):
     status: OrderStatus
     items: List[OrderItemOut]
     comment: str | None = None
+    estimated_ready_at: datetime | None = None
 
     model_config = {
         "from_attributes": True
     }
 
+class OrderSnapshotOut(BaseModel):
+    version: int
+    order: OrderOut
+
 class OrderAssignmentCreate(BaseModel):
     user_id: int
     role: StaffRole
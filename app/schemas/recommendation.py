@@ -1,13 +1,27 @@
+from enum import Enum
 from pydantic import BaseModel
 
 from app.models.menu_items import MenuCategory
 
+class PopularityDecay(str, Enum):
+    NONE = "none"
+    WEEK = "week"
+    MONTH = "month"
+    QUARTER = "quarter"
+
 class RecommendedItem(BaseModel):
     item_id: int
     name: str
     category: MenuCategory
     order_count: int
+    score: float | None = None
 
     model_config = {
         "from_attributes": True
     }
+
+class HomeRecommendations(BaseModel):
+    popular_food: list[RecommendedItem]
+    popular_drinks: list[RecommendedItem]
+    personal_food: list[RecommendedItem]
+    personal_drinks: list[RecommendedItem]
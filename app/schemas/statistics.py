@@ -1,6 +1,9 @@
 from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Any
 from enum import Enum
 
+from app.models.menu_items import MenuCategory
 from app.models.order_assignments import StaffRole
 
 class StaffStatsOut(BaseModel):
@@ -21,4 +24,74 @@ class StaffStatsWithRankOut(BaseModel):
 
     model_config = {
         "from_attributes": True
-    }
\ No newline at end of file
+    }
+
+class StaffStatsSort(str, Enum):
+    ORDERS_COUNT = "orders_count"
+    USER_ID = "user_id"
+    ROLE = "role"
+
+class SalesGranularity(str, Enum):
+    HOUR = "hour"
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+class SalesBucketOut(BaseModel):
+    bucket: datetime
+    category: MenuCategory | None = None
+    table_number: int | None = None
+    revenue: float
+    orders_count: int
+    average_ticket: float
+    items_quantity: int
+
+class PrepTimeGroup(str, Enum):
+    ITEM = "item"
+    CATEGORY = "category"
+    STATION = "station"
+    HOUR = "hour"
+
+class PrepTimeOut(BaseModel):
+    key: str
+    name: str | None = None
+    count: int
+    p50_seconds: float
+    p90_seconds: float
+    p99_seconds: float
+
+class AnalyticsTable(str, Enum):
+    ORDERS = "orders"
+    ORDER_ITEMS = "order_items"
+    ASSIGNMENTS = "assignments"
+    REVIEWS = "reviews"
+
+class AnalyticsAggregation(str, Enum):
+    COUNT = "count"
+    SUM = "sum"
+    MEAN = "mean"
+
+class AnalyticsReportOut(BaseModel):
+    snapshot_age_seconds: float | None
+    rows: list[dict[str, Any]]
+
+class MenuEngineeringClass(str, Enum):
+    STAR = "star"
+    PLOWHORSE = "plowhorse"
+    PUZZLE = "puzzle"
+    DOG = "dog"
+
+class MenuEngineeringItemOut(BaseModel):
+    item_id: int
+    name: str
+    category: MenuCategory
+    sold: int
+    revenue: float
+    unit_price: float
+    unit_cost: float
+    cost_complete: bool
+    unit_margin: float
+    total_margin: float
+    popularity_share: float
+    menu_class: MenuEngineeringClass
+    abc_class: str
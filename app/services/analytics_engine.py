@@ -0,0 +1,323 @@
+import asyncio
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import Config
+from app.models.menu_items import MenuItem, MenuCategory
+from app.models.orders import Order, OrderStatus
+from app.models.order_items import OrderItem, OrderItemStatus
+from app.models.order_assignments import OrderAssignment, StaffRole
+from app.models.reviews import Review
+
+SYNC_INTERVAL = 30
+REBUILD_INTERVAL = 3600
+
+# Незавершенные заказы перечитываются при каждой синхронизации, завершенные и отмененные больше не меняются
+OPEN_STATUSES = [OrderStatus.PENDING, OrderStatus.IN_PROGRESS, OrderStatus.READY]
+
+# Схемы таблиц: имя колонки -> тип. Перечисления хранятся кодами uint8 со словарем значений
+SCHEMAS = {
+    "orders": {
+        "order_id": np.int32, "user_id": np.int32, "table_number": np.int32,
+        "status": np.uint8, "total_price": np.float64, "order_date": "datetime64[s]",
+    },
+    "order_items": {
+        "order_item_id": np.int32, "order_id": np.int32, "item_id": np.int32, "category": np.uint8,
+        "status": np.uint8, "quantity": np.int32, "price": np.float64, "revenue": np.float64,
+        "order_date": "datetime64[s]",
+    },
+    "assignments": {
+        "order_id": np.int32, "user_id": np.int32, "role": np.uint8, "order_date": "datetime64[s]",
+    },
+    "reviews": {
+        "review_id": np.int32, "order_id": np.int32, "user_id": np.int32, "rating": np.int8,
+        "review_date": "datetime64[s]",
+    },
+}
+DICTIONARIES = {
+    "orders": {"status": list(OrderStatus)},
+    "order_items": {"category": list(MenuCategory), "status": list(OrderItemStatus)},
+    "assignments": {"role": list(StaffRole)},
+    "reviews": {},
+}
+DATE_COLUMNS = {"orders": "order_date", "order_items": "order_date", "assignments": "order_date", "reviews": "review_date"}
+# Производные ключи группировки по колонке даты таблицы
+DERIVED_KEYS = ("day", "hour", "weekday")
+AGGREGATIONS = ("count", "sum", "mean")
+
+def _encode(dictionary: list, values) -> np.ndarray:
+    codes = {value: code for code, value in enumerate(dictionary)}
+    return np.fromiter((codes[type(dictionary[0])(value)] for value in values), dtype=np.uint8)
+
+class ColumnTable:
+    """Таблица из столбцов NumPy одинаковой длины"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.columns = {column: np.zeros(0, dtype=dtype) for column, dtype in SCHEMAS[name].items()}
+        self.dictionaries = DICTIONARIES[name]
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values())))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self.columns.values())
+
+    def append(self, rows: list[dict]) -> None:
+        if not rows:
+            return
+        for column, dtype in SCHEMAS[self.name].items():
+            values = [row[column] for row in rows]
+            if column in self.dictionaries:
+                array = _encode(self.dictionaries[column], values)
+            else:
+                array = np.array(values, dtype=dtype)
+            self.columns[column] = np.concatenate([self.columns[column], array])
+
+    # Оставить строки по маске или по массиву индексов
+    def keep(self, rows: np.ndarray) -> None:
+        self.columns = {column: values[rows] for column, values in self.columns.items()}
+
+    def decode(self, column: str, codes: np.ndarray) -> list:
+        if column in self.dictionaries:
+            dictionary = self.dictionaries[column]
+            return [dictionary[code].value for code in codes]
+        if np.issubdtype(codes.dtype, np.datetime64):
+            return [value.item().isoformat() for value in codes]
+        return codes.tolist()
+
+class AnalyticsEngine:
+    """Колоночный снимок заказов, позиций, назначений и отзывов в памяти воркера для отчетов администратора"""
+
+    def __init__(self, memory_budget: int | None = None):
+        self.memory_budget = memory_budget or Config.ANALYTICS_MEMORY_BUDGET_MB * 1024 * 1024
+        self.tables = {name: ColumnTable(name) for name in SCHEMAS}
+        self.watermark = 0
+        self.review_watermark = 0
+        self.coverage_from: datetime | None = None
+        self.built_at = 0.0
+        self.synced_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def ensure_fresh(self, db: AsyncSession) -> None:
+        if self.built_at and time.monotonic() - self.synced_at < SYNC_INTERVAL:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            if not self.built_at or now - self.built_at >= REBUILD_INTERVAL:
+                await self.rebuild(db)
+            elif now - self.synced_at >= SYNC_INTERVAL:
+                await self.sync(db)
+
+    # Полная загрузка в отдельный объект с последующей подменой: чтения не видят частичное состояние,
+    # а удаленные заказы пропадают из снимка
+    async def rebuild(self, db: AsyncSession) -> None:
+        started = time.perf_counter()
+        fresh = AnalyticsEngine(self.memory_budget)
+        await fresh.sync(db)
+        fresh.built_at = fresh.synced_at
+        for name, value in vars(fresh).items():
+            if name != "_lock":
+                setattr(self, name, value)
+        print(f"[ANALYTICS] Пересборка: {len(self.tables['orders'])} заказов, "
+              f"{self.nbytes / 1024 / 1024:.1f} MB - {time.perf_counter() - started:.3f}s")
+
+    async def sync(self, db: AsyncSession) -> None:
+        await self._refresh_open_orders(db)
+        await self._append_new_orders(db)
+        await self._append_new_reviews(db)
+        self._enforce_budget()
+        self.synced_at = time.monotonic()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(table.nbytes for table in self.tables.values())
+
+    async def _load_order_rows(self, db: AsyncSession, condition) -> tuple[list, list, list]:
+        orders = await db.execute(
+            select(Order.order_id, Order.user_id, Order.table_number, Order.status, Order.total_price, Order.order_date)
+            .where(condition)
+            .order_by(Order.order_id)
+        )
+        items = await db.execute(
+            select(
+                OrderItem.order_item_id, OrderItem.order_id, OrderItem.item_id, MenuItem.category,
+                OrderItem.status, OrderItem.quantity, OrderItem.price, Order.order_date
+            )
+            .join(Order, Order.order_id == OrderItem.order_id)
+            .join(MenuItem, MenuItem.item_id == OrderItem.item_id)
+            .where(condition)
+            .order_by(OrderItem.order_item_id)
+        )
+        assignments = await db.execute(
+            select(OrderAssignment.order_id, OrderAssignment.user_id, OrderAssignment.role, Order.order_date)
+            .join(Order, Order.order_id == OrderAssignment.order_id)
+            .where(condition)
+        )
+        return (
+            [{**row._mapping, "user_id": row.user_id if row.user_id is not None else -1} for row in orders.all()],
+            [{**row._mapping, "revenue": float(row.price) * row.quantity} for row in items.all()],
+            [dict(row._mapping) for row in assignments.all()],
+        )
+
+    async def _append_new_orders(self, db: AsyncSession) -> None:
+        orders, items, assignments = await self._load_order_rows(db, Order.order_id > self.watermark)
+        if not orders:
+            return
+        self.tables["orders"].append(orders)
+        self.tables["order_items"].append(items)
+        self.tables["assignments"].append(assignments)
+        self.watermark = max(row["order_id"] for row in orders)
+
+    # Перечитывание незавершенных заказов: статусы, позиции и назначения меняются до завершения заказа
+    async def _refresh_open_orders(self, db: AsyncSession) -> None:
+        table = self.tables["orders"]
+        open_codes = _encode(table.dictionaries["status"], OPEN_STATUSES)
+        open_ids = table.columns["order_id"][np.isin(table.columns["status"], open_codes)]
+        if not len(open_ids):
+            return
+
+        orders, items, assignments = await self._load_order_rows(db, Order.order_id.in_(open_ids.tolist()))
+        for name in SCHEMAS:
+            if name != "reviews":
+                current = self.tables[name]
+                current.keep(~np.isin(current.columns["order_id"], open_ids))
+        self.tables["orders"].append(orders)
+        self.tables["order_items"].append(items)
+        self.tables["assignments"].append(assignments)
+        for name in ("orders", "order_items"):
+            current = self.tables[name]
+            key = "order_id" if name == "orders" else "order_item_id"
+            current.keep(np.argsort(current.columns[key], kind="stable"))
+
+    async def _append_new_reviews(self, db: AsyncSession) -> None:
+        result = await db.execute(
+            select(Review.review_id, Review.order_id, Review.user_id, Review.rating, Review.review_date)
+            .where(Review.review_id > self.review_watermark)
+            .order_by(Review.review_id)
+        )
+        reviews = [dict(row._mapping) for row in result.all()]
+        if not reviews:
+            return
+        self.tables["reviews"].append(reviews)
+        self.review_watermark = reviews[-1]["review_id"]
+
+    # При превышении бюджета памяти из снимка удаляются самые старые заказы
+    def _enforce_budget(self) -> None:
+        total = self.nbytes
+        orders = self.tables["orders"]
+        if total <= self.memory_budget or not len(orders):
+            return
+        keep_share = self.memory_budget / total * 0.9
+        cutoff = np.quantile(orders.columns["order_date"].astype(np.int64), 1 - keep_share)
+        cutoff_date = np.datetime64(int(np.ceil(cutoff)), "s")
+        for name, table in self.tables.items():
+            table.keep(table.columns[DATE_COLUMNS[name]] >= cutoff_date)
+        self.coverage_from = cutoff_date.item()
+        print(f"[ANALYTICS] Превышен бюджет памяти, в снимке оставлены заказы с {self.coverage_from}")
+
+    def _key_column(self, table: ColumnTable, name: str, key: str) -> tuple[np.ndarray, str]:
+        if key in table.columns:
+            return table.columns[key], key
+        if key not in DERIVED_KEYS:
+            raise ValueError(f"Неизвестная колонка {key} таблицы {name}")
+        dates = table.columns[DATE_COLUMNS[name]]
+        days = dates.astype("datetime64[D]")
+        if key == "day":
+            return days, key
+        if key == "hour":
+            return ((dates - days) // np.timedelta64(1, "h")).astype(np.int64), key
+        # 1970-01-01 - четверг, понедельник имеет номер 0
+        return (days.astype(np.int64) + 3) % 7, key
+
+    def aggregate(
+        self,
+        name: str,
+        group_by: list[str] | None = None,
+        aggregation: str = "count",
+        column: str | None = None,
+        filters: dict | None = None,
+        date_from: date | None = None,
+        date_to: date | None = None,
+        descending: bool = True,
+        limit: int | None = None
+    ) -> list[dict]:
+        """Группировка с фильтрами и top-k по значению агрегата"""
+        if name not in self.tables:
+            raise ValueError(f"Неизвестная таблица {name}")
+        if aggregation not in AGGREGATIONS:
+            raise ValueError(f"Неизвестная агрегация {aggregation}")
+        table = self.tables[name]
+        if aggregation != "count" and (column not in table.columns or column in table.dictionaries):
+            raise ValueError(f"Колонку {column} нельзя агрегировать через {aggregation}")
+
+        mask = np.ones(len(table), dtype=bool)
+        dates = table.columns[DATE_COLUMNS[name]]
+        if date_from:
+            mask &= dates >= np.datetime64(datetime.combine(date_from, dt_time.min), "s")
+        if date_to:
+            mask &= dates < np.datetime64(datetime.combine(date_to + timedelta(days=1), dt_time.min), "s")
+        for key, value in (filters or {}).items():
+            if key not in table.columns:
+                raise ValueError(f"Неизвестная колонка {key} таблицы {name}")
+            if key in table.dictionaries:
+                try:
+                    value = _encode(table.dictionaries[key], [value])[0]
+                except ValueError:
+                    raise ValueError(f"Недопустимое значение {value} колонки {key}")
+            mask &= table.columns[key] == value
+
+        keys = [self._key_column(table, name, key) for key in group_by or []]
+        if keys:
+            stacked = np.stack([values[mask].astype(np.int64) for values, _ in keys], axis=1)
+            groups, inverse = np.unique(stacked, axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+        else:
+            groups, inverse = np.zeros((1, 0), dtype=np.int64), np.zeros(int(mask.sum()), dtype=np.int64)
+        if not len(inverse):
+            return []
+
+        counts = np.bincount(inverse, minlength=len(groups))
+        if aggregation == "count":
+            values = counts.astype(np.float64)
+        else:
+            values = np.bincount(inverse, weights=table.columns[column][mask].astype(np.float64), minlength=len(groups))
+            if aggregation == "mean":
+                values = values / counts
+
+        selected = np.arange(len(groups))
+        order_values = -values if descending else values
+        if limit and len(selected) > limit:
+            selected = np.argpartition(order_values, limit - 1)[:limit]
+        selected = selected[np.argsort(order_values[selected], kind="stable")]
+
+        decoded = [
+            (key, table.decode(key, groups[selected, position].astype(values_column.dtype)))
+            for position, (values_column, key) in enumerate(keys)
+        ]
+        result = []
+        for row_index, group_index in enumerate(selected):
+            row = {key: values_decoded[row_index] for key, values_decoded in decoded}
+            row["count"] = int(counts[group_index])
+            row["value"] = round(float(values[group_index]), 4)
+            result.append(row)
+        return result
+
+    def metrics(self) -> dict:
+        now = time.monotonic()
+        return {
+            "rows": {name: len(table) for name, table in self.tables.items()},
+            "memory_bytes": self.nbytes,
+            "memory_budget_bytes": self.memory_budget,
+            "watermark": self.watermark,
+            "snapshot_age_seconds": round(now - self.synced_at, 3) if self.built_at else None,
+            "rebuild_age_seconds": round(now - self.built_at, 3) if self.built_at else None,
+            "coverage_from": self.coverage_from,
+        }
+
+analytics_engine = AnalyticsEngine()
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import Config
+from app.models.orders import Order
+from app.models.order_items import OrderItem
+from app.models.menu_items import MenuItem, MenuCategory
+from app.schemas.recommendation import RecommendedItem
+
+CURRENT_FILE = "CURRENT"
+RELOAD_INTERVAL = 30
+ALS_REGULARIZATION = 0.01
+
+def _sparse_dot(rows: np.ndarray, cols: np.ndarray, values: np.ndarray,
+                factors: np.ndarray, n_rows: int) -> np.ndarray:
+    """Произведение разреженной матрицы (координаты и значения ненулевых ячеек) на плотную матрицу факторов"""
+    weighted = values[:, None] * factors[cols]
+    return np.stack(
+        [np.bincount(rows, weights=weighted[:, j], minlength=n_rows) for j in range(factors.shape[1])], axis=1
+    )
+
+def _factorize(user_idx: np.ndarray, item_idx: np.ndarray, counts: np.ndarray,
+               n_users: int, n_items: int, rank: int, iterations: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """Факторы ранга rank матрицы взаимодействий log(1 + число заказов) методом ALS.
+
+    Минимизируется та же ошибка по всей матрице (отсутствующие пары - нули), что и у усеченного SVD, но матрица
+    не разворачивается в плотную: каждый шаг - произведение по ненулевым ячейкам и решение системы rank x rank,
+    память и время растут с числом взаимодействий, а не с n_users * n_items.
+    """
+    iterations = iterations or Config.RECOMMENDER_ALS_ITERATIONS
+    rank = max(min(rank, n_users, n_items), 1)
+    values = np.log1p(counts).astype(np.float64)
+    regularization = ALS_REGULARIZATION * np.eye(rank)
+
+    rng = np.random.default_rng(0)
+    item_factors = rng.normal(scale=0.1, size=(n_items, rank))
+    user_factors = np.zeros((n_users, rank))
+    for _ in range(iterations):
+        user_factors = np.linalg.solve(
+            item_factors.T @ item_factors + regularization,
+            _sparse_dot(user_idx, item_idx, values, item_factors, n_users).T
+        ).T
+        item_factors = np.linalg.solve(
+            user_factors.T @ user_factors + regularization,
+            _sparse_dot(item_idx, user_idx, values, user_factors, n_items).T
+        ).T
+    return user_factors.astype(np.float32), item_factors.astype(np.float32)
+
+def _write_model(model_dir: str, arrays: dict[str, np.ndarray], items: list[dict]) -> str:
+    version = f"model-{int(time.time())}"
+    target = os.path.join(model_dir, version)
+    os.makedirs(target, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(target, f"{name}.npy"), array)
+    with open(os.path.join(target, "items.json"), "w", encoding="utf-8") as f:
+        json.dump(items, f, ensure_ascii=False)
+
+    # Атомарное переключение на новую версию, старые версии удаляются
+    pointer = os.path.join(model_dir, CURRENT_FILE)
+    with open(pointer + ".tmp", "w") as f:
+        f.write(version)
+    os.replace(pointer + ".tmp", pointer)
+    for name in os.listdir(model_dir):
+        if name.startswith("model-") and name != version:
+            shutil.rmtree(os.path.join(model_dir, name), ignore_errors=True)
+    return version
+
+# Офлайн-обучение модели по истории заказов
+async def train_factor_model(db: AsyncSession, model_dir: str | None = None, rank: int | None = None) -> str | None:
+    model_dir = model_dir or Config.RECOMMENDER_MODEL_DIR
+    rank = rank or Config.RECOMMENDER_RANK
+
+    result = await db.execute(
+        select(Order.user_id, OrderItem.item_id, func.count(OrderItem.order_item_id).label("order_count"))
+        .join(OrderItem, OrderItem.order_id == Order.order_id)
+        .where(Order.user_id.is_not(None))
+        .group_by(Order.user_id, OrderItem.item_id)
+        .order_by(Order.user_id, OrderItem.item_id)
+    )
+    rows = result.all()
+    items_result = await db.execute(select(MenuItem.item_id, MenuItem.name, MenuItem.category).order_by(MenuItem.item_id))
+    items = items_result.all()
+    if not rows or not items:
+        return None
+
+    item_ids = np.array([row.item_id for row in items], dtype=np.int32)
+    interaction_users = np.fromiter((row.user_id for row in rows), dtype=np.int32, count=len(rows))
+    interaction_items = np.fromiter((row.item_id for row in rows), dtype=np.int32, count=len(rows))
+    counts = np.fromiter((row.order_count for row in rows), dtype=np.int32, count=len(rows))
+
+    known = np.isin(interaction_items, item_ids)
+    interaction_users, interaction_items, counts = interaction_users[known], interaction_items[known], counts[known]
+    user_ids, user_idx = np.unique(interaction_users, return_inverse=True)
+    item_idx = np.searchsorted(item_ids, interaction_items)
+
+    user_factors, item_factors = await asyncio.to_thread(
+        _factorize, user_idx, item_idx, counts, len(user_ids), len(item_ids), rank
+    )
+
+    # Собственные счетчики пользователей в формате CSR (строки уже отсортированы по пользователю)
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(user_idx, minlength=len(user_ids)))]).astype(np.int32)
+
+    arrays = {
+        "user_ids": user_ids.astype(np.int32),
+        "item_ids": item_ids,
+        "item_is_drink": np.array([row.category == MenuCategory.DRINK for row in items], dtype=bool),
+        "user_factors": user_factors,
+        "item_factors": item_factors,
+        "counts_indptr": indptr,
+        "counts_indices": item_idx.astype(np.int32),
+        "counts_data": counts,
+    }
+    meta = [{"name": row.name, "category": MenuCategory(row.category).value} for row in items]
+    version = await asyncio.to_thread(_write_model, model_dir, arrays, meta)
+    print(f"[RECOMMENDER] Модель {version}: {len(user_ids)} пользователей, {len(item_ids)} позиций, ранг {user_factors.shape[1]}")
+    return version
+
+class FactorModel:
+    """Факторы пользователей и позиций, загруженные через memory mapping"""
+
+    def __init__(self, model_dir: str | None = None):
+        self.model_dir = model_dir or Config.RECOMMENDER_MODEL_DIR
+        self.version: str | None = None
+        self.arrays: dict[str, np.ndarray] = {}
+        self.items: list[dict] = []
+        self.user_index: dict[int, int] = {}
+        self.checked_at = 0.0
+
+    def _reload_if_changed(self) -> None:
+        now = time.monotonic()
+        if self.checked_at and now - self.checked_at < RELOAD_INTERVAL:
+            return
+        self.checked_at = now
+        try:
+            with open(os.path.join(self.model_dir, CURRENT_FILE)) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return
+        if version == self.version:
+            return
+
+        path = os.path.join(self.model_dir, version)
+        try:
+            arrays = {
+                name[:-4]: np.load(os.path.join(path, name), mmap_mode="r")
+                for name in os.listdir(path) if name.endswith(".npy")
+            }
+            with open(os.path.join(path, "items.json"), encoding="utf-8") as f:
+                items = json.load(f)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"[RECOMMENDER Error] Не удалось загрузить модель {version}: {e}")
+            return
+        self.arrays = arrays
+        self.items = items
+        self.user_index = {int(user_id): i for i, user_id in enumerate(arrays["user_ids"])}
+        self.version = version
+        print(f"[RECOMMENDER] Загружена модель {version}")
+
+    def recommend(self, user_id: int, drinks: bool, limit: int = 5) -> list[RecommendedItem] | None:
+        """Top-k по скалярному произведению факторов; None, если пользователя нет в модели"""
+        self._reload_if_changed()
+        u = self.user_index.get(user_id)
+        if u is None:
+            return None
+        if limit <= 0:
+            return []
+
+        arrays = self.arrays
+        scores = arrays["item_factors"] @ arrays["user_factors"][u]
+        candidates = np.flatnonzero(arrays["item_is_drink"] == drinks)
+        if not len(candidates):
+            return []
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        start, end = arrays["counts_indptr"][u], arrays["counts_indptr"][u + 1]
+        own_counts = dict(zip(arrays["counts_indices"][start:end].tolist(), arrays["counts_data"][start:end].tolist()))
+
+        return [RecommendedItem(
+            item_id=int(arrays["item_ids"][i]),
+            name=self.items[i]["name"],
+            category=self.items[i]["category"],
+            order_count=own_counts.get(int(i), 0),
+            score=round(float(scores[i]), 4)
+        ) for i in candidates]
+
+factor_model = FactorModel()
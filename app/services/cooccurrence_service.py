@@ -0,0 +1,195 @@
+import asyncio
+import time
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import SessionLocal
+from app.models.order_items import OrderItem
+from app.models.menu_items import MenuItem
+from app.schemas.recommendation import RecommendedItem
+
+SYNC_INTERVAL = 30
+REBUILD_INTERVAL = 6 * 3600
+
+def _basket_pairs(order_ids: np.ndarray, item_idx: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Все упорядоченные пары различных позиций внутри каждого заказа"""
+    baskets = np.unique(np.stack([order_ids, item_idx], axis=1), axis=0)
+    orders, items = baskets[:, 0], baskets[:, 1]
+
+    _, starts, sizes = np.unique(orders, return_index=True, return_counts=True)
+    elem_starts = np.repeat(starts, sizes)
+    elem_sizes = np.repeat(sizes, sizes)
+
+    left = np.repeat(items, elem_sizes)
+    offsets = np.arange(len(left)) - np.repeat(np.cumsum(elem_sizes) - elem_sizes, elem_sizes)
+    right = items[np.repeat(elem_starts, elem_sizes) + offsets]
+
+    distinct = left != right
+    return left[distinct], right[distinct]
+
+class CooccurrenceIndex:
+    """Матрица совместных заказов позиций в формате CSR, хранимая в памяти воркера.
+
+    Строка i содержит позиции, заказанные вместе с позицией i, и число таких заказов.
+    """
+
+    def __init__(self):
+        self.item_ids = np.zeros(0, dtype=np.int32)
+        self.available = np.zeros(0, dtype=bool)
+        self.names: list[str] = []
+        self.categories: list = []
+        self.index: dict[int, int] = {}
+        self.item_orders = np.zeros(0, dtype=np.int32)
+        self.indptr = np.zeros(1, dtype=np.int32)
+        self.indices = np.zeros(0, dtype=np.int32)
+        self.data = np.zeros(0, dtype=np.int32)
+        self.watermark = 0
+        self.built_at = 0.0
+        self.synced_at = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: asyncio.Task | None = None
+
+    # Первая сборка выполняется синхронно, дальше обновление идет в фоне и не задерживает ответ
+    async def ensure_ready(self, db: AsyncSession) -> None:
+        if not self.built_at:
+            async with self._lock:
+                if not self.built_at:
+                    await self.rebuild(db)
+            return
+        if time.monotonic() - self.synced_at >= SYNC_INTERVAL and not self._refresh_task:
+            self._refresh_task = asyncio.create_task(self._refresh())
+
+    async def _refresh(self) -> None:
+        try:
+            async with self._lock:
+                async with SessionLocal() as db:
+                    if time.monotonic() - self.built_at >= REBUILD_INTERVAL:
+                        await self.rebuild(db)
+                    else:
+                        await self.sync(db)
+        except Exception as e:
+            print(f"[COOCCURRENCE Error] {e}")
+        finally:
+            self._refresh_task = None
+
+    # Полная пересборка по всей истории заказов
+    async def rebuild(self, db: AsyncSession) -> None:
+        started = time.perf_counter()
+        fresh = CooccurrenceIndex()
+        await fresh._load_items(db)
+        rows = await fresh._apply_new_orders(db)
+        fresh.built_at = fresh.synced_at = time.monotonic()
+        for name, value in vars(fresh).items():
+            if name not in ("_lock", "_refresh_task"):
+                setattr(self, name, value)
+        print(f"[COOCCURRENCE] Пересборка: {rows} строк, {len(self.indices)} пар - {time.perf_counter() - started:.3f}s")
+
+    # Инкрементальное добавление новых заказов и обновление доступности позиций
+    async def sync(self, db: AsyncSession) -> None:
+        await self._load_items(db)
+        await self._apply_new_orders(db)
+        self.synced_at = time.monotonic()
+
+    async def _load_items(self, db: AsyncSession) -> None:
+        result = await db.execute(
+            select(MenuItem.item_id, MenuItem.name, MenuItem.category, MenuItem.is_available).order_by(MenuItem.item_id)
+        )
+        items = result.all()
+        known = [row for row in items if row.item_id in self.index]
+        new = [row for row in items if row.item_id not in self.index]
+
+        for row in known:
+            i = self.index[row.item_id]
+            self.names[i] = row.name
+            self.categories[i] = row.category
+        available = self.available.copy()
+        present = np.zeros(len(self.item_ids), dtype=bool)
+        for row in known:
+            available[self.index[row.item_id]] = bool(row.is_available)
+            present[self.index[row.item_id]] = True
+        # Удаленные позиции больше не рекомендуются
+        available &= present
+
+        if new:
+            start = len(self.item_ids)
+            self.item_ids = np.concatenate([self.item_ids, np.array([row.item_id for row in new], dtype=np.int32)])
+            available = np.concatenate([available, np.array([bool(row.is_available) for row in new])])
+            self.names.extend(row.name for row in new)
+            self.categories.extend(row.category for row in new)
+            self.index.update({row.item_id: start + i for i, row in enumerate(new)})
+            self.item_orders = np.concatenate([self.item_orders, np.zeros(len(new), dtype=np.int32)])
+            self.indptr = np.concatenate([self.indptr, np.full(len(new), self.indptr[-1], dtype=np.int32)])
+        self.available = available
+
+    async def _apply_new_orders(self, db: AsyncSession) -> int:
+        result = await db.execute(
+            select(OrderItem.order_id, OrderItem.item_id).where(OrderItem.order_id > self.watermark)
+        )
+        rows = result.all()
+        if not rows:
+            return 0
+        self.watermark = max(self.watermark, max(row.order_id for row in rows))
+
+        order_ids = np.fromiter((row.order_id for row in rows), dtype=np.int64, count=len(rows))
+        item_idx = np.fromiter((self.index.get(row.item_id, -1) for row in rows), dtype=np.int64, count=len(rows))
+        known = item_idx >= 0
+        order_ids, item_idx = order_ids[known], item_idx[known]
+        if not len(item_idx):
+            return 0
+
+        n_items = len(self.item_ids)
+        baskets = np.unique(order_ids * n_items + item_idx)
+        self.item_orders = self.item_orders + np.bincount(baskets % n_items, minlength=n_items).astype(np.int32)
+
+        left, right = _basket_pairs(order_ids, item_idx)
+        self._merge_pairs(left, right)
+        return len(item_idx)
+
+    # Слияние новых пар с текущей матрицей: CSR -> коды пар -> сумма по уникальным кодам -> CSR
+    def _merge_pairs(self, left: np.ndarray, right: np.ndarray) -> None:
+        n_items = len(self.item_ids)
+        rows = np.repeat(np.arange(n_items, dtype=np.int64), np.diff(self.indptr))
+        codes = np.concatenate([rows * n_items + self.indices, left * n_items + right])
+        counts = np.concatenate([self.data, np.ones(len(left), dtype=np.int32)])
+
+        unique_codes, inverse = np.unique(codes, return_inverse=True)
+        summed = np.bincount(inverse, weights=counts).astype(np.int32)
+
+        pair_rows = unique_codes // n_items
+        self.indices = (unique_codes % n_items).astype(np.int32)
+        self.data = summed
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(pair_rows, minlength=n_items))]).astype(np.int32)
+
+    def recommend(self, item_ids: list[int], limit: int = 5) -> list[RecommendedItem]:
+        cart = [self.index[item_id] for item_id in set(item_ids) if item_id in self.index]
+        if not cart or limit <= 0:
+            return []
+
+        n_items = len(self.item_ids)
+        scores = np.zeros(n_items)
+        together = np.zeros(n_items, dtype=np.int64)
+        for i in cart:
+            start, end = self.indptr[i], self.indptr[i + 1]
+            neighbours, counts = self.indices[start:end], self.data[start:end]
+            # Условная вероятность заказать позицию вместе с позицией из корзины
+            scores[neighbours] += counts / max(self.item_orders[i], 1)
+            together[neighbours] += counts
+
+        scores[cart] = 0
+        scores[~self.available] = 0
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        return [RecommendedItem(
+            item_id=int(self.item_ids[i]),
+            name=self.names[i],
+            category=self.categories[i],
+            order_count=int(together[i]),
+            score=round(float(scores[i]), 4)
+        ) for i in candidates]
+
+cooccurrence_index = CooccurrenceIndex()
@@ -0,0 +1,136 @@
+import json
+import time
+from datetime import date, datetime, timedelta
+
+from redis.asyncio import Redis
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.menu_items import MenuItem, MenuCategory
+from app.models.orders import Order, OrderStatus
+from app.models.order_items import OrderItem, OrderItemStatus
+from app.models.user import User, UserRole
+from app.services.prep_time_service import BAR, KITCHEN, median_prep_times
+from app.services.shift_service import get_active_shifts
+
+# Параметры модели пересчитываются задачей планировщика и раздаются воркерам через Redis
+ETA_MODEL_KEY = "eta:model"
+RELOAD_INTERVAL = 15
+HISTORY_DAYS = 30
+
+DEFAULT_PREP_SECONDS = 900.0
+MIN_REMAINING_SECONDS = 60.0
+# Сколько позиций один сотрудник цеха готовит одновременно
+ITEMS_PER_STAFF = 3
+
+STATION_ROLES = {UserRole.COOK: KITCHEN, UserRole.BARKEEPER: BAR}
+
+# Пакетный расчет параметров: медианы времени приготовления, очередь позиций и число сотрудников на смене по цехам
+async def compute_eta_parameters(db: AsyncSession) -> dict:
+    item_prep, station_prep = await median_prep_times(db, date.today() - timedelta(days=HISTORY_DAYS))
+
+    drinks_result = await db.execute(select(MenuItem.item_id).where(MenuItem.category == MenuCategory.DRINK))
+    drink_items = [row.item_id for row in drinks_result.all()]
+
+    queue_result = await db.execute(
+        select(MenuItem.category == MenuCategory.DRINK, func.count(OrderItem.order_item_id))
+        .join(OrderItem, OrderItem.item_id == MenuItem.item_id)
+        .join(Order, Order.order_id == OrderItem.order_id)
+        .where(
+            OrderItem.status.in_([OrderItemStatus.PENDING, OrderItemStatus.IN_PROGRESS]),
+            Order.status.in_([OrderStatus.PENDING, OrderStatus.IN_PROGRESS])
+        )
+        .group_by(MenuItem.category == MenuCategory.DRINK)
+    )
+    queue = {BAR if is_drink else KITCHEN: count for is_drink, count in queue_result.all()}
+
+    shifts = await get_active_shifts(db)
+    staff = {KITCHEN: 0, BAR: 0}
+    if shifts:
+        roles_result = await db.execute(select(User.role).where(User.user_id.in_({shift.user_id for shift in shifts})))
+        for role in roles_result.scalars().all():
+            if role in STATION_ROLES:
+                staff[STATION_ROLES[role]] += 1
+
+    return {
+        "computed_at": datetime.now().isoformat(),
+        "item_prep": item_prep,
+        "station_prep": station_prep,
+        "drink_items": drink_items,
+        "queue": queue,
+        "staff": staff,
+    }
+
+async def refresh_eta_parameters(db: AsyncSession, redis: Redis) -> dict:
+    parameters = await compute_eta_parameters(db)
+    await redis.set(ETA_MODEL_KEY, json.dumps(parameters))
+    return parameters
+
+class EtaModel:
+    """Оценка времени готовности заказа по параметрам, хранимым в памяти воркера"""
+
+    def __init__(self):
+        self.item_prep: dict[int, float] = {}
+        self.station_prep: dict[str, float] = {}
+        self.drink_items: set[int] = set()
+        self.queue: dict[str, int] = {}
+        self.staff: dict[str, int] = {}
+        self.computed_at: str | None = None
+        self.checked_at = 0.0
+
+    def load(self, parameters: dict) -> None:
+        self.item_prep = {int(item_id): seconds for item_id, seconds in parameters["item_prep"].items()}
+        self.station_prep = parameters["station_prep"]
+        self.drink_items = set(parameters["drink_items"])
+        self.queue = parameters["queue"]
+        self.staff = parameters["staff"]
+        self.computed_at = parameters["computed_at"]
+
+    # Подхват новых параметров не чаще раза в RELOAD_INTERVAL секунд
+    async def ensure_loaded(self, redis: Redis) -> None:
+        now = time.monotonic()
+        if self.checked_at and now - self.checked_at < RELOAD_INTERVAL:
+            return
+        self.checked_at = now
+        try:
+            raw = await redis.get(ETA_MODEL_KEY)
+        except Exception as e:
+            print(f"[ETA Error] {e}")
+            return
+        if raw:
+            parameters = json.loads(raw)
+            if parameters["computed_at"] != self.computed_at:
+                self.load(parameters)
+
+    def _station_wait(self, station: str) -> float:
+        staff = max(self.staff.get(station, 0), 1)
+        return self.queue.get(station, 0) * self.station_prep.get(station, DEFAULT_PREP_SECONDS) / (staff * ITEMS_PER_STAFF)
+
+    def estimate(self, order: dict, now: datetime | None = None) -> datetime | None:
+        """Ожидаемое время готовности заказа (словарь OrderOut); None для готовых, выданных и отмененных"""
+        if OrderStatus(order["status"]) not in (OrderStatus.PENDING, OrderStatus.IN_PROGRESS):
+            return None
+        now = (now or datetime.now()).replace(microsecond=0)
+        order_date = order["order_date"]
+        if isinstance(order_date, str):
+            order_date = datetime.fromisoformat(order_date)
+        elapsed = (now - order_date).total_seconds()
+
+        remaining = 0.0
+        for item in order["items"]:
+            item_status = OrderItemStatus(item["status"])
+            if item_status in (OrderItemStatus.READY, OrderItemStatus.COMPLETED):
+                continue
+            station = BAR if item["item_id"] in self.drink_items else KITCHEN
+            prep = self.item_prep.get(item["item_id"], self.station_prep.get(station, DEFAULT_PREP_SECONDS))
+            if item_status == OrderItemStatus.PENDING:
+                item_remaining = self._station_wait(station) + prep
+            else:
+                item_remaining = max(prep - elapsed, MIN_REMAINING_SECONDS)
+            remaining = max(remaining, item_remaining)
+        return now + timedelta(seconds=round(remaining))
+
+    def with_eta(self, order: dict) -> dict:
+        return {**order, "estimated_ready_at": self.estimate(order)}
+
+eta_model = EtaModel()
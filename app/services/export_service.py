@@ -0,0 +1,398 @@
+import asyncio
+import csv
+import io
+import json
+import zlib
+import os
+import shutil
+import uuid
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from enum import Enum
+from typing import AsyncIterator
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from redis.asyncio import Redis
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import Config
+from app.database import SessionLocal
+from app.models.orders import Order
+from app.models.order_items import OrderItem
+from app.models.order_assignments import OrderAssignment
+from app.models.reviews import Review
+from app.models.table_booking import TableBooking
+from app.redis import get_redis
+from app.schemas.export import ExportDataset, ExportFileOut, ExportFormat, ExportJobCreate, ExportJobOut, ExportJobStatus, StreamFormat
+
+# Метаданные заданий выгрузки хранятся в Redis, файлы - в EXPORT_DIR/<job_id>
+JOB_KEY = "export:job:{job_id}"
+JOB_TTL = 7 * 24 * 3600
+BATCH_SIZE = 5000
+MAX_RANGE_DAYS = 366
+MANIFEST_FILE = "_manifest.json"
+
+# Ссылки на фоновые задачи, чтобы их не собрал сборщик мусора
+_running: set[asyncio.Task] = set()
+
+MONEY = pa.decimal128(10, 2)
+
+# Для каждого набора: запрос (первая колонка - дата партиции) и схема Arrow
+SCHEMAS = {
+    ExportDataset.ORDERS: pa.schema([
+        ("order_date", pa.timestamp("us")),
+        ("order_id", pa.int64()),
+        ("user_id", pa.int64()),
+        ("total_price", MONEY),
+        ("status", pa.string()),
+        ("table_number", pa.int32()),
+        ("comment", pa.string()),
+    ]),
+    ExportDataset.ORDER_ITEMS: pa.schema([
+        ("order_date", pa.timestamp("us")),
+        ("order_item_id", pa.int64()),
+        ("order_id", pa.int64()),
+        ("item_id", pa.int64()),
+        ("quantity", pa.int32()),
+        ("price", MONEY),
+        ("status", pa.string()),
+    ]),
+    ExportDataset.ORDER_ASSIGNMENTS: pa.schema([
+        ("order_date", pa.timestamp("us")),
+        ("id", pa.int64()),
+        ("order_id", pa.int64()),
+        ("user_id", pa.int64()),
+        ("role", pa.string()),
+    ]),
+    ExportDataset.REVIEWS: pa.schema([
+        ("review_date", pa.timestamp("us")),
+        ("review_id", pa.int64()),
+        ("user_id", pa.int64()),
+        ("order_id", pa.int64()),
+        ("rating", pa.int32()),
+        ("comment", pa.string()),
+        ("admin_response", pa.string()),
+    ]),
+    ExportDataset.BOOKINGS: pa.schema([
+        ("booking_time", pa.timestamp("us")),
+        ("booking_id", pa.int64()),
+        ("table_number", pa.int32()),
+        ("customer_name", pa.string()),
+        ("phone_number", pa.string()),
+        ("user_id", pa.int64()),
+        ("status", pa.string()),
+        ("duration_minutes", pa.int32()),
+    ]),
+}
+
+def _statement(dataset: ExportDataset, start: datetime | None, end: datetime | None) -> Select:
+    if dataset == ExportDataset.ORDERS:
+        stmt = select(
+            Order.order_date, Order.order_id, Order.user_id, Order.total_price,
+            Order.status, Order.table_number, Order.comment
+        )
+        date_column, key = Order.order_date, Order.order_id
+    elif dataset == ExportDataset.ORDER_ITEMS:
+        stmt = select(
+            Order.order_date, OrderItem.order_item_id, OrderItem.order_id, OrderItem.item_id,
+            OrderItem.quantity, OrderItem.price, OrderItem.status
+        ).join(Order, Order.order_id == OrderItem.order_id)
+        date_column, key = Order.order_date, OrderItem.order_item_id
+    elif dataset == ExportDataset.ORDER_ASSIGNMENTS:
+        stmt = select(
+            Order.order_date, OrderAssignment.id, OrderAssignment.order_id,
+            OrderAssignment.user_id, OrderAssignment.role
+        ).join(Order, Order.order_id == OrderAssignment.order_id)
+        date_column, key = Order.order_date, OrderAssignment.id
+    elif dataset == ExportDataset.REVIEWS:
+        stmt = select(
+            Review.review_date, Review.review_id, Review.user_id, Review.order_id,
+            Review.rating, Review.comment, Review.admin_response
+        )
+        date_column, key = Review.review_date, Review.review_id
+    else:
+        stmt = select(
+            TableBooking.booking_time, TableBooking.booking_id, TableBooking.table_number, TableBooking.customer_name,
+            TableBooking.phone_number, TableBooking.user_id, TableBooking.status, TableBooking.duration_minutes
+        )
+        date_column, key = TableBooking.booking_time, TableBooking.booking_id
+    if start is not None:
+        stmt = stmt.where(date_column >= start)
+    if end is not None:
+        stmt = stmt.where(date_column < end)
+    # Сортировка по дате позволяет держать открытым только один файл партиции
+    return stmt.order_by(date_column, key)
+
+def _date_range(start_date: date | None, end_date: date | None) -> tuple[datetime | None, datetime | None]:
+    start = datetime.combine(start_date, time.min) if start_date else None
+    end = datetime.combine(end_date + timedelta(days=1), time.min) if end_date else None
+    return start, end
+
+def _to_batch(rows: list, schema: pa.Schema) -> pa.RecordBatch:
+    columns = {name: [] for name in schema.names}
+    for row in rows:
+        for name, value in zip(schema.names, row):
+            columns[name].append(value.value if isinstance(value, Enum) else value)
+    return pa.RecordBatch.from_pydict(columns, schema=schema)
+
+class _PartitionWriter:
+    """Запись партиций вида <dataset>/date=YYYY-MM-DD/part-00000.<ext> по одной за раз"""
+
+    def __init__(self, root: str, dataset: ExportDataset, schema: pa.Schema, export_format: ExportFormat):
+        self.root = root
+        self.dataset = dataset
+        self.schema = schema
+        self.format = export_format
+        self.partition: date | None = None
+        self.path: str | None = None
+        self.rows = 0
+        self.writer = None
+        self.sink = None
+        self.files: list[ExportFileOut] = []
+
+    def _open(self, partition: date) -> None:
+        extension = "parquet" if self.format == ExportFormat.PARQUET else "arrow"
+        relative = os.path.join(self.dataset.value, f"date={partition.isoformat()}", f"part-00000.{extension}")
+        path = os.path.join(self.root, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if self.format == ExportFormat.PARQUET:
+            self.writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+        else:
+            # Arrow IPC без сжатия читается через memory mapping без копирования
+            self.sink = pa.OSFile(path, "wb")
+            self.writer = ipc.new_file(self.sink, self.schema)
+        self.partition, self.path, self.rows = partition, relative, 0
+
+    def close(self) -> None:
+        if self.writer is None:
+            return
+        self.writer.close()
+        if self.sink is not None:
+            self.sink.close()
+        self.files.append(ExportFileOut(
+            dataset=self.dataset,
+            path=self.path,
+            partition=self.partition,
+            rows=self.rows,
+            size_bytes=os.path.getsize(os.path.join(self.root, self.path))
+        ))
+        self.writer = self.sink = None
+
+    def write(self, batch: pa.RecordBatch) -> None:
+        days = [value.date() for value in batch.column(0).to_pylist()]
+        start = 0
+        for i in range(1, len(days) + 1):
+            if i == len(days) or days[i] != days[start]:
+                if days[start] != self.partition:
+                    self.close()
+                    self._open(days[start])
+                part = batch.slice(start, i - start)
+                self.writer.write_batch(part)
+                self.rows += part.num_rows
+                start = i
+
+async def export_dataset(
+    db: AsyncSession,
+    dataset: ExportDataset,
+    start_date: date,
+    end_date: date,
+    export_format: ExportFormat,
+    root: str
+) -> list[ExportFileOut]:
+    """Потоковая выгрузка набора данных пачками по BATCH_SIZE строк"""
+    schema = SCHEMAS[dataset]
+    stmt = _statement(dataset, *_date_range(start_date, end_date))
+    writer = _PartitionWriter(root, dataset, schema, export_format)
+    try:
+        result = await db.stream(stmt.execution_options(yield_per=BATCH_SIZE))
+        async for rows in result.partitions():
+            await asyncio.to_thread(writer.write, _to_batch(rows, schema))
+    finally:
+        await asyncio.to_thread(writer.close)
+    return writer.files
+
+def _job_dir(job_id: str) -> str:
+    return os.path.join(Config.EXPORT_DIR, job_id)
+
+async def _save_job(redis: Redis, job: ExportJobOut) -> None:
+    await redis.set(JOB_KEY.format(job_id=job.job_id), job.model_dump_json(), ex=JOB_TTL)
+
+async def create_export_job(redis: Redis, data: ExportJobCreate) -> ExportJobOut:
+    if data.start_date > data.end_date:
+        raise HTTPException(status_code=400, detail="Начало периода позже конца")
+    if (data.end_date - data.start_date).days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Период выгрузки не должен превышать {MAX_RANGE_DAYS} дней")
+    if not data.datasets:
+        raise HTTPException(status_code=400, detail="Не выбраны наборы данных")
+
+    job = ExportJobOut(
+        job_id=uuid.uuid4().hex,
+        status=ExportJobStatus.PENDING,
+        format=data.format,
+        datasets=list(dict.fromkeys(data.datasets)),
+        start_date=data.start_date,
+        end_date=data.end_date,
+        created_at=datetime.now()
+    )
+    await _save_job(redis, job)
+    return job
+
+async def get_export_job(redis: Redis, job_id: str) -> ExportJobOut:
+    raw = await redis.get(JOB_KEY.format(job_id=job_id))
+    if not raw:
+        raise HTTPException(status_code=404, detail="Выгрузка не найдена")
+    return ExportJobOut.model_validate_json(raw)
+
+async def run_export_job(db: AsyncSession, redis: Redis, job: ExportJobOut) -> ExportJobOut:
+    job.status = ExportJobStatus.RUNNING
+    await _save_job(redis, job)
+    root = _job_dir(job.job_id)
+    try:
+        for dataset in job.datasets:
+            files = await export_dataset(db, dataset, job.start_date, job.end_date, job.format, root)
+            job.files.extend(files)
+            job.rows += sum(f.rows for f in files)
+            await _save_job(redis, job)
+
+        os.makedirs(root, exist_ok=True)
+        manifest = job.model_dump(mode="json", include={"job_id", "format", "datasets", "start_date", "end_date", "rows", "files"})
+        with open(os.path.join(root, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        job.status = ExportJobStatus.COMPLETED
+        print(f"[EXPORT] Выгрузка {job.job_id}: {job.rows} строк, {len(job.files)} файлов")
+    except Exception as e:
+        job.status = ExportJobStatus.FAILED
+        job.error = str(e)
+        print(f"[EXPORT Error] Выгрузка {job.job_id}: {e}")
+    job.finished_at = datetime.now()
+    await _save_job(redis, job)
+    return job
+
+async def _run_in_background(job: ExportJobOut) -> None:
+    redis = await get_redis()
+    try:
+        async with SessionLocal() as db:
+            await run_export_job(db, redis, job)
+    finally:
+        await redis.aclose()
+
+# Запуск выгрузки вне запроса: у задачи собственные сессия БД и подключение к Redis
+def start_export_job(job: ExportJobOut) -> None:
+    task = asyncio.create_task(_run_in_background(job))
+    _running.add(task)
+    task.add_done_callback(_running.discard)
+
+# Удаление каталогов выгрузок, метаданные которых уже истекли в Redis (периодическая задача лидера)
+async def purge_expired_exports(redis: Redis, export_dir: str | None = None) -> int:
+    export_dir = export_dir or Config.EXPORT_DIR
+    if not os.path.isdir(export_dir):
+        return 0
+    job_ids = [name for name in os.listdir(export_dir) if os.path.isdir(os.path.join(export_dir, name))]
+    if not job_ids:
+        return 0
+    pipe = redis.pipeline(transaction=False)
+    for job_id in job_ids:
+        pipe.exists(JOB_KEY.format(job_id=job_id))
+    expired = [job_id for job_id, exists in zip(job_ids, await pipe.execute()) if not exists]
+    for job_id in expired:
+        await asyncio.to_thread(shutil.rmtree, os.path.join(export_dir, job_id), True)
+    return len(expired)
+
+def resolve_export_file(job: ExportJobOut, path: str) -> str:
+    """Абсолютный путь к файлу выгрузки с защитой от выхода за каталог задания"""
+    if path not in {f.path for f in job.files} and path != MANIFEST_FILE:
+        raise HTTPException(status_code=404, detail="Файл не найден")
+    root = os.path.realpath(_job_dir(job.job_id))
+    full_path = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, full_path]) != root or not os.path.isfile(full_path):
+        raise HTTPException(status_code=404, detail="Файл не найден")
+    return full_path
+
+def _text_value(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+def _encode_rows(rows: list, names: list[str], stream_format: StreamFormat) -> str:
+    if stream_format == StreamFormat.NDJSON:
+        return "".join(
+            json.dumps({name: _text_value(value) for name, value in zip(names, row)}, ensure_ascii=False) + "\n"
+            for row in rows
+        )
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([_text_value(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+def validate_stream_range(start_date: date | None, end_date: date | None) -> None:
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="Начало периода позже конца")
+
+async def iter_export(
+    db: AsyncSession,
+    dataset: ExportDataset,
+    stream_format: StreamFormat,
+    start_date: date | None = None,
+    end_date: date | None = None,
+    compress: bool = False
+) -> AsyncIterator[bytes]:
+    """Построчная выгрузка в CSV/NDJSON: в памяти держится одна пачка строк независимо от объема"""
+    names = SCHEMAS[dataset].names
+    compressor = zlib.compressobj(wbits=31) if compress else None
+
+    def encode(text: str) -> bytes:
+        data = text.encode("utf-8")
+        return compressor.compress(data) if compressor else data
+
+    if stream_format == StreamFormat.CSV:
+        header = io.StringIO()
+        csv.writer(header).writerow(names)
+        yield encode(header.getvalue())
+
+    stmt = _statement(dataset, *_date_range(start_date, end_date))
+    result = await db.stream(stmt.execution_options(yield_per=BATCH_SIZE))
+    async for rows in result.partitions():
+        chunk = encode(_encode_rows(rows, names, stream_format))
+        if chunk:
+            yield chunk
+    if compressor:
+        yield compressor.flush()
+
+# Обертка для StreamingResponse: сессия из get_db закрывается до отправки тела ответа, поэтому открывается своя
+async def stream_export(
+    dataset: ExportDataset,
+    stream_format: StreamFormat,
+    start_date: date | None,
+    end_date: date | None,
+    compress: bool
+) -> AsyncIterator[bytes]:
+    async with SessionLocal() as db:
+        async for chunk in iter_export(db, dataset, stream_format, start_date, end_date, compress):
+            yield chunk
+
+# Ответ с потоковой выгрузкой для эндпоинтов /orders/export, /reviews/export и /bookings/export
+def export_response(
+    dataset: ExportDataset,
+    stream_format: StreamFormat,
+    start_date: date | None,
+    end_date: date | None,
+    compress: bool
+) -> StreamingResponse:
+    validate_stream_range(start_date, end_date)
+    media_type = "text/csv; charset=utf-8" if stream_format == StreamFormat.CSV else "application/x-ndjson"
+    filename = f"{dataset.value}-{date.today().isoformat()}.{stream_format.value}"
+    if compress:
+        media_type, filename = "application/gzip", filename + ".gz"
+    return StreamingResponse(
+        stream_export(dataset, stream_format, start_date, end_date, compress),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -4,7 +4,7 @@ from fastapi import HTTPException
 
 from app.models.menu_item_ingredients import MenuItemIngredient
 from app.models.ingredients import Ingredient
-from app.schemas.ingredient import IngredientOut, MenuItemIngredientCreate, MenuItemIngredientOut
+from app.schemas.ingredient import IngredientCostUpdate, IngredientOut, MenuItemIngredientCreate, MenuItemIngredientOut
 
 # Получить состав позиции меню по item_id
 async def get_ingredients_by_item_id(item_id: int, db: AsyncSession) -> list[MenuItemIngredientOut]:
@@ -26,7 +26,8 @@ async def get_ingredients_by_item_id(item_id: int, db: AsyncSession) -> list[Men
                 ingredient=IngredientOut(
                     ingredient_id=ingredient.ingredient_id,
                     name=ingredient.name,
-                    unit=ingredient.unit
+                    unit=ingredient.unit,
+                    unit_cost=ingredient.unit_cost
                 ),
                 required_quantity=item_ingredient.required_quantity
             ))
@@ -44,12 +45,18 @@ async def create_menu_item_ingredient(item_id: int, ingredient_data: MenuItemIng
             name=ingredient_data.ingredient.name,
             unit=ingredient_data.ingredient.unit,
             quantity=ingredient_data.ingredient.quantity,
-            threshold=ingredient_data.ingredient.threshold
+            threshold=ingredient_data.ingredient.threshold,
+            unit_cost=ingredient_data.ingredient.unit_cost
         )
         db.add(new_ingredient)
         await db.commit()
         await db.refresh(new_ingredient)
         existing_ingredient = new_ingredient
+    elif ingredient_data.ingredient.unit_cost is not None and existing_ingredient.unit_cost != ingredient_data.ingredient.unit_cost:
+        # Переданная себестоимость обновляет уже существующий ингредиент
+        existing_ingredient.unit_cost = ingredient_data.ingredient.unit_cost
+        await db.commit()
+        await db.refresh(existing_ingredient)
 
     new_menu_item_ingredient = MenuItemIngredient(
         item_id=item_id,
@@ -66,11 +73,24 @@ async def create_menu_item_ingredient(item_id: int, ingredient_data: MenuItemIng
         ingredient=IngredientOut(
             ingredient_id=existing_ingredient.ingredient_id,
             name=existing_ingredient.name,
-            unit=existing_ingredient.unit
+            unit=existing_ingredient.unit,
+            unit_cost=existing_ingredient.unit_cost
         ),
         required_quantity=new_menu_item_ingredient.required_quantity
     )
 
+# Изменить себестоимость единицы ингредиента
+async def update_ingredient_cost(ingredient_id: int, cost_data: IngredientCostUpdate, db: AsyncSession) -> IngredientOut:
+    result = await db.execute(select(Ingredient).where(Ingredient.ingredient_id == ingredient_id))
+    ingredient = result.scalar_one_or_none()
+    if not ingredient:
+        raise HTTPException(status_code=404, detail="Ингредиент не найден")
+
+    ingredient.unit_cost = cost_data.unit_cost
+    await db.commit()
+    await db.refresh(ingredient)
+    return IngredientOut.model_validate(ingredient)
+
 # Удалить ингредиент из состава позиции меню
 async def delete_menu_item_ingredient(item_id: int, ingredient_id: int, db: AsyncSession):
     result = await db.execute(
@@ -106,7 +126,8 @@ async def get_all_menu_item_ingredients(db: AsyncSession) -> list[MenuItemIngred
                 ingredient=IngredientOut(
                     ingredient_id=ingredient.ingredient_id,
                     name=ingredient.name,
-                    unit=ingredient.unit
+                    unit=ingredient.unit,
+                    unit_cost=ingredient.unit_cost
                 ),
                 required_quantity=item_ingredient.required_quantity
             ))
@@ -0,0 +1,125 @@
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.ingredients import Ingredient
+from app.models.menu_items import MenuItem
+from app.models.menu_item_ingredients import MenuItemIngredient
+from app.models.orders import Order, OrderStatus
+from app.models.order_items import OrderItem
+from app.schemas.statistics import MenuEngineeringClass, MenuEngineeringItemOut
+
+# Порог популярности по правилу 70%: позиция популярна, если ее доля продаж не ниже 0.7 от равной доли
+POPULARITY_FACTOR = 0.7
+# Границы ABC-анализа по накопленной доле выручки
+ABC_BOUNDS = (0.8, 0.95)
+
+def classify(sold: np.ndarray, unit_margin: np.ndarray) -> np.ndarray:
+    """Матрица популярность x маржинальность для всех позиций сразу"""
+    total = sold.sum()
+    share = sold / total if total else np.zeros(len(sold))
+    popular = share >= POPULARITY_FACTOR / max(len(sold), 1)
+    # Средняя маржа взвешивается по продажам; без продаж сравнение идет с простой средней
+    average_margin = np.average(unit_margin, weights=sold) if total else unit_margin.mean()
+    profitable = unit_margin >= average_margin
+    return np.select(
+        [popular & profitable, popular & ~profitable, ~popular & profitable],
+        [MenuEngineeringClass.STAR.value, MenuEngineeringClass.PLOWHORSE.value, MenuEngineeringClass.PUZZLE.value],
+        default=MenuEngineeringClass.DOG.value
+    )
+
+def abc_classes(revenue: np.ndarray) -> np.ndarray:
+    order = np.argsort(-revenue, kind="stable")
+    total = revenue.sum()
+    # Доля выручки, накопленная до позиции включительно, считается по предыдущим позициям,
+    # чтобы позиция, пересекающая границу, оставалась в старшем классе
+    before = (np.cumsum(revenue[order]) - revenue[order]) / total if total else np.ones(len(revenue))
+    classes = np.empty(len(revenue), dtype="<U1")
+    classes[order] = np.select([before < ABC_BOUNDS[0], before < ABC_BOUNDS[1]], ["A", "B"], default="C")
+    return classes
+
+async def get_menu_engineering(
+    db: AsyncSession,
+    start_date: date | None = None,
+    end_date: date | None = None
+) -> list[MenuEngineeringItemOut]:
+    sales = (
+        select(
+            OrderItem.item_id,
+            func.sum(OrderItem.quantity).label("sold"),
+            func.sum(OrderItem.price * OrderItem.quantity).label("revenue")
+        )
+        .join(Order, Order.order_id == OrderItem.order_id)
+        .where(Order.status != OrderStatus.CANCELLED)
+        .group_by(OrderItem.item_id)
+    )
+    if start_date:
+        sales = sales.where(Order.order_date >= datetime.combine(start_date, time.min))
+    if end_date:
+        sales = sales.where(Order.order_date < datetime.combine(end_date + timedelta(days=1), time.min))
+    sales = sales.subquery()
+
+    costs = (
+        select(
+            MenuItemIngredient.item_id,
+            func.sum(MenuItemIngredient.required_quantity * func.coalesce(Ingredient.unit_cost, 0)).label("unit_cost"),
+            func.count().label("ingredients"),
+            func.count(Ingredient.unit_cost).label("priced")
+        )
+        .join(Ingredient, Ingredient.ingredient_id == MenuItemIngredient.ingredient_id)
+        .group_by(MenuItemIngredient.item_id)
+        .subquery()
+    )
+
+    result = await db.execute(
+        select(
+            MenuItem.item_id,
+            MenuItem.name,
+            MenuItem.category,
+            MenuItem.price,
+            func.coalesce(sales.c.sold, 0).label("sold"),
+            func.coalesce(sales.c.revenue, 0).label("revenue"),
+            func.coalesce(costs.c.unit_cost, 0).label("unit_cost"),
+            func.coalesce(costs.c.ingredients, 0).label("ingredients"),
+            func.coalesce(costs.c.priced, 0).label("priced")
+        )
+        .outerjoin(sales, sales.c.item_id == MenuItem.item_id)
+        .outerjoin(costs, costs.c.item_id == MenuItem.item_id)
+        .order_by(MenuItem.item_id)
+    )
+    rows = result.all()
+    if not rows:
+        return []
+
+    sold = np.array([row.sold for row in rows], dtype=np.int64)
+    revenue = np.array([row.revenue for row in rows], dtype=np.float64)
+    menu_price = np.array([row.price or 0 for row in rows], dtype=np.float64)
+    unit_cost = np.array([row.unit_cost for row in rows], dtype=np.float64)
+    cost_complete = np.array([row.ingredients > 0 and row.priced == row.ingredients for row in rows])
+
+    # Фактическая средняя цена продажи, для позиций без продаж - цена меню
+    unit_price = np.divide(revenue, sold, out=menu_price.copy(), where=sold > 0)
+    unit_margin = unit_price - unit_cost
+    total_margin = unit_margin * sold
+    total_sold = sold.sum()
+    share = sold / total_sold if total_sold else np.zeros(len(sold))
+    menu_classes = classify(sold, unit_margin)
+    abc = abc_classes(revenue)
+
+    return [MenuEngineeringItemOut(
+        item_id=row.item_id,
+        name=row.name,
+        category=row.category,
+        sold=int(sold[i]),
+        revenue=round(float(revenue[i]), 2),
+        unit_price=round(float(unit_price[i]), 2),
+        unit_cost=round(float(unit_cost[i]), 2),
+        cost_complete=bool(cost_complete[i]),
+        unit_margin=round(float(unit_margin[i]), 2),
+        total_margin=round(float(total_margin[i]), 2),
+        popularity_share=round(float(share[i]), 4),
+        menu_class=menu_classes[i],
+        abc_class=str(abc[i])
+    ) for i, row in enumerate(rows)]
@@ -4,10 +4,11 @@ from sqlalchemy import select, delete
 from sqlalchemy.orm import selectinload
 from fastapi import HTTPException
 
-from app.models.orders import Order
+from app.models.orders import Order, OrderStatus
 from app.models.order_items import OrderItem
 from app.models.menu_items import MenuItem
 from app.models.order_assignments import OrderAssignment, StaffRole
+from app.models.order_status_events import OrderStatusEvent
 from app.schemas import order as schemas
 from app.services.shift_service import get_user_active_shift
 
@@ -18,6 +19,22 @@ async def get_all_orders(db: AsyncSession) -> List[Order]:
     )
     return result.scalars().all()
 
+# Получить незавершенные заказы (ожидают, готовятся, готовы к выдаче)
+async def get_active_orders(db: AsyncSession) -> List[Order]:
+    result = await db.execute(
+        select(Order)
+        .where(Order.status.in_([OrderStatus.PENDING, OrderStatus.IN_PROGRESS, OrderStatus.READY]))
+        .options(selectinload(Order.items))
+    )
+    return result.scalars().all()
+
+# Получить заказы по списку id
+async def get_orders_by_ids(order_ids: List[int], db: AsyncSession) -> List[Order]:
+    result = await db.execute(
+        select(Order).where(Order.order_id.in_(order_ids)).options(selectinload(Order.items))
+    )
+    return result.scalars().all()
+
 # Получить заказ по id
 async def get_order_by_id(order_id: int, db: AsyncSession) -> Order:
     result = await db.execute(
@@ -57,17 +74,32 @@ async def create_order(order_data: schemas.OrderCreate, db: AsyncSession) -> Ord
     return new_order
 
 # Изменение статуса заказа
-async def update_order_status(order_id: int, status: schemas.OrderStatus, db: AsyncSession) -> Order:
+async def update_order_status(order_id: int, status: schemas.OrderStatus, db: AsyncSession,
+                              user_id: int | None = None) -> Order:
     result = await db.execute(select(Order).where(Order.order_id == order_id))
     order = result.scalar_one_or_none()
     if not order:
         raise HTTPException(status_code=404, detail="Заказ не найден")
 
+    record_status_event(db, order.order_id, order.status, status, user_id=user_id)
     order.status = status
     await db.commit()
     await db.refresh(order)
     return order
 
+# Запись смены статуса в журнал; фиксируется тем же коммитом, что и сам статус
+def record_status_event(db: AsyncSession, order_id: int, previous_status, status,
+                        order_item_id: int | None = None, user_id: int | None = None) -> None:
+    if previous_status == status:
+        return
+    db.add(OrderStatusEvent(
+        order_id=order_id,
+        order_item_id=order_item_id,
+        previous_status=OrderStatus(previous_status) if previous_status is not None else None,
+        status=OrderStatus(status),
+        user_id=user_id
+    ))
+
 # Удаление заказа
 async def delete_order(order_id: int, db: AsyncSession):
     result = await db.execute(select(Order).where(Order.order_id == order_id))
@@ -75,6 +107,7 @@ async def delete_order(order_id: int, db: AsyncSession):
     if not order:
         raise HTTPException(status_code=404, detail="Заказ не найден")
 
+    await db.execute(delete(OrderStatusEvent).where(OrderStatusEvent.order_id == order_id))
     await db.execute(delete(OrderItem).where(OrderItem.order_id == order_id))
     await db.execute(delete(OrderAssignment).where(OrderAssignment.order_id == order_id))
     await db.delete(order)
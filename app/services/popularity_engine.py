@@ -0,0 +1,198 @@
+import asyncio
+import time
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.orders import Order
+from app.models.order_items import OrderItem
+from app.models.menu_items import MenuItem, MenuCategory
+from app.schemas.recommendation import PopularityDecay, RecommendedItem
+
+# Период полураспада популярности в днях (None - без затухания)
+HALF_LIVES = {
+    PopularityDecay.NONE: None,
+    PopularityDecay.WEEK: 7,
+    PopularityDecay.MONTH: 30,
+    PopularityDecay.QUARTER: 90,
+}
+DECAYS = list(HALF_LIVES)
+DECAY_RATES = np.array([0.0 if h is None else np.log(2) / h for h in HALF_LIVES.values()])
+
+# Сглаживание по соседним часам и доля вклада того же часа в другие дни недели
+HOUR_KERNEL = {0: 1.0, 1: 0.5, 2: 0.25}
+ALL_DAYS_WEIGHT = 0.3
+
+SYNC_INTERVAL = 30
+REBUILD_INTERVAL = 3600
+
+SECONDS_PER_DAY = 86400.0
+
+# Время заказов хранится без часового пояса, поэтому все моменты сравниваются в локальном времени
+def _local_ts(moment: datetime) -> float:
+    return float(np.datetime64(moment.replace(tzinfo=None), "s").astype(np.int64))
+
+def _hour_kernel(hour: int) -> np.ndarray:
+    kernel = np.zeros(24)
+    for offset, weight in HOUR_KERNEL.items():
+        kernel[(hour + offset) % 24] = weight
+        kernel[(hour - offset) % 24] = weight
+    return kernel
+
+class PopularityEngine:
+    """Затухающая популярность позиций по дням недели и часам, хранимая в памяти воркера.
+
+    scores[d, i, w, h] - сумма exp(-λ_d·(t0 - t)) по строкам заказов позиции i,
+    сделанным в день недели w и час h, где t0 - момент последней полной пересборки.
+    """
+
+    def __init__(self):
+        self.item_ids = np.zeros(0, dtype=np.int32)
+        self.is_drink = np.zeros(0, dtype=bool)
+        self.names: list[str] = []
+        self.categories: list[MenuCategory] = []
+        self.index: dict[int, int] = {}
+        self.scores = np.zeros((len(DECAYS), 0, 7, 24))
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.reference_ts = 0.0
+        self.watermark = 0
+        self.built_at = 0.0
+        self.synced_at = 0.0
+        self._lock = asyncio.Lock()
+
+    # Ленивое обновление перед чтением: полная пересборка раз в час, догрузка новых заказов раз в SYNC_INTERVAL
+    async def ensure_fresh(self, db: AsyncSession) -> None:
+        if self.built_at and time.monotonic() - self.synced_at < SYNC_INTERVAL:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            if not self.built_at or now - self.built_at >= REBUILD_INTERVAL:
+                await self.rebuild(db)
+            elif now - self.synced_at >= SYNC_INTERVAL:
+                await self.sync(db)
+
+    # Догрузка только что созданного заказа, если таблица уже построена в этом воркере
+    async def notify_new_orders(self, db: AsyncSession) -> None:
+        if not self.built_at:
+            return
+        async with self._lock:
+            await self.sync(db)
+
+    # Полная пакетная пересборка по всей истории заказов.
+    # Таблица строится в отдельном объекте и подменяется целиком, чтобы чтения не видели частичное состояние
+    async def rebuild(self, db: AsyncSession) -> None:
+        started = time.perf_counter()
+        fresh = PopularityEngine()
+        result = await db.execute(select(MenuItem.item_id, MenuItem.name, MenuItem.category).order_by(MenuItem.item_id))
+        items = result.all()
+
+        fresh.item_ids = np.array([row.item_id for row in items], dtype=np.int32)
+        fresh.is_drink = np.array([row.category == MenuCategory.DRINK for row in items], dtype=bool)
+        fresh.names = [row.name for row in items]
+        fresh.categories = [row.category for row in items]
+        fresh.index = {row.item_id: i for i, row in enumerate(items)}
+        fresh.scores = np.zeros((len(DECAYS), len(items), 7, 24))
+        fresh.counts = np.zeros(len(items), dtype=np.int64)
+        fresh.reference_ts = _local_ts(datetime.now())
+
+        rows = await fresh._apply_new_orders(db)
+        fresh.built_at = fresh.synced_at = time.monotonic()
+        for name, value in vars(fresh).items():
+            if name != "_lock":
+                setattr(self, name, value)
+        print(f"[POPULARITY] Пересборка: {rows} строк, {len(items)} позиций - {time.perf_counter() - started:.3f}s")
+
+    # Инкрементальное добавление заказов, появившихся после последней синхронизации
+    async def sync(self, db: AsyncSession) -> None:
+        await self._apply_new_orders(db)
+        self.synced_at = time.monotonic()
+
+    async def _apply_new_orders(self, db: AsyncSession) -> int:
+        result = await db.execute(
+            select(Order.order_id, Order.order_date, OrderItem.item_id)
+            .join(OrderItem, OrderItem.order_id == Order.order_id)
+            .where(Order.order_id > self.watermark)
+        )
+        rows = result.all()
+        if not rows:
+            return 0
+
+        unknown = {row.item_id for row in rows if row.item_id not in self.index}
+        if unknown:
+            await self._add_items(db, unknown)
+
+        item_idx = np.fromiter((self.index.get(row.item_id, -1) for row in rows), dtype=np.int64, count=len(rows))
+        dates = np.array([row.order_date for row in rows], dtype="datetime64[s]")
+        self.watermark = max(self.watermark, max(row.order_id for row in rows))
+
+        known = item_idx >= 0
+        item_idx, dates = item_idx[known], dates[known]
+        self._accumulate(item_idx, dates)
+        return len(item_idx)
+
+    def _accumulate(self, item_idx: np.ndarray, dates: np.ndarray) -> None:
+        days = dates.astype("datetime64[D]")
+        hours = (dates.astype("datetime64[h]") - days).astype(np.int64)
+        # 1970-01-01 - четверг, понедельник имеет номер 0
+        weekdays = (days.astype(np.int64) + 3) % 7
+        timestamps = dates.astype(np.int64).astype(np.float64)
+
+        age_days = (self.reference_ts - timestamps) / SECONDS_PER_DAY
+        weights = np.exp(-DECAY_RATES[:, None] * age_days[None, :])
+
+        n_items = len(self.item_ids)
+        flat = (item_idx * 7 + weekdays) * 24 + hours
+        for d in range(len(DECAYS)):
+            self.scores[d] += np.bincount(flat, weights=weights[d], minlength=n_items * 168).reshape(n_items, 7, 24)
+        self.counts += np.bincount(item_idx, minlength=n_items)
+
+    async def _add_items(self, db: AsyncSession, item_ids: set[int]) -> None:
+        result = await db.execute(
+            select(MenuItem.item_id, MenuItem.name, MenuItem.category).where(MenuItem.item_id.in_(item_ids))
+        )
+        items = result.all()
+        if not items:
+            return
+        start = len(self.item_ids)
+        self.item_ids = np.concatenate([self.item_ids, np.array([row.item_id for row in items], dtype=np.int32)])
+        self.is_drink = np.concatenate([self.is_drink, np.array([row.category == MenuCategory.DRINK for row in items])])
+        self.names.extend(row.name for row in items)
+        self.categories.extend(row.category for row in items)
+        self.index.update({row.item_id: start + i for i, row in enumerate(items)})
+        self.scores = np.concatenate([self.scores, np.zeros((len(DECAYS), len(items), 7, 24))], axis=1)
+        self.counts = np.concatenate([self.counts, np.zeros(len(items), dtype=np.int64)])
+
+    def top(self, drinks: bool, decay: PopularityDecay = PopularityDecay.NONE,
+            at: datetime | None = None, limit: int = 5) -> list[RecommendedItem]:
+        d = DECAYS.index(decay)
+        scores = self.scores[d]
+        if at is None:
+            totals = scores.sum(axis=(1, 2))
+            reference = _local_ts(datetime.now())
+        else:
+            if at.tzinfo is not None:
+                at = at.astimezone().replace(tzinfo=None)
+            kernel = _hour_kernel(at.hour)
+            totals = scores[:, at.weekday(), :] @ kernel + ALL_DAYS_WEIGHT * (scores.sum(axis=1) @ kernel) / 7
+            reference = _local_ts(at)
+        # Приведение затухания от момента пересборки к запрошенному моменту
+        totals = totals * np.exp(-DECAY_RATES[d] * (reference - self.reference_ts) / SECONDS_PER_DAY)
+
+        candidates = np.flatnonzero((self.is_drink == drinks) & (totals > 0))
+        if limit <= 0 or not len(candidates):
+            return []
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-totals[candidates], limit - 1)[:limit]]
+        candidates = candidates[np.argsort(-totals[candidates], kind="stable")]
+
+        return [RecommendedItem(
+            item_id=int(self.item_ids[i]),
+            name=self.names[i],
+            category=self.categories[i],
+            order_count=int(self.counts[i]),
+            score=round(float(totals[i]), 4)
+        ) for i in candidates]
+
+popularity_engine = PopularityEngine()
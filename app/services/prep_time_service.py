@@ -0,0 +1,137 @@
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.menu_items import MenuItem, MenuCategory
+from app.models.orders import Order, OrderStatus
+from app.models.order_items import OrderItem
+from app.models.order_status_events import OrderStatusEvent
+from app.schemas.statistics import PrepTimeGroup, PrepTimeOut
+
+QUANTILES = np.array([0.5, 0.9, 0.99])
+
+KITCHEN = "kitchen"
+BAR = "bar"
+
+def station(category: MenuCategory) -> str:
+    return BAR if category == MenuCategory.DRINK else KITCHEN
+
+def grouped_percentiles(codes: np.ndarray, values: np.ndarray,
+                        quantiles: np.ndarray = QUANTILES) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Перцентили values внутри каждой группы codes (линейная интерполяция, как np.percentile).
+
+    Возвращает коды групп, размеры групп и матрицу (групп x квантилей).
+    """
+    order = np.lexsort((values, codes))
+    codes, values = codes[order], values[order]
+    groups, starts, counts = np.unique(codes, return_index=True, return_counts=True)
+
+    positions = starts[:, None] + quantiles[None, :] * (counts[:, None] - 1)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.ceil(positions).astype(np.int64)
+    fraction = positions - lower
+    result = values[lower] + (values[upper] - values[lower]) * fraction
+    return groups, counts, result
+
+# Время приготовления позиции: от начала работы над ней (или от создания заказа) до статуса "Готово"
+async def _load_prep_times(db: AsyncSession, start_date: date | None, end_date: date | None):
+    ready = (
+        select(OrderStatusEvent.order_item_id, func.min(OrderStatusEvent.created_at).label("ready_at"))
+        .where(OrderStatusEvent.order_item_id.is_not(None), OrderStatusEvent.status == OrderStatus.READY)
+        .group_by(OrderStatusEvent.order_item_id)
+        .subquery()
+    )
+    started = (
+        select(OrderStatusEvent.order_item_id, func.min(OrderStatusEvent.created_at).label("started_at"))
+        .where(OrderStatusEvent.order_item_id.is_not(None), OrderStatusEvent.status == OrderStatus.IN_PROGRESS)
+        .group_by(OrderStatusEvent.order_item_id)
+        .subquery()
+    )
+    stmt = (
+        select(
+            OrderItem.item_id,
+            MenuItem.name,
+            MenuItem.category,
+            Order.order_date,
+            started.c.started_at,
+            ready.c.ready_at
+        )
+        .select_from(ready)
+        .join(OrderItem, OrderItem.order_item_id == ready.c.order_item_id)
+        .join(Order, Order.order_id == OrderItem.order_id)
+        .join(MenuItem, MenuItem.item_id == OrderItem.item_id)
+        .outerjoin(started, started.c.order_item_id == ready.c.order_item_id)
+    )
+    if start_date:
+        stmt = stmt.where(Order.order_date >= datetime.combine(start_date, time.min))
+    if end_date:
+        stmt = stmt.where(Order.order_date < datetime.combine(end_date + timedelta(days=1), time.min))
+
+    result = await db.execute(stmt)
+    return result.all()
+
+def _durations(rows) -> np.ndarray:
+    started = np.array([row.started_at or row.order_date for row in rows], dtype="datetime64[us]")
+    ready = np.array([row.ready_at for row in rows], dtype="datetime64[us]")
+    return (ready - started).astype(np.int64) / 1e6
+
+# Медианное время приготовления по позициям и по цехам за период начиная с since
+async def median_prep_times(db: AsyncSession, since: date) -> tuple[dict[int, float], dict[str, float]]:
+    rows = await _load_prep_times(db, since, None)
+    if not rows:
+        return {}, {}
+    durations = _durations(rows)
+    valid = durations >= 0
+
+    item_ids = np.fromiter((row.item_id for row in rows), dtype=np.int64, count=len(rows))
+    items, _, item_medians = grouped_percentiles(item_ids[valid], durations[valid], np.array([0.5]))
+
+    stations = np.array([station(row.category) for row in rows])
+    station_names, station_codes = np.unique(stations, return_inverse=True)
+    codes, _, station_medians = grouped_percentiles(station_codes[valid], durations[valid], np.array([0.5]))
+
+    return (
+        {int(item_id): float(median) for item_id, median in zip(items, item_medians[:, 0])},
+        {str(station_names[code]): float(median) for code, median in zip(codes, station_medians[:, 0])}
+    )
+
+async def get_prep_time_percentiles(
+    db: AsyncSession,
+    group_by: PrepTimeGroup,
+    start_date: date | None = None,
+    end_date: date | None = None
+) -> list[PrepTimeOut]:
+    rows = await _load_prep_times(db, start_date, end_date)
+    if not rows:
+        return []
+
+    order_dates = np.array([row.order_date for row in rows], dtype="datetime64[us]")
+    durations = _durations(rows)
+    valid = durations >= 0
+
+    names: dict[int, str | None] = {}
+    vocabulary = None
+    if group_by == PrepTimeGroup.ITEM:
+        codes = np.fromiter((row.item_id for row in rows), dtype=np.int64, count=len(rows))
+        names = {row.item_id: row.name for row in rows}
+    elif group_by == PrepTimeGroup.HOUR:
+        codes = ((order_dates - order_dates.astype("datetime64[D]")) // np.timedelta64(1, "h")).astype(np.int64)
+    else:
+        labels = [
+            MenuCategory(row.category).value if group_by == PrepTimeGroup.CATEGORY else station(row.category)
+            for row in rows
+        ]
+        vocabulary, inverse = np.unique(np.array(labels), return_inverse=True)
+        codes = inverse.astype(np.int64)
+
+    groups, counts, percentiles = grouped_percentiles(codes[valid], durations[valid])
+    return [PrepTimeOut(
+        key=str(vocabulary[code]) if vocabulary is not None else str(code),
+        name=names.get(int(code)),
+        count=int(count),
+        p50_seconds=round(float(p50), 1),
+        p90_seconds=round(float(p90), 1),
+        p99_seconds=round(float(p99), 1)
+    ) for code, count, (p50, p90, p99) in zip(groups, counts, percentiles)]
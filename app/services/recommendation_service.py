@@ -1,13 +1,40 @@
+import json
+from collections import defaultdict
+from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import func, select
+from sqlalchemy import case, func, literal_column, select
 
 from app.models.orders import Order
 from app.models.order_items import OrderItem
 from app.models.menu_items import MenuItem, MenuCategory
-from app.schemas.recommendation import RecommendedItem
+from app.schemas.recommendation import HomeRecommendations, RecommendedItem
 
-# Получение самых популярных блюд
-async def get_most_popular_items(db: AsyncSession, limit: int = 5) -> list[RecommendedItem]:
+# Счетчики популярности хранятся в сортированных множествах Redis:
+# глобальные по группе (блюда/напитки) и персональные по пользователю
+POPULAR_KEY = "popularity:{group}"
+USER_POPULAR_KEY = "popularity:user:{user_id}:{group}"
+ITEM_META_KEY = "popularity:items"
+BUILT_KEY = "popularity:built"
+# Номер последнего заказа в снимке пересборки и заказы новее него, уже учтенные инкрементами
+SNAPSHOT_KEY = "popularity:snapshot"
+RECORDED_KEY = "popularity:recorded"
+
+FOOD = "food"
+DRINKS = "drinks"
+
+def _group(category: MenuCategory) -> str:
+    return DRINKS if category == MenuCategory.DRINK else FOOD
+
+def _item_meta(name: str, category: MenuCategory) -> str:
+    return json.dumps({"name": name, "category": MenuCategory(category).value}, ensure_ascii=False)
+
+# Подсчет популярности по всей истории заказов (используется при пересборке и до первой сборки счетчиков)
+async def _count_popular_items(
+    db: AsyncSession,
+    limit: int,
+    drinks: bool,
+    user_id: int | None = None
+) -> list[RecommendedItem]:
     stmt = (
         select(
             MenuItem.item_id,
@@ -17,75 +44,220 @@ async def get_most_popular_items(db: AsyncSession, limit: int = 5) -> list[Recom
         )
         .join(OrderItem, MenuItem.item_id == OrderItem.item_id)
         .join(Order, OrderItem.order_id == Order.order_id)
-        .where(MenuItem.category != MenuCategory.DRINK)
+        .where(MenuItem.category == MenuCategory.DRINK if drinks else MenuItem.category != MenuCategory.DRINK)
         .group_by(MenuItem.item_id)
         .order_by(func.count(OrderItem.order_item_id).desc())
         .limit(limit)
     )
-    
+    if user_id is not None:
+        stmt = stmt.where(Order.user_id == user_id)
+
     result = await db.execute(stmt)
     rows = result.all()
     return [RecommendedItem.model_validate(row) for row in rows]
 
-# Получить самые популярные блюда конкретного пользователя
-async def get_user_recommendations(user_id: int, db: AsyncSession, limit: int = 5) -> list[RecommendedItem]:
-    stmt = (
-        select(
-            MenuItem.item_id,
-            MenuItem.name,
-            MenuItem.category,
-            func.count(OrderItem.order_item_id).label("order_count")
+# Чтение top-k из сортированного множества
+async def _top_from_counters(redis: Redis, db: AsyncSession, key: str, group: str, limit: int) -> list[RecommendedItem]:
+    if limit <= 0:
+        return []
+    top = await redis.zrevrange(key, 0, limit - 1, withscores=True)
+    if not top:
+        return []
+
+    item_ids = [int(item_id) for item_id, _ in top]
+    metas = await redis.hmget(ITEM_META_KEY, item_ids)
+    meta_by_id = {item_id: json.loads(meta) for item_id, meta in zip(item_ids, metas) if meta}
+
+    missing = [item_id for item_id in item_ids if item_id not in meta_by_id]
+    if missing:
+        result = await db.execute(
+            select(MenuItem.item_id, MenuItem.name, MenuItem.category).where(MenuItem.item_id.in_(missing))
         )
-        .join(OrderItem, MenuItem.item_id == OrderItem.item_id)
-        .join(Order, OrderItem.order_id == Order.order_id)
-        .where(Order.user_id == user_id, MenuItem.category != MenuCategory.DRINK)
-        .group_by(MenuItem.item_id)
-        .order_by(func.count(OrderItem.order_item_id).desc())
-        .limit(limit)
-    )
-    
-    result = await db.execute(stmt)
-    rows = result.all()
-    return [RecommendedItem.model_validate(row) for row in rows]
+        fetched = {row.item_id: _item_meta(row.name, row.category) for row in result.all()}
+        if fetched:
+            await redis.hset(ITEM_META_KEY, mapping=fetched)
+        meta_by_id.update({item_id: json.loads(meta) for item_id, meta in fetched.items()})
+
+    items = []
+    for item_id, score in top:
+        meta = meta_by_id.get(int(item_id))
+        # Удаленные позиции и позиции, сменившие категорию, пропускаются до пересборки
+        if not meta or _group(MenuCategory(meta["category"])) != group:
+            continue
+        items.append(RecommendedItem(
+            item_id=int(item_id),
+            name=meta["name"],
+            category=meta["category"],
+            order_count=int(score)
+        ))
+    return items
+
+async def _get_popular(
+    db: AsyncSession,
+    redis: Redis,
+    limit: int,
+    group: str,
+    user_id: int | None = None
+) -> list[RecommendedItem]:
+    if not await redis.exists(BUILT_KEY):
+        return await _count_popular_items(db, limit, drinks=group == DRINKS, user_id=user_id)
+
+    key = POPULAR_KEY.format(group=group) if user_id is None else USER_POPULAR_KEY.format(user_id=user_id, group=group)
+    return await _top_from_counters(redis, db, key, group, limit)
+
+# Получение самых популярных блюд
+async def get_most_popular_items(db: AsyncSession, redis: Redis, limit: int = 5) -> list[RecommendedItem]:
+    return await _get_popular(db, redis, limit, FOOD)
+
+# Получить самые популярные блюда конкретного пользователя
+async def get_user_recommendations(user_id: int, db: AsyncSession, redis: Redis, limit: int = 5) -> list[RecommendedItem]:
+    return await _get_popular(db, redis, limit, FOOD, user_id=user_id)
 
 # Получить самые популярные напитки
-async def get_most_popular_drinks(db: AsyncSession, limit: int = 5) -> list[RecommendedItem]:
-    stmt = (
+async def get_most_popular_drinks(db: AsyncSession, redis: Redis, limit: int = 5) -> list[RecommendedItem]:
+    return await _get_popular(db, redis, limit, DRINKS)
+
+# Получить самые популярные напитки конкретного пользователя
+async def get_user_drink_recommendations(user_id: int, db: AsyncSession, redis: Redis, limit: int = 5) -> list[RecommendedItem]:
+    return await _get_popular(db, redis, limit, DRINKS, user_id=user_id)
+
+# Общие и персональные топы блюд и напитков одним запросом с оконными функциями по группе
+async def get_home_recommendations(db: AsyncSession, user_id: int | None, limit: int = 5) -> HomeRecommendations:
+    group = case((MenuItem.category == MenuCategory.DRINK, DRINKS), else_=FOOD).label("grp")
+    user_count = func.sum(case((Order.user_id == user_id, 1), else_=0)) if user_id is not None else func.sum(literal_column("0"))
+    counts = (
         select(
             MenuItem.item_id,
             MenuItem.name,
             MenuItem.category,
-            func.count(OrderItem.order_item_id).label("order_count")
+            group,
+            func.count(OrderItem.order_item_id).label("order_count"),
+            user_count.label("user_count")
         )
         .join(OrderItem, MenuItem.item_id == OrderItem.item_id)
         .join(Order, OrderItem.order_id == Order.order_id)
-        .where(MenuItem.category == MenuCategory.DRINK)
-        .group_by(MenuItem.item_id)
-        .order_by(func.count(OrderItem.order_item_id).desc())
-        .limit(limit)
+        .group_by(MenuItem.item_id, MenuItem.name, MenuItem.category)
+        .subquery()
+    )
+    ranked = select(
+        counts,
+        func.row_number().over(
+            partition_by=counts.c.grp, order_by=(counts.c.order_count.desc(), counts.c.item_id)
+        ).label("global_rank"),
+        func.row_number().over(
+            partition_by=counts.c.grp, order_by=(counts.c.user_count.desc(), counts.c.item_id)
+        ).label("personal_rank")
+    ).subquery()
+    stmt = (
+        select(ranked)
+        .where((ranked.c.global_rank <= limit) | ((ranked.c.personal_rank <= limit) & (ranked.c.user_count > 0)))
     )
-    
+
     result = await db.execute(stmt)
     rows = result.all()
-    return [RecommendedItem.model_validate(row) for row in rows]
 
-# Получить самые популярные напитки конкретного пользователя
-async def get_user_drink_recommendations(user_id: int, db: AsyncSession, limit: int = 5) -> list[RecommendedItem]:
-    stmt = (
+    home = {"popular_food": [], "popular_drinks": [], "personal_food": [], "personal_drinks": []}
+    for row in sorted(rows, key=lambda r: r.global_rank):
+        if row.global_rank <= limit:
+            home[f"popular_{row.grp}"].append(RecommendedItem(
+                item_id=row.item_id, name=row.name, category=row.category, order_count=row.order_count
+            ))
+    for row in sorted(rows, key=lambda r: r.personal_rank):
+        if row.personal_rank <= limit and row.user_count > 0:
+            home[f"personal_{row.grp}"].append(RecommendedItem(
+                item_id=row.item_id, name=row.name, category=row.category, order_count=row.user_count
+            ))
+    return HomeRecommendations(**home)
+
+# Агрегат заказанных позиций по пользователям для счетчиков популярности
+async def _popularity_rows(db: AsyncSession, *criteria):
+    result = await db.execute(
         select(
+            Order.user_id,
             MenuItem.item_id,
             MenuItem.name,
             MenuItem.category,
             func.count(OrderItem.order_item_id).label("order_count")
         )
-        .join(OrderItem, MenuItem.item_id == OrderItem.item_id)
-        .join(Order, OrderItem.order_id == Order.order_id)
-        .where(Order.user_id == user_id, MenuItem.category == MenuCategory.DRINK)
-        .group_by(MenuItem.item_id)
-        .order_by(func.count(OrderItem.order_item_id).desc())
-        .limit(limit)
+        .join(OrderItem, OrderItem.order_id == Order.order_id)
+        .join(MenuItem, MenuItem.item_id == OrderItem.item_id)
+        .where(*criteria)
+        .group_by(Order.user_id, MenuItem.item_id, MenuItem.name, MenuItem.category)
     )
-    
-    result = await db.execute(stmt)
-    rows = result.all()
-    return [RecommendedItem.model_validate(row) for row in rows]
\ No newline at end of file
+    return result.all()
+
+def _add_rows(counters: dict[str, dict[int, int]], metas: dict[int, str], rows) -> None:
+    for row in rows:
+        group = _group(row.category)
+        counters[POPULAR_KEY.format(group=group)][row.item_id] += row.order_count
+        if row.user_id is not None:
+            counters[USER_POPULAR_KEY.format(user_id=row.user_id, group=group)][row.item_id] += row.order_count
+        metas[row.item_id] = _item_meta(row.name, row.category)
+
+# Учет нового заказа в счетчиках популярности
+async def record_order_popularity(order_id: int, db: AsyncSession, redis: Redis) -> None:
+    rows = await _popularity_rows(db, Order.order_id == order_id)
+    if not rows:
+        return
+
+    async def apply(pipe) -> None:
+        snapshot_id = await pipe.get(SNAPSHOT_KEY)
+        if snapshot_id is not None and order_id <= int(snapshot_id):
+            # Заказ уже вошел в снимок последней пересборки
+            return
+        pipe.multi()
+        for row in rows:
+            group = _group(row.category)
+            pipe.zincrby(POPULAR_KEY.format(group=group), row.order_count, row.item_id)
+            if row.user_id is not None:
+                pipe.zincrby(USER_POPULAR_KEY.format(user_id=row.user_id, group=group), row.order_count, row.item_id)
+        pipe.hset(ITEM_META_KEY, mapping={row.item_id: _item_meta(row.name, row.category) for row in rows})
+        pipe.sadd(RECORDED_KEY, order_id)
+
+    # Проверка снимка и инкременты выполняются атомарно относительно замены счетчиков пересборкой
+    await redis.transaction(apply, SNAPSHOT_KEY)
+
+# Сброс данных о позиции меню после ее изменения или удаления
+async def forget_menu_item(item_id: int, redis: Redis, deleted: bool = False) -> None:
+    pipe = redis.pipeline(transaction=False)
+    pipe.hdel(ITEM_META_KEY, item_id)
+    if deleted:
+        pipe.zrem(POPULAR_KEY.format(group=FOOD), item_id)
+        pipe.zrem(POPULAR_KEY.format(group=DRINKS), item_id)
+        async for key in redis.scan_iter("popularity:user:*"):
+            pipe.zrem(key, item_id)
+    await pipe.execute()
+
+# Пересборка счетчиков популярности по данным БД
+async def rebuild_popularity_counters(db: AsyncSession, redis: Redis) -> int:
+    # Снимок ограничен номером последнего заказа: заказы после него учитываются инкрементами
+    snapshot_id = (await db.execute(select(func.max(Order.order_id)))).scalar() or 0
+    rows = await _popularity_rows(db, Order.order_id <= snapshot_id)
+
+    async def swap(pipe) -> None:
+        counters: dict[str, dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        metas = {}
+        _add_rows(counters, metas, rows)
+
+        # Инкременты заказов новее снимка стираются заменой, поэтому эти заказы добавляются к снимку
+        newer = sorted(int(order_id) for order_id in await pipe.smembers(RECORDED_KEY) if int(order_id) > snapshot_id)
+        if newer:
+            _add_rows(counters, metas, await _popularity_rows(db, Order.order_id.in_(newer)))
+
+        stale_keys = [key async for key in redis.scan_iter("popularity:user:*")]
+
+        # Замена всех счетчиков одной транзакцией, чтобы чтения не видели частичное состояние
+        pipe.multi()
+        pipe.delete(POPULAR_KEY.format(group=FOOD), POPULAR_KEY.format(group=DRINKS), ITEM_META_KEY, RECORDED_KEY, *stale_keys)
+        for key, scores in counters.items():
+            pipe.zadd(key, scores)
+        if metas:
+            pipe.hset(ITEM_META_KEY, mapping=metas)
+        if newer:
+            pipe.sadd(RECORDED_KEY, *newer)
+        pipe.set(SNAPSHOT_KEY, snapshot_id)
+        pipe.set(BUILT_KEY, 1)
+
+    # Если между чтением учтенных заказов и заменой записан новый заказ, замена повторяется
+    await redis.transaction(swap, RECORDED_KEY)
+    return len(rows)
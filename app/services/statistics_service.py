@@ -1,11 +1,132 @@
+import json
+from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import func, select
-from datetime import date
+from redis.asyncio import Redis
+from sqlalchemy import DateTime, case, delete, func, select, tuple_, union_all
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from datetime import date, datetime, time, timedelta
 
+from app.models.menu_items import MenuItem
 from app.models.orders import Order, OrderStatus
-from app.models.order_assignments import OrderAssignment
+from app.models.order_items import OrderItem
+from app.models.order_assignments import OrderAssignment, StaffRole
+from app.models.staff_daily_stats import StaffDailyStats
 from app.models.user import UserRole
-from app.schemas.statistics import StaffStatsOut, StaffStatsWithRankOut
+from app.schemas.statistics import SalesBucketOut, SalesGranularity, StaffStatsOut, StaffStatsWithRankOut, StaffStatsSort
+
+CLOSED_CACHE_PREFIX = "statistics:staff:closed:"
+SALES_CACHE_KEY = "statistics:sales:{granularity}:{split}"
+MAX_SALES_BUCKETS = 5000
+STATS_BATCH_SIZE = 500
+
+# Дневные счетчики назначений по сырым данным за [day_from, day_to]; без day_from - с начала истории
+def _daily_counts_query(day_from: date | None, day_to: date):
+    stmt = (
+        select(
+            func.date(Order.order_date).label("stat_date"),
+            OrderAssignment.user_id,
+            OrderAssignment.role,
+            func.count(OrderAssignment.order_id).label("assigned_count"),
+            func.sum(case((Order.status == OrderStatus.READY, 1), else_=0)).label("ready_count"),
+            func.sum(case((Order.status == OrderStatus.COMPLETED, 1), else_=0)).label("completed_count")
+        )
+        .join(Order, OrderAssignment.order_id == Order.order_id)
+        .where(Order.order_date < datetime.combine(day_to + timedelta(days=1), time.min))
+        .group_by(func.date(Order.order_date), OrderAssignment.user_id, OrderAssignment.role)
+    )
+    if day_from is not None:
+        stmt = stmt.where(Order.order_date >= datetime.combine(day_from, time.min))
+    return stmt
+
+def _orders_count_column(source, role: UserRole, is_admin: bool):
+    if is_admin:
+        return source.c.assigned_count
+    if role == UserRole.WAITER:
+        return source.c.completed_count
+    return source.c.ready_count + source.c.completed_count
+
+# Пересчитать строки дневной статистики за период (при догрузке и изменении заказов прошедших дней).
+# Строки обновляются через upsert, поэтому одновременный пересчет одного дня не приводит к конфликту ключа
+async def refresh_staff_daily_stats(db: AsyncSession, day_from: date, day_to: date | None = None) -> int:
+    day_to = day_to or day_from
+    result = await db.execute(_daily_counts_query(day_from, day_to))
+    rows = [
+        {
+            "stat_date": row.stat_date if isinstance(row.stat_date, date) else date.fromisoformat(row.stat_date),
+            "user_id": row.user_id,
+            "role": row.role,
+            "assigned_count": row.assigned_count,
+            "ready_count": row.ready_count,
+            "completed_count": row.completed_count,
+        }
+        for row in result.all()
+    ]
+
+    # Строки сотрудников, у которых за день не осталось назначений
+    key_columns = (StaffDailyStats.stat_date, StaffDailyStats.user_id, StaffDailyStats.role)
+    existing = await db.execute(
+        select(*key_columns).where(StaffDailyStats.stat_date >= day_from, StaffDailyStats.stat_date <= day_to)
+    )
+    stale = list(set(map(tuple, existing.all())) - {(row["stat_date"], row["user_id"], row["role"]) for row in rows})
+    for start in range(0, len(stale), STATS_BATCH_SIZE):
+        await db.execute(delete(StaffDailyStats).where(tuple_(*key_columns).in_(stale[start:start + STATS_BATCH_SIZE])))
+
+    insert = postgresql_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    for start in range(0, len(rows), STATS_BATCH_SIZE):
+        stmt = insert(StaffDailyStats).values(rows[start:start + STATS_BATCH_SIZE])
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={
+                "assigned_count": stmt.excluded.assigned_count,
+                "ready_count": stmt.excluded.ready_count,
+                "completed_count": stmt.excluded.completed_count,
+            }
+        ))
+    await db.commit()
+    return len(rows)
+
+# Пересчет дня заказа после смены статуса, назначения или удаления.
+# Текущий день в дневную статистику не пишется: get_staff_statistics считает его по сырым данным.
+# Результаты по закрытым периодам кешируются без TTL, поэтому изменение прошедшего дня сбрасывает их
+async def refresh_order_day(db: AsyncSession, redis: Redis, order_date: datetime) -> None:
+    day = order_date.date()
+    if day >= date.today():
+        return
+    await refresh_staff_daily_stats(db, day)
+    await clear_closed_cache(redis)
+
+async def clear_closed_cache(redis: Redis) -> None:
+    keys = [key async for key in redis.scan_iter(f"{CLOSED_CACHE_PREFIX}*")]
+    if keys:
+        await redis.delete(*keys)
+
+# Последний день, записанный в дневную статистику; дни после него считаются по сырым данным
+async def last_rolled_up_day(db: AsyncSession) -> date | None:
+    result = await db.execute(select(func.max(StaffDailyStats.stat_date)))
+    return result.scalar_one_or_none()
+
+# Догрузка закрытых дней, которых еще нет в дневной статистике.
+# Кеш закрытых периодов сбрасывается: он мог быть посчитан до записи догруженных дней
+async def backfill_staff_daily_stats(db: AsyncSession, redis: Redis) -> int:
+    yesterday = date.today() - timedelta(days=1)
+    last_day = await last_rolled_up_day(db)
+    if last_day is not None:
+        # Предыдущий день пересчитывается повторно: заказы, закрытые после полуночи, меняют его
+        day_from = min(last_day - timedelta(days=1), yesterday)
+    else:
+        first_result = await db.execute(select(func.min(Order.order_date)))
+        first_order = first_result.scalar_one_or_none()
+        if first_order is None:
+            return 0
+        day_from = first_order.date()
+    if day_from > yesterday:
+        return 0
+    rows = await refresh_staff_daily_stats(db, day_from, yesterday)
+    await clear_closed_cache(redis)
+    return rows
 
 # Получить статистику по работе персонала
 async def get_staff_statistics(
@@ -14,62 +135,269 @@ async def get_staff_statistics(
     role: UserRole,
     is_admin: bool = False,
     start_date: date | None = None,
-    end_date: date | None = None
+    end_date: date | None = None,
+    limit: int = 50,
+    offset: int = 0,
+    sort_by: StaffStatsSort = StaffStatsSort.ORDERS_COUNT,
+    descending: bool = True
 ) -> list[StaffStatsOut] | dict:
-    stmt = select(
-        OrderAssignment.user_id,
-        OrderAssignment.role,
-        func.count(OrderAssignment.order_id).label("orders_count")
-    ).join(Order, OrderAssignment.order_id == Order.order_id)
+    today = date.today()
+    range_to = min(end_date, today) if end_date else today
+    parts = []
 
-    if role == UserRole.WAITER:
-        stmt = stmt.where(Order.status == OrderStatus.COMPLETED)
-    elif role in [UserRole.COOK, UserRole.BARKEEPER]:
-        stmt = stmt.where(Order.status.in_([OrderStatus.COMPLETED, OrderStatus.READY]))
+    # Закрытые дни, уже записанные в дневную статистику, берутся из нее
+    rolled_to = await last_rolled_up_day(db)
+    if rolled_to is not None:
+        rolled_to = min(rolled_to, today - timedelta(days=1), range_to)
+        if not start_date or start_date <= rolled_to:
+            closed = select(
+                StaffDailyStats.user_id,
+                StaffDailyStats.role,
+                StaffDailyStats.assigned_count,
+                StaffDailyStats.ready_count,
+                StaffDailyStats.completed_count
+            ).where(StaffDailyStats.stat_date <= rolled_to)
+            if start_date:
+                closed = closed.where(StaffDailyStats.stat_date >= start_date)
+            parts.append(closed)
 
-    if start_date:
-        stmt = stmt.where(Order.order_date >= start_date)
-    if end_date:
-        stmt = stmt.where(Order.order_date <= end_date)
+    # Текущий день и закрытые дни, которые догрузка еще не записала, считаются по сырым данным
+    raw_from = rolled_to + timedelta(days=1) if rolled_to is not None else None
+    if start_date and (raw_from is None or start_date > raw_from):
+        raw_from = start_date
+    if raw_from is None or raw_from <= range_to:
+        live = _daily_counts_query(raw_from, range_to).subquery()
+        parts.append(select(live.c.user_id, live.c.role, live.c.assigned_count, live.c.ready_count, live.c.completed_count))
 
-    stmt = stmt.group_by(OrderAssignment.user_id, OrderAssignment.role)
+    if not parts:
+        if is_admin:
+            return []
+        return [StaffStatsWithRankOut(user_id=user_id, role=role, orders_count=0, rating=None, total_employees=0)]
 
-    result = await db.execute(stmt)
-    stats = result.all()
+    source = union_all(*parts).subquery() if len(parts) > 1 else parts[0].subquery()
+    orders_count = func.sum(_orders_count_column(source, role, is_admin))
+    counts = select(source.c.user_id, source.c.role, orders_count.label("orders_count"))
+    if not is_admin:
+        counts = counts.where(source.c.role == StaffRole(role))
+    counts = counts.group_by(source.c.user_id, source.c.role).having(orders_count > 0).subquery()
 
-    if is_admin:
-        return [StaffStatsWithRankOut(
-            user_id=s.user_id,
-            role=s.role,
-            orders_count=s.orders_count,
-            rating=None,
-            total_employees=None
-        ) for s in stats]
+    # Место в рейтинге и число сотрудников роли считаются в БД оконными функциями
+    ranked = select(
+        counts.c.user_id,
+        counts.c.role,
+        counts.c.orders_count,
+        func.rank().over(partition_by=counts.c.role, order_by=counts.c.orders_count.desc()).label("rating"),
+        func.count().over(partition_by=counts.c.role).label("total_employees")
+    ).subquery()
 
-    same_role_stats = [s for s in stats if s.role == role]
-    same_role_stats.sort(key=lambda x: x.orders_count, reverse=True)
+    if is_admin:
+        sort_column = ranked.c[sort_by.value]
+        stmt = (
+            select(ranked)
+            .order_by(sort_column.desc() if descending else sort_column.asc(), ranked.c.user_id, ranked.c.role)
+            .limit(limit)
+            .offset(offset)
+        )
+        result = await db.execute(stmt)
+        return [StaffStatsWithRankOut.model_validate(s) for s in result.all()]
 
-    rating = None
-    current_stats = None
-    for idx, s in enumerate(same_role_stats, start=1):
-        if s.user_id == user_id:
-            rating = idx
-            current_stats = s
-            break
+    result = await db.execute(select(ranked).where(ranked.c.user_id == user_id))
+    current_stats = result.one_or_none()
 
     if current_stats is None:
+        total_result = await db.execute(select(func.count()).select_from(counts))
         return [StaffStatsWithRankOut(
             user_id=user_id,
             role=role,
             orders_count=0,
             rating=None,
-            total_employees=len(same_role_stats)
+            total_employees=total_result.scalar_one()
         )]
 
-    return [StaffStatsWithRankOut(
-        user_id=current_stats.user_id,
-        role=current_stats.role,
-        orders_count=current_stats.orders_count,
-        rating=rating,
-        total_employees=len(same_role_stats)
-    )]
\ No newline at end of file
+    return [StaffStatsWithRankOut.model_validate(current_stats)]
+
+class date_trunc(FunctionElement):
+    """date_trunc PostgreSQL; для SQLite (тесты) компилируется в strftime"""
+    type = DateTime()
+    inherit_cache = True
+
+    def __init__(self, granularity: SalesGranularity, expr):
+        self.granularity = SalesGranularity(granularity)
+        super().__init__(expr)
+
+@compiles(date_trunc)
+def _compile_date_trunc(element, compiler, **kw):
+    return f"date_trunc('{element.granularity.value}', {compiler.process(element.clauses, **kw)})"
+
+_SQLITE_TRUNC = {
+    SalesGranularity.HOUR: "'%Y-%m-%d %H:00:00', {}",
+    SalesGranularity.DAY: "'%Y-%m-%d 00:00:00', {}",
+    SalesGranularity.WEEK: "'%Y-%m-%d 00:00:00', {}, 'weekday 0', '-6 days'",
+    SalesGranularity.MONTH: "'%Y-%m-01 00:00:00', {}",
+}
+
+@compiles(date_trunc, "sqlite")
+def _compile_date_trunc_sqlite(element, compiler, **kw):
+    return f"strftime({_SQLITE_TRUNC[element.granularity].format(compiler.process(element.clauses, **kw))})"
+
+def truncate_to_bucket(moment: datetime, granularity: SalesGranularity) -> datetime:
+    if granularity == SalesGranularity.HOUR:
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == SalesGranularity.WEEK:
+        return day - timedelta(days=day.weekday())
+    if granularity == SalesGranularity.MONTH:
+        return day.replace(day=1)
+    return day
+
+def next_bucket(bucket: datetime, granularity: SalesGranularity) -> datetime:
+    if granularity == SalesGranularity.HOUR:
+        return bucket + timedelta(hours=1)
+    if granularity == SalesGranularity.WEEK:
+        return bucket + timedelta(days=7)
+    if granularity == SalesGranularity.MONTH:
+        return (bucket.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return bucket + timedelta(days=1)
+
+# Интервалы, покрывающие период [start_date, end_date] целиком
+def sales_buckets(start_date: date, end_date: date, granularity: SalesGranularity) -> list[datetime]:
+    bucket = truncate_to_bucket(datetime.combine(start_date, time.min), granularity)
+    end = datetime.combine(end_date + timedelta(days=1), time.min)
+    buckets = []
+    while bucket < end:
+        buckets.append(bucket)
+        bucket = next_bucket(bucket, granularity)
+    return buckets
+
+# Выручка, число заказов, средний чек и количество позиций по интервалам за [range_from, range_to).
+# Без разбивки по категориям выручка считается по сумме заказа, с разбивкой - по позициям заказа
+async def compute_sales(
+    db: AsyncSession,
+    granularity: SalesGranularity,
+    range_from: datetime,
+    range_to: datetime,
+    by_category: bool = False,
+    by_table: bool = False
+) -> list[SalesBucketOut]:
+    bucket = date_trunc(granularity, Order.order_date).label("bucket")
+    period = (
+        Order.status != OrderStatus.CANCELLED,
+        Order.order_date >= range_from,
+        Order.order_date < range_to
+    )
+
+    if by_category:
+        stmt = (
+            select(
+                bucket,
+                MenuItem.category,
+                func.sum(OrderItem.price * OrderItem.quantity).label("revenue"),
+                func.count(func.distinct(Order.order_id)).label("orders_count"),
+                func.sum(OrderItem.quantity).label("items_quantity")
+            )
+            .select_from(OrderItem)
+            .join(Order, OrderItem.order_id == Order.order_id)
+            .join(MenuItem, OrderItem.item_id == MenuItem.item_id)
+        )
+        group = [bucket, MenuItem.category]
+    else:
+        quantities = (
+            select(OrderItem.order_id, func.sum(OrderItem.quantity).label("quantity"))
+            .group_by(OrderItem.order_id)
+            .subquery()
+        )
+        stmt = (
+            select(
+                bucket,
+                func.sum(Order.total_price).label("revenue"),
+                func.count(Order.order_id).label("orders_count"),
+                func.coalesce(func.sum(quantities.c.quantity), 0).label("items_quantity")
+            )
+            .outerjoin(quantities, quantities.c.order_id == Order.order_id)
+        )
+        group = [bucket]
+    if by_table:
+        stmt = stmt.add_columns(Order.table_number)
+        group.append(Order.table_number)
+
+    result = await db.execute(stmt.where(*period).group_by(*group).order_by(*group))
+    sales = []
+    for row in result.all():
+        revenue = float(row.revenue or 0)
+        sales.append(SalesBucketOut(
+            bucket=row.bucket,
+            category=row.category if by_category else None,
+            table_number=row.table_number if by_table else None,
+            revenue=round(revenue, 2),
+            orders_count=row.orders_count,
+            average_ticket=round(revenue / row.orders_count, 2) if row.orders_count else 0.0,
+            items_quantity=int(row.items_quantity or 0)
+        ))
+    return sales
+
+# Продажи по интервалам. Закрытые интервалы кешируются в хеше Redis без TTL (поле - начало интервала),
+# текущий открытый интервал каждый раз считается заново
+async def get_sales_statistics(
+    db: AsyncSession,
+    redis: Redis,
+    granularity: SalesGranularity,
+    start_date: date,
+    end_date: date,
+    by_category: bool = False,
+    by_table: bool = False
+) -> list[SalesBucketOut]:
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="Начало периода позже его окончания")
+    buckets = sales_buckets(start_date, end_date, granularity)
+    if len(buckets) > MAX_SALES_BUCKETS:
+        raise HTTPException(status_code=400, detail="Слишком много интервалов, увеличьте шаг или сократите период")
+
+    open_bucket = truncate_to_bucket(datetime.now(), granularity)
+    buckets = [b for b in buckets if b <= open_bucket]
+    closed = [b for b in buckets if b < open_bucket]
+
+    split = "_".join(name for name, enabled in (("category", by_category), ("table", by_table)) if enabled) or "total"
+    key = SALES_CACHE_KEY.format(granularity=granularity.value, split=split)
+
+    by_bucket: dict[datetime, list[SalesBucketOut]] = {}
+    if closed:
+        cached = await redis.hmget(key, [b.isoformat() for b in closed])
+        for b, value in zip(closed, cached):
+            if value is not None:
+                by_bucket[b] = [SalesBucketOut.model_validate(row) for row in json.loads(value)]
+
+    missing = [b for b in closed if b not in by_bucket]
+    if missing:
+        # Непрерывные серии пропущенных интервалов считаются отдельно, чтобы не пересчитать закешированные между ними
+        runs: list[list[datetime]] = []
+        for b in missing:
+            if runs and next_bucket(runs[-1][-1], granularity) == b:
+                runs[-1].append(b)
+            else:
+                runs.append([b])
+        for run in runs:
+            computed = await compute_sales(
+                db, granularity, run[0], next_bucket(run[-1], granularity), by_category, by_table
+            )
+            for row in computed:
+                by_bucket.setdefault(row.bucket, []).append(row)
+        # Пустые интервалы тоже кешируются, чтобы не пересчитывать их
+        await redis.hset(key, mapping={
+            b.isoformat(): json.dumps([row.model_dump(mode="json") for row in by_bucket.get(b, [])], ensure_ascii=False)
+            for b in missing
+        })
+
+    if buckets and buckets[-1] == open_bucket:
+        by_bucket[open_bucket] = await compute_sales(
+            db, granularity, open_bucket, next_bucket(open_bucket, granularity), by_category, by_table
+        )
+
+    return [row for b in buckets for row in by_bucket.get(b, [])]
+
+# Отмена или удаление заказа из закрытого интервала меняет уже закешированные продажи
+async def invalidate_sales_cache(redis: Redis, order_date: datetime) -> None:
+    if order_date >= truncate_to_bucket(datetime.now(), SalesGranularity.HOUR):
+        return
+    keys = [key async for key in redis.scan_iter(SALES_CACHE_KEY.format(granularity="*", split="*"))]
+    if keys:
+        await redis.delete(*keys)
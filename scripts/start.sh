@@ -20,5 +20,10 @@ echo "Running database migrations..."
 alembic upgrade head
 
 # Запускаем приложение
+# Ping/pong на уровне протокола WebSocket: клиенты отвечают на него автоматически, оборванные соединения
+# закрываются сервером, и их сессии удаляются
 echo "Starting application..."
-uvicorn app.main:app --host 0.0.0.0 --port 8000
\ No newline at end of file
+uvicorn app.main:app --host 0.0.0.0 --port 8000 \
+    --ws websockets \
+    --ws-ping-interval "${WS_PROTOCOL_PING_INTERVAL:-20}" \
+    --ws-ping-timeout "${WS_PROTOCOL_PING_TIMEOUT:-20}"
\ No newline at end of file
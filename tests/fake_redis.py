@@ -0,0 +1,126 @@
+class FakeRedis:
+    """Строки, сортированные множества, хеши и множества Redis в памяти: команды, которые используют сервисы.
+
+    Время истечения ключей отсчитывается по полю now, которое тест сдвигает вручную.
+    """
+
+    def __init__(self):
+        self.zsets = {}
+        self.hashes = {}
+        self.sets = {}
+        self.values = {}
+        self.expires = {}
+        self.now = 0.0
+        # Вызывается один раз перед транзакцией, чтобы вклиниться между чтением снимка и заменой
+        self.before_transaction = None
+
+    async def zincrby(self, key, amount, member):
+        zset = self.zsets.setdefault(key, {})
+        zset[str(member)] = zset.get(str(member), 0) + amount
+
+    async def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update({str(member): score for member, score in mapping.items()})
+
+    async def zrevrange(self, key, start, end, withscores=False):
+        ranked = sorted(self.zsets.get(key, {}).items(), key=lambda pair: -pair[1])[start:end + 1]
+        return ranked if withscores else [member for member, _ in ranked]
+
+    async def zrem(self, key, member):
+        self.zsets.get(key, {}).pop(str(member), None)
+
+    async def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update({str(field): value for field, value in mapping.items()})
+
+    async def hmget(self, key, fields):
+        return [self.hashes.get(key, {}).get(str(field)) for field in fields]
+
+    async def hdel(self, key, field):
+        self.hashes.get(key, {}).pop(str(field), None)
+
+    async def sadd(self, key, *members):
+        self.sets.setdefault(key, set()).update(str(member) for member in members)
+
+    async def smembers(self, key):
+        return set(self.sets.get(key, set()))
+
+    def _expire(self, key):
+        if key in self.expires and self.expires[key] <= self.now:
+            del self.expires[key]
+            self.values.pop(key, None)
+
+    async def get(self, key):
+        self._expire(key)
+        return self.values.get(key)
+
+    async def set(self, key, value, nx=False, px=None):
+        self._expire(key)
+        if nx and key in self.values:
+            return None
+        self.values[key] = str(value)
+        self.expires.pop(key, None)
+        if px is not None:
+            self.expires[key] = self.now + px / 1000
+        return True
+
+    async def pexpire(self, key, milliseconds):
+        self._expire(key)
+        if key not in self.values:
+            return 0
+        self.expires[key] = self.now + milliseconds / 1000
+        return 1
+
+    async def exists(self, key):
+        self._expire(key)
+        return int(key in self.values)
+
+    async def delete(self, *keys):
+        for key in keys:
+            for storage in (self.zsets, self.hashes, self.sets, self.values, self.expires):
+                storage.pop(key, None)
+
+    async def scan_iter(self, pattern):
+        prefix = pattern.rstrip("*")
+        for key in list(self.zsets):
+            if key.startswith(prefix):
+                yield key
+
+    async def aclose(self):
+        pass
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self, queued=True)
+
+    async def transaction(self, func, *watches):
+        if self.before_transaction:
+            hook, self.before_transaction = self.before_transaction, None
+            await hook()
+        pipe = FakePipeline(self, queued=False)
+        await func(pipe)
+        return await pipe.execute()
+
+
+class FakePipeline:
+    """До multi() команды выполняются сразу, как в WATCH-режиме, после - накапливаются до execute()"""
+
+    def __init__(self, redis, queued):
+        self.redis = redis
+        self.queued = queued
+        self.commands = []
+
+    def multi(self):
+        self.queued = True
+
+    def __getattr__(self, name):
+        command = getattr(self.redis, name)
+        if not self.queued:
+            return command
+
+        def queue(*args, **kwargs):
+            self.commands.append((command, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self):
+        results = [await command(*args, **kwargs) for command, args, kwargs in self.commands]
+        self.commands = []
+        return results
@@ -17,4 +17,28 @@ def schedule_booking_updater():
 
 # Мок асинхронной функции update_bookings_status
 async def update_bookings_status():
-    print("[MOCK SCHEDULER] update_bookings_status вызван (мок)")
\ No newline at end of file
+    print("[MOCK SCHEDULER] update_bookings_status вызван (мок)")
+
+# Мок асинхронной функции stop_scheduler
+async def stop_scheduler():
+    scheduler.shutdown()
+
+# Мок функции schedule_popularity_rebuild
+def schedule_popularity_rebuild():
+    scheduler.add_job()
+
+# Мок функции schedule_recommender_training
+def schedule_recommender_training():
+    scheduler.add_job()
+
+# Мок функции schedule_staff_stats_backfill
+def schedule_staff_stats_backfill():
+    scheduler.add_job()
+
+# Мок функции schedule_eta_refresh
+def schedule_eta_refresh():
+    scheduler.add_job()
+
+# Мок функции schedule_export_cleanup
+def schedule_export_cleanup():
+    scheduler.add_job()
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+import pytest_asyncio
+from datetime import datetime
+from sqlalchemy import select
+
+from app.models.menu_items import MenuCategory, MenuItem
+from app.models.orders import Order, OrderStatus
+from app.models.order_items import OrderItem, OrderItemStatus
+from app.models.order_assignments import OrderAssignment, StaffRole
+from app.models.reviews import Review
+from app.services.analytics_engine import AnalyticsEngine
+
+
+class TestAnalyticsEngine:
+    @pytest_asyncio.fixture
+    async def history(self, test_db):
+        test_db.add_all([
+            MenuItem(item_id=1, name="Суп", price=200, category=MenuCategory.SOUP),
+            MenuItem(item_id=2, name="Чай", price=50, category=MenuCategory.DRINK),
+        ])
+        plan = [
+            (datetime(2025, 3, 3, 12), OrderStatus.COMPLETED, [(1, 2), (2, 1)]),
+            (datetime(2025, 3, 3, 19), OrderStatus.COMPLETED, [(2, 3)]),
+            (datetime(2025, 3, 4, 12), OrderStatus.PENDING, [(1, 1)]),
+        ]
+        for moment, status, items in plan:
+            order = Order(user_id=1, table_number=1, total_price=100, status=status, order_date=moment)
+            test_db.add(order)
+            await test_db.flush()
+            for item_id, quantity in items:
+                test_db.add(OrderItem(order_id=order.order_id, item_id=item_id, quantity=quantity,
+                                      price=200 if item_id == 1 else 50, status=OrderItemStatus.PENDING))
+            test_db.add(OrderAssignment(order_id=order.order_id, user_id=10, role=StaffRole.WAITER))
+        test_db.add(Review(user_id=1, order_id=1, rating=5, review_date=datetime(2025, 3, 3, 13)))
+        await test_db.commit()
+
+    # Тест загрузки в колонки с компактными типами и словарным кодированием
+    @pytest.mark.asyncio
+    async def test_columnar_load(self, test_db, history):
+        engine = AnalyticsEngine()
+        await engine.rebuild(test_db)
+        items = engine.tables["order_items"]
+        assert len(items) == 4
+        assert items.columns["order_id"].dtype == np.int32
+        assert items.columns["price"].dtype == np.float64
+        assert items.columns["category"].dtype == np.uint8
+        assert engine.metrics()["rows"] == {"orders": 3, "order_items": 4, "assignments": 3, "reviews": 1}
+
+    # Тест группировки, фильтра и top-k
+    @pytest.mark.asyncio
+    async def test_group_by_and_top_k(self, test_db, history):
+        engine = AnalyticsEngine()
+        await engine.rebuild(test_db)
+
+        revenue = engine.aggregate("order_items", ["category"], "sum", "revenue")
+        assert revenue == [
+            {"category": "Soup", "count": 2, "value": 600.0},
+            {"category": "Drink", "count": 2, "value": 200.0},
+        ]
+
+        top = engine.aggregate("order_items", ["item_id", "day"], "sum", "quantity", limit=1)
+        assert top == [{"item_id": 2, "day": "2025-03-03", "count": 2, "value": 4.0}]
+
+        completed = engine.aggregate("orders", [], filters={"status": "Completed"})
+        assert completed == [{"count": 2, "value": 2.0}]
+
+        with pytest.raises(ValueError):
+            engine.aggregate("orders", ["unknown"])
+
+    # Тест инкрементального обновления: новые заказы по watermark и перечитывание незавершенных
+    @pytest.mark.asyncio
+    async def test_incremental_sync(self, test_db, history):
+        engine = AnalyticsEngine()
+        await engine.rebuild(test_db)
+
+        pending = (await test_db.execute(select(Order).where(Order.status == OrderStatus.PENDING))).scalar_one()
+        pending.status = OrderStatus.COMPLETED
+        test_db.add(Order(user_id=2, table_number=3, total_price=50, status=OrderStatus.PENDING,
+                          order_date=datetime(2025, 3, 5, 9)))
+        await test_db.commit()
+
+        await engine.sync(test_db)
+        assert engine.watermark == 4
+        statuses = engine.aggregate("orders", ["status"], descending=True)
+        assert {row["status"]: row["count"] for row in statuses} == {"Completed": 3, "Pending": 1}
+        assert list(engine.tables["orders"].columns["order_id"]) == [1, 2, 3, 4]
+
+    # Тест бюджета памяти: старые заказы вытесняются из снимка
+    @pytest.mark.asyncio
+    async def test_memory_budget(self, test_db, history):
+        engine = AnalyticsEngine(memory_budget=1)
+        await engine.rebuild(test_db)
+        assert engine.metrics()["coverage_from"] is not None
+        assert len(engine.tables["orders"]) < 3
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+import pytest_asyncio
+
+from app.models.menu_items import MenuItem, MenuCategory
+from app.models.orders import Order
+from app.models.order_items import OrderItem
+from app.services.collaborative_service import FactorModel, _factorize, train_factor_model
+
+
+async def _add_order(test_db, user_id, item_ids):
+    order = Order(user_id=user_id, table_number=1, total_price=100.0)
+    test_db.add(order)
+    await test_db.flush()
+    for item_id in item_ids:
+        test_db.add(OrderItem(order_id=order.order_id, item_id=item_id, quantity=1, price=100.0))
+    await test_db.commit()
+
+
+class TestCollaborativeService:
+    @pytest_asyncio.fixture
+    async def history(self, test_db):
+        test_db.add_all([
+            MenuItem(item_id=1, name="Паста", price=300, category=MenuCategory.MAIN, is_available=True),
+            MenuItem(item_id=2, name="Тирамису", price=200, category=MenuCategory.DESSERT, is_available=True),
+            MenuItem(item_id=3, name="Борщ", price=250, category=MenuCategory.SOUP, is_available=True),
+            MenuItem(item_id=4, name="Эспрессо", price=100, category=MenuCategory.DRINK, is_available=True),
+        ])
+        await test_db.commit()
+        # Пользователи 1 и 2 берут пасту с тирамису, пользователь 3 - борщ
+        for user_id in (1, 2):
+            await _add_order(test_db, user_id, [1, 2, 4])
+            await _add_order(test_db, user_id, [1, 2])
+        await _add_order(test_db, 3, [3])
+        await _add_order(test_db, 3, [3])
+        # Пользователь 4 заказывал только пасту
+        await _add_order(test_db, 4, [1])
+
+    # Тест обучения модели и выдачи рекомендаций по факторам
+    @pytest.mark.asyncio
+    async def test_train_and_recommend(self, test_db, history, tmp_path):
+        version = await train_factor_model(test_db, model_dir=str(tmp_path), rank=2)
+        assert version is not None
+
+        model = FactorModel(model_dir=str(tmp_path))
+        result = model.recommend(4, drinks=False, limit=2)
+        assert [item.item_id for item in result] == [1, 2]
+        assert result[0].order_count == 1
+        assert result[1].order_count == 0
+
+        drinks = model.recommend(1, drinks=True)
+        assert [item.item_id for item in drinks] == [4]
+
+    # Тест отсутствия пользователя и модели
+    @pytest.mark.asyncio
+    async def test_unknown_user_and_missing_model(self, test_db, history, tmp_path):
+        model = FactorModel(model_dir=str(tmp_path))
+        assert model.recommend(1, drinks=False) is None
+
+        await train_factor_model(test_db, model_dir=str(tmp_path), rank=2)
+        model = FactorModel(model_dir=str(tmp_path))
+        assert model.recommend(999, drinks=False) is None
+
+    # Тест ALS по разреженным взаимодействиям: ошибка приближения как у усеченного SVD плотной матрицы
+    def test_factorize_matches_truncated_svd(self):
+        rng = np.random.default_rng(1)
+        matrix = (rng.random((120, 40)) < 0.15) * rng.integers(1, 5, (120, 40))
+        user_idx, item_idx = np.nonzero(matrix)
+
+        user_factors, item_factors = _factorize(user_idx, item_idx, matrix[user_idx, item_idx], 120, 40, rank=5, iterations=50)
+        assert user_factors.shape == (120, 5) and item_factors.shape == (40, 5)
+
+        dense = np.log1p(matrix)
+        u, s, vt = np.linalg.svd(dense, full_matrices=False)
+        best = np.linalg.norm(dense - (u[:, :5] * s[:5]) @ vt[:5])
+        assert np.linalg.norm(dense - user_factors @ item_factors.T) <= best * 1.01
@@ -0,0 +1,73 @@
+import pytest
+import pytest_asyncio
+
+from app.models.menu_items import MenuItem, MenuCategory
+from app.models.orders import Order
+from app.models.order_items import OrderItem
+from app.services.cooccurrence_service import CooccurrenceIndex
+
+
+async def _add_order(test_db, item_ids):
+    order = Order(user_id=1, table_number=1, total_price=100.0)
+    test_db.add(order)
+    await test_db.flush()
+    for item_id in item_ids:
+        test_db.add(OrderItem(order_id=order.order_id, item_id=item_id, quantity=1, price=100.0))
+    await test_db.commit()
+
+
+class TestCooccurrenceIndex:
+    @pytest_asyncio.fixture
+    async def menu(self, test_db):
+        items = [
+            MenuItem(item_id=1, name="Бургер", price=300, category=MenuCategory.MAIN, is_available=True),
+            MenuItem(item_id=2, name="Картофель фри", price=100, category=MenuCategory.GARNISH, is_available=True),
+            MenuItem(item_id=3, name="Кола", price=80, category=MenuCategory.DRINK, is_available=True),
+            MenuItem(item_id=4, name="Чизкейк", price=200, category=MenuCategory.DESSERT, is_available=False),
+        ]
+        test_db.add_all(items)
+        await test_db.commit()
+        return items
+
+    # Тест рекомендаций по совместным заказам
+    @pytest.mark.asyncio
+    async def test_recommend_ordered_together(self, test_db, menu):
+        await _add_order(test_db, [1, 2, 3])
+        await _add_order(test_db, [1, 2])
+        await _add_order(test_db, [1, 1, 3])
+
+        index = CooccurrenceIndex()
+        await index.ensure_ready(test_db)
+
+        result = index.recommend([1])
+        assert [item.item_id for item in result] == [2, 3]
+        assert result[0].order_count == 2
+        assert index.recommend([999]) == []
+
+    # Тест фильтрации недоступных позиций и позиций из корзины
+    @pytest.mark.asyncio
+    async def test_excludes_cart_and_unavailable(self, test_db, menu):
+        await _add_order(test_db, [1, 4])
+        await _add_order(test_db, [1, 2])
+
+        index = CooccurrenceIndex()
+        await index.ensure_ready(test_db)
+
+        result = index.recommend([1, 2])
+        assert result == []
+
+    # Тест инкрементального обновления матрицы
+    @pytest.mark.asyncio
+    async def test_incremental_sync(self, test_db, menu):
+        await _add_order(test_db, [1, 2])
+        index = CooccurrenceIndex()
+        await index.ensure_ready(test_db)
+
+        await _add_order(test_db, [1, 3])
+        await _add_order(test_db, [1, 3])
+        await index.sync(test_db)
+
+        result = index.recommend([1])
+        assert [item.item_id for item in result] == [3, 2]
+        assert result[0].order_count == 2
+        assert index.recommend([3])[0].item_id == 1
@@ -0,0 +1,67 @@
+import pytest
+from datetime import date, datetime, timedelta
+
+from app.models.menu_items import MenuCategory, MenuItem
+from app.models.orders import Order, OrderStatus
+from app.models.order_items import OrderItem, OrderItemStatus
+from app.models.staff_shifts import StaffShift
+from app.models.user import User, UserRole
+from app.services.eta_service import EtaModel, compute_eta_parameters
+
+
+class TestEtaService:
+    # Тест расчета параметров: очередь по цехам и повара на активной смене
+    @pytest.mark.asyncio
+    async def test_compute_parameters(self, test_db):
+        now = datetime.now()
+        test_db.add_all([
+            User(user_id=30, username="cook", password_hash="x", email="cook@example.com", role=UserRole.COOK),
+            User(user_id=31, username="bar", password_hash="x", email="bar@example.com", role=UserRole.BARKEEPER),
+            MenuItem(item_id=1, name="Суп", price=200, category=MenuCategory.SOUP),
+            MenuItem(item_id=2, name="Чай", price=50, category=MenuCategory.DRINK),
+            StaffShift(user_id=30, shift_date=date.today(),
+                       shift_start=(now - timedelta(hours=1)).time(), shift_end=(now + timedelta(hours=1)).time()),
+            StaffShift(user_id=31, shift_date=date.today() - timedelta(days=1),
+                       shift_start=(now - timedelta(hours=1)).time(), shift_end=(now + timedelta(hours=1)).time()),
+        ])
+        order = Order(user_id=1, table_number=1, total_price=450, status=OrderStatus.IN_PROGRESS)
+        test_db.add(order)
+        await test_db.flush()
+        test_db.add_all([
+            OrderItem(order_id=order.order_id, item_id=1, quantity=2, price=200, status=OrderItemStatus.IN_PROGRESS),
+            OrderItem(order_id=order.order_id, item_id=2, quantity=1, price=50, status=OrderItemStatus.READY),
+        ])
+        await test_db.commit()
+
+        parameters = await compute_eta_parameters(test_db)
+        assert parameters["queue"] == {"kitchen": 1}
+        assert parameters["staff"] == {"kitchen": 1, "bar": 0}
+        assert parameters["drink_items"] == [2]
+
+    # Тест оценки: ожидание в очереди цеха и медианное время позиции
+    def test_estimate(self):
+        model = EtaModel()
+        model.load({
+            "computed_at": "2025-03-03T12:00:00",
+            "item_prep": {"1": 600.0},
+            "station_prep": {"kitchen": 900.0, "bar": 120.0},
+            "drink_items": [2],
+            "queue": {"kitchen": 6, "bar": 0},
+            "staff": {"kitchen": 2, "bar": 1},
+        })
+        now = datetime(2025, 3, 3, 12, 0)
+        order = {
+            "status": OrderStatus.PENDING,
+            "order_date": "2025-03-03T11:55:00",
+            "items": [
+                {"item_id": 1, "status": OrderItemStatus.PENDING},
+                {"item_id": 2, "status": OrderItemStatus.IN_PROGRESS},
+            ],
+        }
+        # Кухня: 6 позиций * 900 с / (2 повара * 3 позиции) + 600 с
+        assert model.estimate(order, now) == now + timedelta(seconds=1500)
+
+        order["items"][0]["status"] = OrderItemStatus.READY
+        assert model.estimate(order, now) == now + timedelta(seconds=60)
+
+        assert model.estimate({**order, "status": OrderStatus.READY}, now) is None
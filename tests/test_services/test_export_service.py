@@ -0,0 +1,125 @@
+import gzip
+import json
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+import pytest_asyncio
+from datetime import date, datetime
+from decimal import Decimal
+
+from app.models.orders import Order, OrderStatus
+from app.models.order_items import OrderItem, OrderItemStatus
+from app.models.reviews import Review
+from app.models.table_booking import BookingStatus, TableBooking
+from app.schemas.export import ExportDataset, ExportFormat, StreamFormat
+from app.services.export_service import JOB_KEY, export_dataset, iter_export, purge_expired_exports
+
+
+class KeysRedis:
+    """Redis с набором существующих ключей: только проверка метаданных выгрузок конвейером"""
+
+    def __init__(self, keys):
+        self.keys = set(keys)
+        self.commands = []
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def exists(self, key):
+        self.commands.append(key)
+
+    async def execute(self):
+        results, self.commands = [int(key in self.keys) for key in self.commands], []
+        return results
+
+
+class TestExportService:
+    @pytest_asyncio.fixture
+    async def history(self, test_db):
+        plan = [
+            (datetime(2025, 3, 3, 12), OrderStatus.COMPLETED),
+            (datetime(2025, 3, 3, 19), OrderStatus.CANCELLED),
+            (datetime(2025, 3, 4, 12), OrderStatus.PENDING),
+            (datetime(2025, 3, 6, 9), OrderStatus.PENDING),
+        ]
+        for moment, status in plan:
+            order = Order(user_id=1, table_number=2, total_price=Decimal("150.50"), status=status, order_date=moment)
+            test_db.add(order)
+            await test_db.flush()
+            test_db.add(OrderItem(order_id=order.order_id, item_id=1, quantity=2, price=75, status=OrderItemStatus.PENDING))
+        test_db.add(Review(user_id=1, order_id=1, rating=4, comment="Вкусно", review_date=datetime(2025, 3, 3, 13)))
+        await test_db.commit()
+
+    # Тест выгрузки в Parquet с партициями по дням
+    @pytest.mark.asyncio
+    async def test_export_parquet_partitions(self, test_db, history, tmp_path):
+        files = await export_dataset(test_db, ExportDataset.ORDERS, date(2025, 3, 3), date(2025, 3, 4), ExportFormat.PARQUET, str(tmp_path))
+
+        assert [(f.partition, f.rows) for f in files] == [(date(2025, 3, 3), 2), (date(2025, 3, 4), 1)]
+        assert files[0].path == os.path.join("orders", "date=2025-03-03", "part-00000.parquet")
+
+        table = pq.read_table(tmp_path / files[0].path)
+        assert table.column("status").to_pylist() == ["Completed", "Cancelled"]
+        assert table.column("total_price").to_pylist() == [Decimal("150.50"), Decimal("150.50")]
+
+        dataset = pq.read_table(tmp_path / "orders")
+        assert dataset.num_rows == 3
+
+    # Тест выгрузки в Arrow IPC и чтения через memory mapping
+    @pytest.mark.asyncio
+    async def test_export_arrow_memory_mapped(self, test_db, history, tmp_path):
+        files = await export_dataset(test_db, ExportDataset.ORDER_ITEMS, date(2025, 3, 1), date(2025, 3, 31), ExportFormat.ARROW, str(tmp_path))
+
+        assert [f.partition for f in files] == [date(2025, 3, 3), date(2025, 3, 4), date(2025, 3, 6)]
+        with pa.memory_map(str(tmp_path / files[0].path)) as source:
+            table = pa.ipc.open_file(source).read_all()
+        assert table.num_rows == 2
+        assert table.column("quantity").to_pylist() == [2, 2]
+
+        reviews = await export_dataset(test_db, ExportDataset.REVIEWS, date(2025, 3, 1), date(2025, 3, 31), ExportFormat.ARROW, str(tmp_path))
+        assert len(reviews) == 1 and reviews[0].rows == 1
+
+    # Тест пустого периода
+    @pytest.mark.asyncio
+    async def test_export_empty_range(self, test_db, history, tmp_path):
+        files = await export_dataset(test_db, ExportDataset.ORDERS, date(2025, 4, 1), date(2025, 4, 30), ExportFormat.PARQUET, str(tmp_path))
+        assert files == []
+
+    # Тест потоковой выгрузки в CSV с фильтром по датам
+    @pytest.mark.asyncio
+    async def test_stream_csv(self, test_db, history):
+        chunks = [chunk async for chunk in iter_export(test_db, ExportDataset.ORDERS, StreamFormat.CSV, start_date=date(2025, 3, 4))]
+        lines = b"".join(chunks).decode("utf-8").splitlines()
+
+        assert lines[0] == "order_date,order_id,user_id,total_price,status,table_number,comment"
+        assert lines[1:] == ["2025-03-04T12:00:00,3,1,150.50,Pending,2,", "2025-03-06T09:00:00,4,1,150.50,Pending,2,"]
+
+    # Тест потоковой выгрузки в NDJSON со сжатием gzip
+    @pytest.mark.asyncio
+    async def test_stream_ndjson_gzip(self, test_db, history):
+        test_db.add(TableBooking(table_number=3, booking_time=datetime(2025, 3, 5, 18), customer_name="Иван",
+                                 phone_number="+70000000000", status=BookingStatus.CONFIRMED, duration_minutes=90))
+        await test_db.commit()
+
+        chunks = [chunk async for chunk in iter_export(test_db, ExportDataset.BOOKINGS, StreamFormat.NDJSON, compress=True)]
+        rows = [json.loads(line) for line in gzip.decompress(b"".join(chunks)).decode("utf-8").splitlines()]
+
+        assert rows == [{
+            "booking_time": "2025-03-05T18:00:00", "booking_id": 1, "table_number": 3, "customer_name": "Иван",
+            "phone_number": "+70000000000", "user_id": None, "status": "Confirmed", "duration_minutes": 90
+        }]
+
+    # Тест удаления файлов выгрузок, метаданные которых истекли
+    @pytest.mark.asyncio
+    async def test_purge_expired_exports(self, tmp_path):
+        for job_id in ("active", "expired"):
+            (tmp_path / job_id / "orders").mkdir(parents=True)
+            (tmp_path / job_id / "orders" / "part-00000.parquet").write_bytes(b"data")
+        (tmp_path / "README").write_text("не каталог выгрузки")
+
+        removed = await purge_expired_exports(KeysRedis({JOB_KEY.format(job_id="active")}), str(tmp_path))
+
+        assert removed == 1
+        assert sorted(os.listdir(tmp_path)) == ["README", "active"]
+        assert await purge_expired_exports(KeysRedis(set()), str(tmp_path / "missing")) == 0
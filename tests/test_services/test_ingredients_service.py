@@ -7,7 +7,8 @@ from app.services.ingredients_service import (
     get_ingredients_by_item_id,
     create_menu_item_ingredient,
     delete_menu_item_ingredient,
-    get_all_menu_item_ingredients
+    get_all_menu_item_ingredients,
+    update_ingredient_cost
 )
 from app.models.ingredients import Ingredient
 
@@ -79,6 +80,42 @@ class TestIngredientsService:
         assert result.ingredient.ingredient_id == sample_ingredient.ingredient_id
         assert result.required_quantity == Decimal("1.0")
 
+    # Тест обновления себестоимости существующего ингредиента при добавлении в состав
+    @pytest.mark.asyncio
+    async def test_create_menu_item_ingredient_updates_unit_cost(self, test_db, sample_ingredient):
+        from app.schemas.ingredient import MenuItemIngredientCreate, IngredientCreate
+
+        ingredient_data = MenuItemIngredientCreate(
+            ingredient=IngredientCreate(
+                name=sample_ingredient.name,
+                unit=sample_ingredient.unit,
+                quantity=float(sample_ingredient.quantity),
+                threshold=float(sample_ingredient.threshold),
+                unit_cost=Decimal("0.25")
+            ),
+            required_quantity=Decimal("1.0")
+        )
+
+        result = await create_menu_item_ingredient(1, ingredient_data, test_db)
+
+        assert result.ingredient.ingredient_id == sample_ingredient.ingredient_id
+        assert result.ingredient.unit_cost == Decimal("0.25")
+
+    # Тест изменения себестоимости ингредиента
+    @pytest.mark.asyncio
+    async def test_update_ingredient_cost(self, test_db, sample_ingredient):
+        from app.schemas.ingredient import IngredientCostUpdate
+
+        result = await update_ingredient_cost(sample_ingredient.ingredient_id, IngredientCostUpdate(unit_cost=Decimal("1.5")), test_db)
+        assert result.unit_cost == Decimal("1.5")
+
+        ingredients = await get_ingredients_by_item_id(1, test_db)
+        assert all(item.ingredient.unit_cost == Decimal("1.5") for item in ingredients)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await update_ingredient_cost(999, IngredientCostUpdate(unit_cost=Decimal("1")), test_db)
+        assert exc_info.value.status_code == 404
+
     # Тест удаления связи ингредиента с позицией меню
     @pytest.mark.asyncio
     async def test_delete_menu_item_ingredient_success(self, test_db, sample_ingredient):
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+import pytest_asyncio
+from datetime import datetime
+
+from app.models.ingredients import Ingredient
+from app.models.menu_items import MenuCategory, MenuItem
+from app.models.menu_item_ingredients import MenuItemIngredient
+from app.models.orders import Order, OrderStatus
+from app.models.order_items import OrderItem
+from app.services.menu_engineering_service import abc_classes, classify, get_menu_engineering
+
+
+class TestMenuEngineeringService:
+    @pytest_asyncio.fixture
+    async def menu(self, test_db):
+        test_db.add_all([
+            MenuItem(item_id=1, name="Стейк", price=1000, category=MenuCategory.MAIN),
+            MenuItem(item_id=2, name="Салат", price=300, category=MenuCategory.STARTER),
+            MenuItem(item_id=3, name="Трюфель", price=900, category=MenuCategory.DESSERT),
+            Ingredient(ingredient_id=1, name="Говядина", unit="кг", quantity=10, threshold=1, unit_cost=1200),
+            Ingredient(ingredient_id=2, name="Зелень", unit="кг", quantity=5, threshold=1, unit_cost=500),
+            Ingredient(ingredient_id=3, name="Трюфель", unit="г", quantity=100, threshold=10),
+        ])
+        test_db.add_all([
+            MenuItemIngredient(item_id=1, ingredient_id=1, required_quantity=0.3),
+            MenuItemIngredient(item_id=2, ingredient_id=2, required_quantity=0.2),
+            MenuItemIngredient(item_id=3, ingredient_id=3, required_quantity=5),
+        ])
+        for status, items in [
+            (OrderStatus.COMPLETED, [(1, 4, 1000), (2, 5, 300)]),
+            (OrderStatus.COMPLETED, [(2, 5, 300), (3, 1, 900)]),
+            (OrderStatus.CANCELLED, [(3, 10, 900)]),
+        ]:
+            order = Order(user_id=1, table_number=1, total_price=100, status=status, order_date=datetime(2025, 3, 3, 12))
+            test_db.add(order)
+            await test_db.flush()
+            for item_id, quantity, price in items:
+                test_db.add(OrderItem(order_id=order.order_id, item_id=item_id, quantity=quantity, price=price))
+        await test_db.commit()
+
+    # Тест продаж, себестоимости и классификации позиций
+    @pytest.mark.asyncio
+    async def test_report(self, test_db, menu):
+        report = {item.item_id: item for item in await get_menu_engineering(test_db)}
+
+        steak = report[1]
+        assert (steak.sold, steak.revenue, steak.unit_cost, steak.unit_margin) == (4, 4000.0, 360.0, 640.0)
+        assert steak.cost_complete
+        assert steak.menu_class == "star"
+
+        salad = report[2]
+        assert (salad.sold, salad.unit_margin) == (10, 200.0)
+        assert salad.menu_class == "plowhorse"
+
+        truffle = report[3]
+        assert truffle.sold == 1
+        assert not truffle.cost_complete
+        assert truffle.menu_class == "puzzle"
+
+        assert [report[i].abc_class for i in (1, 2, 3)] == ["A", "A", "B"]
+
+    # Тест векторной классификации
+    def test_classify(self):
+        sold = np.array([50, 40, 5, 5])
+        margin = np.array([100.0, 10.0, 200.0, 5.0])
+        assert classify(sold, margin).tolist() == ["star", "plowhorse", "puzzle", "dog"]
+        assert abc_classes(np.array([10.0, 70.0, 20.0])).tolist() == ["B", "A", "A"]
@@ -12,6 +12,7 @@ from app.services.order_service import (
 from app.schemas.order import OrderCreate, OrderItemCreate
 from app.models.orders import Order, OrderStatus
 from app.models.order_assignments import OrderAssignment, StaffRole
+from app.models.order_status_events import OrderStatusEvent
 
 
 class TestOrderService:
@@ -76,9 +77,14 @@ class TestOrderService:
     # Тест обновления статуса заказа
     @pytest.mark.asyncio
     async def test_update_order_status_success(self, test_db, sample_order):
-        result = await update_order_status(sample_order.order_id, OrderStatus.IN_PROGRESS, test_db)
+        previous_status = sample_order.status
+        result = await update_order_status(sample_order.order_id, OrderStatus.IN_PROGRESS, test_db, user_id=2)
         assert result.status == OrderStatus.IN_PROGRESS
 
+        events = await test_db.execute(select(OrderStatusEvent).where(OrderStatusEvent.order_id == sample_order.order_id))
+        event = events.scalar_one()
+        assert (event.previous_status, event.status, event.user_id) == (previous_status, OrderStatus.IN_PROGRESS, 2)
+
     # Тест удаления заказа
     @pytest.mark.asyncio
     async def test_delete_order_success(self, test_db, sample_order):
@@ -0,0 +1,81 @@
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta
+
+from app.models.menu_items import MenuItem, MenuCategory
+from app.models.orders import Order
+from app.models.order_items import OrderItem
+from app.schemas.recommendation import PopularityDecay
+from app.services.popularity_engine import PopularityEngine
+
+
+async def _add_order(test_db, order_date, item_ids):
+    order = Order(user_id=1, table_number=1, total_price=100.0, order_date=order_date)
+    test_db.add(order)
+    await test_db.flush()
+    for item_id in item_ids:
+        test_db.add(OrderItem(order_id=order.order_id, item_id=item_id, quantity=1, price=100.0))
+    await test_db.commit()
+
+
+class TestPopularityEngine:
+    @pytest_asyncio.fixture
+    async def menu(self, test_db):
+        items = [
+            MenuItem(item_id=1, name="Суп", price=100, category=MenuCategory.SOUP, is_available=True),
+            MenuItem(item_id=2, name="Сырники", price=100, category=MenuCategory.MAIN, is_available=True),
+            MenuItem(item_id=3, name="Чай", price=50, category=MenuCategory.DRINK, is_available=True),
+        ]
+        test_db.add_all(items)
+        await test_db.commit()
+        return items
+
+    # Тест затухания: старые заказы весят меньше свежих
+    @pytest.mark.asyncio
+    async def test_decay_prefers_recent_orders(self, test_db, menu):
+        now = datetime.now()
+        for _ in range(3):
+            await _add_order(test_db, now - timedelta(days=200), [1])
+        await _add_order(test_db, now - timedelta(hours=1), [2])
+
+        engine = PopularityEngine()
+        await engine.ensure_fresh(test_db)
+
+        all_time = engine.top(drinks=False, decay=PopularityDecay.NONE)
+        assert [item.item_id for item in all_time] == [1, 2]
+
+        recent = engine.top(drinks=False, decay=PopularityDecay.WEEK)
+        assert [item.item_id for item in recent] == [2, 1]
+        assert recent[1].order_count == 3
+
+    # Тест учета времени суток
+    @pytest.mark.asyncio
+    async def test_time_of_day_buckets(self, test_db, menu):
+        monday = datetime(2025, 10, 6)
+        for _ in range(3):
+            await _add_order(test_db, monday.replace(hour=9), [2])
+        for _ in range(2):
+            await _add_order(test_db, monday.replace(hour=21), [1])
+
+        engine = PopularityEngine()
+        await engine.ensure_fresh(test_db)
+
+        morning = engine.top(drinks=False, at=monday.replace(hour=9) + timedelta(days=7))
+        evening = engine.top(drinks=False, at=monday.replace(hour=21) + timedelta(days=7))
+        assert morning[0].item_id == 2
+        assert evening[0].item_id == 1
+
+    # Тест инкрементальной догрузки новых заказов и разделения напитков
+    @pytest.mark.asyncio
+    async def test_incremental_sync(self, test_db, menu):
+        engine = PopularityEngine()
+        await engine.ensure_fresh(test_db)
+        assert engine.top(drinks=True) == []
+
+        await _add_order(test_db, datetime.now(), [3, 3])
+        await engine.notify_new_orders(test_db)
+
+        drinks = engine.top(drinks=True)
+        assert [item.item_id for item in drinks] == [3]
+        assert drinks[0].order_count == 2
+        assert engine.top(drinks=False) == []
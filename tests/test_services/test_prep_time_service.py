@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta
+
+from app.models.menu_items import MenuCategory, MenuItem
+from app.models.orders import Order, OrderStatus
+from app.models.order_items import OrderItem, OrderItemStatus
+from app.models.order_status_events import OrderStatusEvent
+from app.schemas.statistics import PrepTimeGroup
+from app.services.prep_time_service import get_prep_time_percentiles, grouped_percentiles
+
+
+class TestPrepTimeService:
+    @pytest_asyncio.fixture
+    async def events(self, test_db):
+        test_db.add_all([
+            MenuItem(item_id=1, name="Стейк", price=900, category=MenuCategory.MAIN),
+            MenuItem(item_id=2, name="Лимонад", price=150, category=MenuCategory.DRINK),
+        ])
+        placed = datetime(2025, 3, 3, 12, 0)
+        # (позиция, начало работы через N минут или None, готово через N минут)
+        plan = [(1, 2, 12), (1, None, 20), (1, 5, 35), (2, 1, 3)]
+        for item_id, started, ready in plan:
+            order = Order(user_id=1, table_number=1, total_price=100, status=OrderStatus.READY, order_date=placed)
+            test_db.add(order)
+            await test_db.flush()
+            order_item = OrderItem(order_id=order.order_id, item_id=item_id, quantity=1, price=100,
+                                   status=OrderItemStatus.READY)
+            test_db.add(order_item)
+            await test_db.flush()
+            if started is not None:
+                test_db.add(OrderStatusEvent(
+                    order_id=order.order_id, order_item_id=order_item.order_item_id,
+                    previous_status=OrderStatus.PENDING, status=OrderStatus.IN_PROGRESS,
+                    created_at=placed + timedelta(minutes=started)
+                ))
+            test_db.add(OrderStatusEvent(
+                order_id=order.order_id, order_item_id=order_item.order_item_id,
+                previous_status=OrderStatus.IN_PROGRESS, status=OrderStatus.READY,
+                created_at=placed + timedelta(minutes=ready)
+            ))
+        await test_db.commit()
+
+    # Тест совпадения групповых перцентилей с np.percentile
+    def test_grouped_percentiles(self):
+        rng = np.random.default_rng(0)
+        codes = rng.integers(0, 5, 500)
+        values = rng.exponential(600, 500)
+        groups, counts, result = grouped_percentiles(codes, values)
+        for group, count, row in zip(groups, counts, result):
+            expected = np.percentile(values[codes == group], [50, 90, 99])
+            assert count == (codes == group).sum()
+            assert np.allclose(row, expected)
+
+    # Тест перцентилей по позициям: без начала работы время считается от создания заказа
+    @pytest.mark.asyncio
+    async def test_percentiles_by_item(self, test_db, events):
+        result = await get_prep_time_percentiles(test_db, PrepTimeGroup.ITEM)
+        steak, lemonade = result
+        assert (steak.key, steak.name, steak.count) == ("1", "Стейк", 3)
+        assert steak.p50_seconds == 20 * 60
+        assert lemonade.p99_seconds == 2 * 60
+
+    # Тест группировки по цехам
+    @pytest.mark.asyncio
+    async def test_percentiles_by_station(self, test_db, events):
+        result = await get_prep_time_percentiles(test_db, PrepTimeGroup.STATION)
+        assert [(r.key, r.count) for r in result] == [("bar", 1), ("kitchen", 3)]
@@ -0,0 +1,138 @@
+import json
+import pytest
+import pytest_asyncio
+
+from app.models.menu_items import MenuItem, MenuCategory
+from app.models.orders import Order
+from app.models.order_items import OrderItem
+from app.services.recommendation_service import (
+    ITEM_META_KEY,
+    _top_from_counters,
+    forget_menu_item,
+    get_home_recommendations,
+    rebuild_popularity_counters,
+    record_order_popularity,
+)
+from tests.fake_redis import FakeRedis
+
+
+async def _add_order(test_db, user_id, item_ids):
+    order = Order(user_id=user_id, table_number=1, total_price=100.0)
+    test_db.add(order)
+    await test_db.flush()
+    for item_id in item_ids:
+        test_db.add(OrderItem(order_id=order.order_id, item_id=item_id, quantity=1, price=100.0))
+    await test_db.commit()
+    return order.order_id
+
+
+class TestRecommendationService:
+    @pytest_asyncio.fixture
+    async def history(self, test_db):
+        test_db.add_all([
+            MenuItem(item_id=1, name="Плов", price=300, category=MenuCategory.MAIN, is_available=True),
+            MenuItem(item_id=2, name="Салат", price=200, category=MenuCategory.STARTER, is_available=True),
+            MenuItem(item_id=3, name="Морс", price=100, category=MenuCategory.DRINK, is_available=True),
+            MenuItem(item_id=4, name="Лимонад", price=150, category=MenuCategory.DRINK, is_available=True),
+        ])
+        await test_db.commit()
+        await _add_order(test_db, 1, [2, 4])
+        await _add_order(test_db, 2, [1, 3])
+        await _add_order(test_db, 2, [1, 3])
+        await _add_order(test_db, 2, [1])
+
+    # Тест общих и персональных рекомендаций одним запросом
+    @pytest.mark.asyncio
+    async def test_home_recommendations(self, test_db, history):
+        result = await get_home_recommendations(test_db, user_id=1, limit=5)
+
+        assert [item.item_id for item in result.popular_food] == [1, 2]
+        assert result.popular_food[0].order_count == 3
+        assert [item.item_id for item in result.popular_drinks] == [3, 4]
+        assert [item.item_id for item in result.personal_food] == [2]
+        assert [item.item_id for item in result.personal_drinks] == [4]
+        assert result.personal_drinks[0].order_count == 1
+
+    # Тест ограничения размера топов и отсутствия персональных рекомендаций
+    @pytest.mark.asyncio
+    async def test_home_recommendations_without_user(self, test_db, history):
+        result = await get_home_recommendations(test_db, user_id=None, limit=1)
+
+        assert [item.item_id for item in result.popular_food] == [1]
+        assert [item.item_id for item in result.popular_drinks] == [3]
+        assert result.personal_food == []
+        assert result.personal_drinks == []
+
+    # Тест инкрементов нового заказа в общих и персональных счетчиках
+    @pytest.mark.asyncio
+    async def test_record_order_popularity(self, test_db, history):
+        redis = FakeRedis()
+        order_id = await _add_order(test_db, 1, [1, 1, 3])
+
+        await record_order_popularity(order_id, test_db, redis)
+
+        assert redis.zsets["popularity:food"] == {"1": 2}
+        assert redis.zsets["popularity:drinks"] == {"3": 1}
+        assert redis.zsets["popularity:user:1:food"] == {"1": 2}
+        assert redis.zsets["popularity:user:1:drinks"] == {"3": 1}
+        assert set(redis.hashes[ITEM_META_KEY]) == {"1", "3"}
+
+    # Тест пересборки: устаревшие ключи удаляются, заказы из снимка повторно не учитываются
+    @pytest.mark.asyncio
+    async def test_rebuild_popularity_counters(self, test_db, history):
+        redis = FakeRedis()
+        await redis.zadd("popularity:user:99:food", {1: 10})
+
+        await rebuild_popularity_counters(test_db, redis)
+
+        assert redis.zsets["popularity:food"] == {"1": 3, "2": 1}
+        assert redis.zsets["popularity:drinks"] == {"3": 2, "4": 1}
+        assert redis.zsets["popularity:user:2:food"] == {"1": 3}
+        assert redis.zsets["popularity:user:1:drinks"] == {"4": 1}
+        assert "popularity:user:99:food" not in redis.zsets
+        assert await redis.exists("popularity:built")
+
+        # Заказ из снимка, запись которого опоздала, не учитывается второй раз
+        await record_order_popularity(1, test_db, redis)
+        assert redis.zsets["popularity:food"] == {"1": 3, "2": 1}
+
+    # Тест заказа, записанного между снимком пересборки и заменой счетчиков
+    @pytest.mark.asyncio
+    async def test_rebuild_keeps_orders_newer_than_snapshot(self, test_db, history):
+        redis = FakeRedis()
+
+        async def new_order():
+            order_id = await _add_order(test_db, 1, [1])
+            await record_order_popularity(order_id, test_db, redis)
+        redis.before_transaction = new_order
+
+        await rebuild_popularity_counters(test_db, redis)
+
+        assert redis.zsets["popularity:food"] == {"1": 4, "2": 1}
+        assert redis.zsets["popularity:user:1:food"] == {"1": 1, "2": 1}
+
+    # Тест фильтрации удаленных и сменивших категорию позиций: результатов меньше limit
+    @pytest.mark.asyncio
+    async def test_top_from_counters_skips_stale_items(self, test_db, history):
+        redis = FakeRedis()
+        await redis.zadd("popularity:food", {9: 5, 1: 3, 2: 1})
+        # Позиция 9 удалена из меню, позиция 1 стала напитком, метаданных позиции 2 еще нет
+        await redis.hset(ITEM_META_KEY, mapping={1: json.dumps({"name": "Плов", "category": MenuCategory.DRINK.value})})
+
+        result = await _top_from_counters(redis, test_db, "popularity:food", "food", 3)
+
+        assert [item.item_id for item in result] == [2]
+        assert result[0].order_count == 1
+        assert "2" in redis.hashes[ITEM_META_KEY]
+
+    # Тест удаления позиции из общих и персональных счетчиков
+    @pytest.mark.asyncio
+    async def test_forget_deleted_menu_item(self, test_db, history):
+        redis = FakeRedis()
+        await rebuild_popularity_counters(test_db, redis)
+
+        await forget_menu_item(1, redis, deleted=True)
+
+        assert "1" not in redis.zsets["popularity:food"]
+        assert "1" not in redis.zsets["popularity:user:2:food"]
+        assert "1" not in redis.hashes[ITEM_META_KEY]
@@ -0,0 +1,92 @@
+import pytest
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.schedulers.base import STATE_PAUSED, STATE_RUNNING
+
+from app.scheduler import scheduler as scheduler_module
+from app.scheduler.leader import RENEW_SCRIPT, LeaderElector
+from tests.fake_redis import FakeRedis
+
+
+class LockRedis(FakeRedis):
+    """FakeRedis с выполнением скриптов продления и освобождения блокировки лидера"""
+
+    async def eval(self, script, numkeys, key, token, *args):
+        if await self.get(key) != token:
+            return 0
+        if script == RENEW_SCRIPT:
+            return await self.pexpire(key, int(args[0]))
+        await self.delete(key)
+        return 1
+
+
+def _elector(redis, events, name, **callbacks):
+    elector = LeaderElector(
+        key="scheduler:leader",
+        ttl=3,
+        on_elected=callbacks.get("on_elected", lambda: events.append((name, "elected"))),
+        on_demoted=callbacks.get("on_demoted", lambda: events.append((name, "demoted"))),
+    )
+    elector._redis = redis
+    return elector
+
+
+class TestLeaderElector:
+    # Тест: из двух воркеров лидером становится ровно один
+    @pytest.mark.asyncio
+    async def test_single_leader(self):
+        redis, events = LockRedis(), []
+        first, second = _elector(redis, events, "first"), _elector(redis, events, "second")
+
+        await first._tick()
+        await second._tick()
+
+        assert (first.is_leader, second.is_leader) == (True, False)
+        assert await redis.get("scheduler:leader") == first.token
+        assert events == [("first", "elected")]
+
+    # Тест: продление удерживает блокировку дольше исходного TTL
+    @pytest.mark.asyncio
+    async def test_renewal_keeps_lock(self):
+        redis, events = LockRedis(), []
+        first, second = _elector(redis, events, "first"), _elector(redis, events, "second")
+        await first._tick()
+
+        for _ in range(3):
+            redis.now += 2
+            await first._tick()
+            await second._tick()
+
+        assert (first.is_leader, second.is_leader) == (True, False)
+        assert events == [("first", "elected")]
+
+    # Тест: после истечения блокировки лидерство и задачи переходят к другому воркеру
+    @pytest.mark.asyncio
+    async def test_handover_resumes_scheduler(self, monkeypatch):
+        scheduler = AsyncIOScheduler()
+        scheduler.start(paused=True)
+        monkeypatch.setattr(scheduler_module, "scheduler", scheduler)
+        redis, events = LockRedis(), []
+        first = _elector(redis, events, "first")
+        second = _elector(
+            redis, events, "second", on_elected=scheduler_module._on_elected, on_demoted=scheduler_module._on_demoted
+        )
+        try:
+            await first._tick()
+            await second._tick()
+            assert scheduler.state == STATE_PAUSED
+
+            # Первый воркер перестал продлевать блокировку
+            redis.now += 4
+            await second._tick()
+            assert second.is_leader
+            assert scheduler.state == STATE_RUNNING
+
+            await first._tick()
+            assert not first.is_leader
+            assert events == [("first", "elected"), ("first", "demoted")]
+
+            await second.stop()
+            assert await redis.get("scheduler:leader") is None
+            assert scheduler.state == STATE_PAUSED
+        finally:
+            scheduler.shutdown(wait=False)
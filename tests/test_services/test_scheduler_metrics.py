@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+
+from app.scheduler.metrics import JobMetrics
+
+
+class TestJobMetrics:
+    # Тест учета длительности и задержки запуска
+    def test_run_duration_and_lag(self):
+        metrics = JobMetrics()
+        now = datetime.now()
+        metrics.on_submitted("job", now - timedelta(seconds=2), now)
+        metrics.on_finished("job", failed=False)
+
+        stats = metrics.snapshot()[0]
+        assert stats["job_id"] == "job"
+        assert stats["runs"] == 1
+        assert stats["errors"] == 0
+        assert stats["last_lag"] == 2.0
+        assert stats["last_duration"] is not None
+        assert stats["avg_duration"] == stats["last_duration"]
+
+    # Тест учета ошибок и пропусков
+    def test_errors_and_misfires(self):
+        metrics = JobMetrics()
+        now = datetime.now()
+        metrics.on_submitted("job", now, now)
+        metrics.on_finished("job", failed=True)
+        metrics.on_missed("job")
+        metrics.on_missed("job")
+
+        stats = metrics.snapshot()[0]
+        assert stats["errors"] == 1
+        assert stats["misfires"] == 2
+        assert stats["last_lag"] == 0.0
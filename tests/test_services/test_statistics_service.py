@@ -0,0 +1,252 @@
+import pytest
+import pytest_asyncio
+from datetime import date, datetime, timedelta
+from sqlalchemy import func, select
+
+from app.models.menu_items import MenuCategory, MenuItem
+from app.models.orders import Order, OrderStatus
+from app.models.order_items import OrderItem
+from app.models.order_assignments import OrderAssignment, StaffRole
+from app.models.user import UserRole
+from app.models.staff_daily_stats import StaffDailyStats
+from app.schemas.statistics import SalesGranularity, StaffStatsSort
+from app.services.statistics_service import (
+    backfill_staff_daily_stats,
+    compute_sales,
+    get_sales_statistics,
+    get_staff_statistics,
+    last_rolled_up_day,
+    refresh_order_day,
+    refresh_staff_daily_stats,
+    sales_buckets
+)
+
+
+class ScanRedis:
+    """Redis без ключей: отмечается только поиск кеша закрытых периодов для сброса"""
+
+    def __init__(self):
+        self.scanned = False
+
+    async def scan_iter(self, pattern):
+        self.scanned = True
+        for key in ():
+            yield key
+
+
+class TestStatisticsService:
+    @pytest_asyncio.fixture
+    async def assignments(self, test_db):
+        # Официанты: 10 - три заказа, 11 - один, 12 - один; повар 20 - два
+        plan = [
+            (10, StaffRole.WAITER, OrderStatus.COMPLETED),
+            (10, StaffRole.WAITER, OrderStatus.COMPLETED),
+            (10, StaffRole.WAITER, OrderStatus.COMPLETED),
+            (11, StaffRole.WAITER, OrderStatus.COMPLETED),
+            (12, StaffRole.WAITER, OrderStatus.COMPLETED),
+            (12, StaffRole.WAITER, OrderStatus.PENDING),
+            (20, StaffRole.COOK, OrderStatus.READY),
+            (20, StaffRole.COOK, OrderStatus.COMPLETED),
+        ]
+        for user_id, role, status in plan:
+            order = Order(user_id=1, table_number=1, total_price=100.0, status=status)
+            test_db.add(order)
+            await test_db.flush()
+            test_db.add(OrderAssignment(order_id=order.order_id, user_id=user_id, role=role))
+        await test_db.commit()
+
+    # Тест места сотрудника в рейтинге своей роли
+    @pytest.mark.asyncio
+    async def test_staff_rank(self, test_db, assignments):
+        result = await get_staff_statistics(test_db, 11, UserRole.WAITER)
+        assert len(result) == 1
+        assert result[0].orders_count == 1
+        assert result[0].rating == 2
+        assert result[0].total_employees == 3
+
+        leader = await get_staff_statistics(test_db, 10, UserRole.WAITER)
+        assert leader[0].rating == 1
+
+    # Тест сотрудника без выполненных заказов
+    @pytest.mark.asyncio
+    async def test_staff_without_orders(self, test_db, assignments):
+        result = await get_staff_statistics(test_db, 99, UserRole.WAITER)
+        assert result[0].orders_count == 0
+        assert result[0].rating is None
+        assert result[0].total_employees == 3
+
+    # Тест постраничной выдачи и сортировки для администратора
+    @pytest.mark.asyncio
+    async def test_admin_pagination_and_sorting(self, test_db, assignments):
+        first_page = await get_staff_statistics(test_db, 1, UserRole.ADMIN, is_admin=True, limit=2)
+        assert [(s.user_id, s.orders_count) for s in first_page] == [(10, 3), (12, 2)]
+
+        second_page = await get_staff_statistics(test_db, 1, UserRole.ADMIN, is_admin=True, limit=2, offset=2)
+        assert [s.user_id for s in second_page] == [20, 11]
+        assert second_page[0].rating == 1
+        assert second_page[0].total_employees == 1
+
+        by_user = await get_staff_statistics(
+            test_db, 1, UserRole.ADMIN, is_admin=True, sort_by=StaffStatsSort.USER_ID, descending=False
+        )
+        assert [s.user_id for s in by_user] == [10, 11, 12, 20]
+
+    # Тест догрузки дневной статистики и суммирования закрытых дней с текущим
+    @pytest.mark.asyncio
+    async def test_daily_rollup(self, test_db, assignments):
+        past = datetime.combine(date.today() - timedelta(days=3), datetime.min.time()) + timedelta(hours=12)
+        for _ in range(2):
+            order = Order(user_id=1, table_number=1, total_price=100.0, status=OrderStatus.COMPLETED, order_date=past)
+            test_db.add(order)
+            await test_db.flush()
+            test_db.add(OrderAssignment(order_id=order.order_id, user_id=11, role=StaffRole.WAITER))
+        await test_db.commit()
+
+        redis = ScanRedis()
+        assert await backfill_staff_daily_stats(test_db, redis) == 1
+        assert redis.scanned
+        # Повторный пересчет дня не дублирует строки
+        await refresh_staff_daily_stats(test_db, past.date())
+        rows = await test_db.execute(select(func.count()).select_from(StaffDailyStats))
+        assert rows.scalar_one() == 1
+
+        closed = await get_staff_statistics(test_db, 11, UserRole.WAITER, start_date=past.date(), end_date=past.date())
+        assert (closed[0].orders_count, closed[0].rating, closed[0].total_employees) == (2, 1, 1)
+
+        overall = await get_staff_statistics(test_db, 11, UserRole.WAITER)
+        assert overall[0].orders_count == 3
+        assert overall[0].rating == 1
+
+    # Тест вчерашнего дня, который догрузка еще не записала: он считается по сырым данным
+    @pytest.mark.asyncio
+    async def test_yesterday_before_backfill(self, test_db, assignments):
+        today = datetime.combine(date.today(), datetime.min.time())
+        past = today - timedelta(days=3) + timedelta(hours=12)
+        yesterday = today - timedelta(days=1) + timedelta(hours=12)
+        for order_date in (past, yesterday, yesterday):
+            order = Order(user_id=1, table_number=1, total_price=100.0, status=OrderStatus.COMPLETED, order_date=order_date)
+            test_db.add(order)
+            await test_db.flush()
+            test_db.add(OrderAssignment(order_id=order.order_id, user_id=11, role=StaffRole.WAITER))
+        await test_db.commit()
+        await refresh_staff_daily_stats(test_db, past.date())
+        assert await last_rolled_up_day(test_db) == past.date()
+
+        closed = await get_staff_statistics(test_db, 11, UserRole.WAITER, start_date=past.date(), end_date=yesterday.date())
+        assert closed[0].orders_count == 3
+
+        only_yesterday = await get_staff_statistics(test_db, 11, UserRole.WAITER, start_date=yesterday.date(), end_date=yesterday.date())
+        assert only_yesterday[0].orders_count == 2
+
+        overall = await get_staff_statistics(test_db, 11, UserRole.WAITER)
+        assert overall[0].orders_count == 4
+
+    # Тест пересчета дня заказа: текущий день не пишется, прошедший обновляется на месте
+    @pytest.mark.asyncio
+    async def test_refresh_order_day(self, test_db, assignments):
+        await refresh_order_day(test_db, None, datetime.now())
+        rows = await test_db.execute(select(func.count()).select_from(StaffDailyStats))
+        assert rows.scalar_one() == 0
+
+        past = datetime.combine(date.today() - timedelta(days=2), datetime.min.time()) + timedelta(hours=12)
+        orders = []
+        for user_id in (11, 12):
+            order = Order(user_id=1, table_number=1, total_price=100.0, status=OrderStatus.PENDING, order_date=past)
+            test_db.add(order)
+            await test_db.flush()
+            test_db.add(OrderAssignment(order_id=order.order_id, user_id=user_id, role=StaffRole.WAITER))
+            orders.append(order)
+        await test_db.commit()
+        redis = ScanRedis()
+        await refresh_order_day(test_db, redis, past)
+
+        orders[0].status = OrderStatus.COMPLETED
+        await test_db.execute(OrderAssignment.__table__.delete().where(OrderAssignment.order_id == orders[1].order_id))
+        await test_db.commit()
+        await refresh_order_day(test_db, redis, past)
+
+        result = await test_db.execute(select(StaffDailyStats.user_id, StaffDailyStats.completed_count))
+        assert result.all() == [(11, 1)]
+        assert redis.scanned
+
+
+class HashRedis:
+    """Хеши Redis в памяти: только команды, которые использует кеш продаж"""
+
+    def __init__(self):
+        self.hashes = {}
+
+    async def hmget(self, key, fields):
+        return [self.hashes.get(key, {}).get(field) for field in fields]
+
+    async def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update(mapping)
+
+
+class TestSalesStatistics:
+    @pytest_asyncio.fixture
+    async def sales(self, test_db):
+        test_db.add_all([
+            MenuItem(item_id=1, name="Суп", price=200, category=MenuCategory.SOUP),
+            MenuItem(item_id=2, name="Чай", price=50, category=MenuCategory.DRINK),
+        ])
+        plan = [
+            (datetime(2025, 3, 3, 12, 15), 1, OrderStatus.COMPLETED, [(1, 1), (2, 2)]),
+            (datetime(2025, 3, 3, 12, 40), 2, OrderStatus.COMPLETED, [(1, 2)]),
+            (datetime(2025, 3, 3, 14, 5), 1, OrderStatus.PENDING, [(2, 1)]),
+            (datetime(2025, 3, 3, 14, 10), 2, OrderStatus.CANCELLED, [(1, 5)]),
+            (datetime(2025, 3, 9, 20, 0), 1, OrderStatus.COMPLETED, [(2, 4)]),
+        ]
+        for moment, table, status, items in plan:
+            total = sum((200 if item_id == 1 else 50) * quantity for item_id, quantity in items)
+            order = Order(user_id=1, table_number=table, total_price=total, status=status, order_date=moment)
+            test_db.add(order)
+            await test_db.flush()
+            for item_id, quantity in items:
+                test_db.add(OrderItem(order_id=order.order_id, item_id=item_id, quantity=quantity,
+                                      price=200 if item_id == 1 else 50))
+        await test_db.commit()
+
+    # Тест выручки, среднего чека и количества позиций по часам без учета отмененных заказов
+    @pytest.mark.asyncio
+    async def test_hourly_sales(self, test_db, sales):
+        result = await compute_sales(test_db, SalesGranularity.HOUR, datetime(2025, 3, 3), datetime(2025, 3, 4))
+        assert [(r.bucket, r.revenue, r.orders_count, r.average_ticket, r.items_quantity) for r in result] == [
+            (datetime(2025, 3, 3, 12), 700.0, 2, 350.0, 5),
+            (datetime(2025, 3, 3, 14), 50.0, 1, 50.0, 1),
+        ]
+
+    # Тест разбивки по категориям и столам с недельным шагом
+    @pytest.mark.asyncio
+    async def test_weekly_sales_by_category_and_table(self, test_db, sales):
+        result = await compute_sales(
+            test_db, SalesGranularity.WEEK, datetime(2025, 3, 3), datetime(2025, 3, 10), by_category=True, by_table=True
+        )
+        rows = {(r.bucket, r.category, r.table_number): (r.revenue, r.orders_count, r.items_quantity) for r in result}
+        assert rows == {
+            (datetime(2025, 3, 3), MenuCategory.SOUP, 1): (200.0, 1, 1),
+            (datetime(2025, 3, 3), MenuCategory.SOUP, 2): (400.0, 1, 2),
+            (datetime(2025, 3, 3), MenuCategory.DRINK, 1): (350.0, 3, 7),
+        }
+
+    # Тест: закешированный интервал между пропущенными не пересчитывается и не дублируется
+    @pytest.mark.asyncio
+    async def test_cached_bucket_between_missing(self, test_db, sales):
+        redis = HashRedis()
+        await get_sales_statistics(test_db, redis, SalesGranularity.DAY, date(2025, 3, 3), date(2025, 3, 3))
+
+        result = await get_sales_statistics(test_db, redis, SalesGranularity.DAY, date(2025, 3, 2), date(2025, 3, 10))
+        expected = await compute_sales(test_db, SalesGranularity.DAY, datetime(2025, 3, 2), datetime(2025, 3, 11))
+        assert [(r.bucket, r.revenue, r.orders_count) for r in result] == [
+            (r.bucket, r.revenue, r.orders_count) for r in expected
+        ]
+        assert [r.bucket for r in result] == [datetime(2025, 3, 3), datetime(2025, 3, 9)]
+
+    # Тест границ интервалов
+    def test_buckets(self):
+        assert sales_buckets(date(2025, 1, 30), date(2025, 3, 2), SalesGranularity.MONTH) == [
+            datetime(2025, 1, 1), datetime(2025, 2, 1), datetime(2025, 3, 1)
+        ]
+        assert sales_buckets(date(2025, 3, 5), date(2025, 3, 10), SalesGranularity.WEEK) == [
+            datetime(2025, 3, 3), datetime(2025, 3, 10)
+        ]
@@ -0,0 +1,521 @@
+import asyncio
+import json
+import pytest
+from datetime import datetime
+from decimal import Decimal
+
+from app.models.menu_items import MenuCategory, MenuItem
+from app.realtime.coalescer import coalesce_key
+from app.realtime.connection import OverflowPolicy, entity_key
+from app.realtime.deltas import apply_delta, combine_events, diff_order
+from app.realtime.event_log import LocalEventLog
+from app.realtime.events import handle_event
+from app.realtime.topics import order_topics
+from app.realtime.websocket_manager import ConnectionManager
+
+
+CONTROL_TYPES = {"connected", "subscribed", "error", "resumed", "resync_required", "ping"}
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+        self.seqs = []
+        self.control = []
+        self.closed = None
+
+    async def send_text(self, frame):
+        message = json.loads(frame)
+        # Служебные кадры (подтверждения подключения и подписки, ошибки) учитываются отдельно от событий,
+        # номера событий - отдельно от их содержимого
+        if message["type"] in CONTROL_TYPES:
+            self.control.append(message)
+        else:
+            self.seqs.append(message.pop("seq", None))
+            self.sent.append(message)
+
+    async def close(self, code=1000):
+        self.closed = code
+
+
+class BlockedWebSocket(FakeWebSocket):
+    """Клиент, который не принимает сообщения, пока не открыт шлюз"""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = asyncio.Event()
+
+    async def send_text(self, frame):
+        if '"type":"connected"' not in frame:
+            await self.gate.wait()
+        await super().send_text(frame)
+
+
+async def drain():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+class RecordingBackplane:
+    def __init__(self):
+        self.published = []
+        self.deliver = None
+
+    async def start(self, deliver):
+        self.deliver = deliver
+
+    async def stop(self):
+        pass
+
+    async def publish(self, envelope):
+        self.published.append(envelope)
+
+
+class TestConnectionManager:
+    # Тест локальной доставки по ролям и публикации события в шину
+    @pytest.mark.asyncio
+    async def test_broadcast_delivers_locally_and_publishes(self):
+        backplane = RecordingBackplane()
+        manager = ConnectionManager(backplane)
+        cook, client = FakeWebSocket(), FakeWebSocket()
+        await manager.connect("1", cook, "Cook")
+        await manager.connect("2", client, "Client")
+
+        await manager.broadcast({"type": "order_update", "payload": {"order_id": 5}}, roles={"Cook", "Waiter"})
+        await drain()
+
+        assert cook.sent == [{"type": "order_update", "payload": {"order_id": 5}}]
+        assert client.sent == []
+        assert backplane.published == [{
+            "roles": ["Cook", "Waiter"], "user_id": None, "topics": None, "key": None, "seq": 1,
+            "frame": '{"seq":1,"type":"order_update","payload":{"order_id":5}}'
+        }]
+        assert cook.seqs == [1]
+
+    # Тест доставки события, пришедшего из шины от другого воркера
+    @pytest.mark.asyncio
+    async def test_delivers_events_from_backplane(self):
+        backplane = RecordingBackplane()
+        manager = ConnectionManager(backplane)
+        await manager.start()
+        user = FakeWebSocket()
+        await manager.connect("7", user, "Client")
+
+        await backplane.deliver({"user_id": "7", "frame": '{"type":"order_update"}'})
+        await backplane.deliver({"user_id": "8", "frame": '{"type":"order_update"}'})
+        await drain()
+
+        assert user.sent == [{"type": "order_update"}]
+        assert backplane.published == []
+        await manager.stop()
+
+    # Тест согласованности индексов по ролям и пользователям при отключении
+    @pytest.mark.asyncio
+    async def test_role_index_and_stats(self):
+        manager = ConnectionManager(RecordingBackplane())
+        cook = await manager.connect("1", FakeWebSocket(), "Cook")
+        waiter = await manager.connect("2", FakeWebSocket(), "Waiter")
+        assert manager.stats()["roles"] == {"Cook": 1, "Waiter": 1}
+
+        await manager.broadcast({"type": "shift_update"}, roles={"Cook"})
+        await drain()
+        assert cook.websocket.sent == [{"type": "shift_update"}]
+        assert waiter.websocket.sent == []
+
+        await manager.disconnect(cook.session_id)
+        await manager.disconnect(cook.session_id)
+        stats = manager.stats()
+        assert stats["total"] == 1 and stats["users"] == 1 and stats["roles"] == {"Waiter": 1}
+
+    # Тест нескольких одновременных сессий одного пользователя
+    @pytest.mark.asyncio
+    async def test_multiple_sessions_per_user(self):
+        manager = ConnectionManager(RecordingBackplane())
+        phone, desktop = FakeWebSocket(), FakeWebSocket()
+        first = await manager.connect("5", phone, "Admin")
+        second = await manager.connect("5", desktop, "Admin")
+        await drain()
+
+        assert first.session_id != second.session_id
+        assert phone.control == [{"type": "connected", "payload": {"session_id": first.session_id}}]
+        assert manager.stats()["total"] == 2 and manager.stats()["users"] == 1
+
+        await manager.send_json("5", {"type": "order_update"})
+        await drain()
+        assert phone.sent[-1] == desktop.sent[-1] == {"type": "order_update"}
+
+        # Закрытие одной сессии не затрагивает другую
+        await manager.disconnect(first.session_id)
+        await manager.send_json("5", {"type": "order_delete"})
+        await drain()
+        assert phone.sent[-1] == {"type": "order_update"}
+        assert desktop.sent[-1] == {"type": "order_delete"}
+
+    # Тест: медленный клиент не задерживает доставку остальным
+    @pytest.mark.asyncio
+    async def test_slow_client_does_not_block_others(self):
+        manager = ConnectionManager(RecordingBackplane(), queue_size=2, policy=OverflowPolicy.DROP_OLDEST)
+        slow, fast = BlockedWebSocket(), FakeWebSocket()
+        await manager.connect("1", slow, "Cook")
+        await manager.connect("2", fast, "Cook")
+
+        for i in range(5):
+            await manager.broadcast({"type": "order_create", "payload": {"action": "create", "order_id": i}}, roles={"Cook"})
+            await drain()
+
+        assert [m["payload"]["order_id"] for m in fast.sent] == [0, 1, 2, 3, 4]
+        assert manager.stats()["dropped"] == 2
+
+        slow.gate.set()
+        await drain()
+        # Первое сообщение уже было передано сокету, из очереди отброшены самые старые
+        assert [m["payload"]["order_id"] for m in slow.sent] == [0, 3, 4]
+
+    # Тест ключей сущности: окно объединения относит позицию к заказу, очередь подключения различает типы
+    def test_entity_keys(self):
+        order = {"type": "order_update", "payload": {"action": "update", "order": {"order_id": 1}}}
+        item = {"type": "order_item_update", "payload": {"action": "update", "order_id": 1, "order_item_id": 7}}
+        items = {"type": "order_items_update", "payload": {"action": "update", "order_id": 1, "items": []}}
+
+        assert coalesce_key(order) == coalesce_key(item) == coalesce_key(items) == "order:order_id:1"
+        assert entity_key(order) == "order_update:order_id:1"
+        assert entity_key(item) == "order_item_update:order_item_id:7"
+        assert entity_key(items) == "order_items_update:order_id:1"
+        assert entity_key({"type": "order_delete", "payload": {"action": "delete", "order_id": 1}}) is None
+
+    # Тест объединения ожидающих обновлений одной сущности: замененные номера событий перечисляются в superseded
+    @pytest.mark.asyncio
+    async def test_coalesce_pending_updates(self):
+        manager = ConnectionManager(RecordingBackplane(), queue_size=10, policy=OverflowPolicy.COALESCE, coalesce_window_ms=0)
+        slow = BlockedWebSocket()
+        await manager.connect("1", slow, "Cook")
+
+        await manager.broadcast({"type": "order_create", "payload": {"action": "create", "order": {"order_id": 1}}})
+        await drain()
+        for order_id, status in [(1, "In_progress"), (2, "Ready"), (1, "Ready"), (1, "Completed")]:
+            await manager.broadcast({"type": "order_update", "payload": {"action": "update", "order": {"order_id": order_id, "status": status}}})
+        assert manager.stats()["queue_depth"] == 2
+
+        slow.gate.set()
+        await drain()
+        assert [(m["payload"]["order"]["order_id"], m["payload"]["order"].get("status")) for m in slow.sent] == [
+            (1, None), (2, "Ready"), (1, "Completed")
+        ]
+        # Номера идут по возрастанию, пропуск 2 и 4 объяснен в кадре, который их заменил
+        assert slow.seqs == [1, 3, 5]
+        assert [m.get("superseded") for m in slow.sent] == [None, None, [2, 4]]
+        assert manager.stats()["coalesced"] == 2
+
+    # Тест отключения клиента после нескольких переполнений очереди
+    @pytest.mark.asyncio
+    async def test_disconnect_after_overflows(self):
+        manager = ConnectionManager(RecordingBackplane(), queue_size=1, policy=OverflowPolicy.DISCONNECT, max_overflows=2)
+        slow = BlockedWebSocket()
+        await manager.connect("1", slow, "Cook")
+
+        for i in range(4):
+            await manager.broadcast({"type": "order_create", "payload": {"action": "create", "order_id": i}})
+            await drain()
+
+        assert slow.closed == 1011
+        stats = manager.stats()
+        assert stats["total"] == 0 and stats["disconnected"] == 1
+
+    # Тест: событие кодируется один раз, всем получателям уходит один и тот же кадр
+    @pytest.mark.asyncio
+    async def test_frame_encoded_once(self):
+        backplane = RecordingBackplane()
+        manager = ConnectionManager(backplane, coalesce_window_ms=0)
+        frames = []
+
+        class FrameSocket(FakeWebSocket):
+            async def send_text(self, frame):
+                if '"type":"connected"' not in frame:
+                    frames.append(frame)
+
+        for client_id in ("1", "2", "3"):
+            await manager.connect(client_id, FrameSocket(), "Waiter")
+
+        await manager.broadcast({"type": "order_update", "payload": {
+            "action": "update",
+            "order": {"order_id": 1, "total_price": Decimal("150.50"), "order_date": datetime(2025, 3, 3, 12)}
+        }})
+        await drain()
+
+        assert len(frames) == 3 and frames[0] is frames[1] is frames[2]
+        assert json.loads(frames[0])["payload"]["order"] == {"order_id": 1, "total_price": 150.5, "order_date": "2025-03-03T12:00:00"}
+        assert backplane.published[0]["frame"] is frames[0]
+
+    # Тест доставки событий по темам: подписчики тем и сессии без подписок
+    @pytest.mark.asyncio
+    async def test_topic_delivery(self):
+        manager = ConnectionManager(RecordingBackplane())
+        bar = await manager.connect("1", FakeWebSocket(), "Barkeeper")
+        waiter = await manager.connect("2", FakeWebSocket(), "Waiter")
+        legacy = await manager.connect("3", FakeWebSocket(), "Cook")
+        manager.subscribe(bar, ["station:bar"])
+        manager.subscribe(waiter, ["table:5", "order:10"])
+
+        await manager.publish({"type": "order_item_update", "payload": {"order_item_id": 1}}, ["order:10", "table:5", "station:kitchen"])
+        await manager.publish({"type": "order_item_update", "payload": {"order_item_id": 2}}, ["order:11", "table:6", "station:bar"])
+        await drain()
+
+        assert [m["payload"]["order_item_id"] for m in bar.websocket.sent] == [2]
+        # Подписка на заказ и стол одновременно не дает дубликатов
+        assert [m["payload"]["order_item_id"] for m in waiter.websocket.sent] == [1]
+        assert [m["payload"]["order_item_id"] for m in legacy.websocket.sent] == [1, 2]
+        assert manager.stats()["subscriptions"] == 3
+
+        manager.unsubscribe(waiter, ["table:5", "order:10"])
+        await manager.disconnect(bar.session_id)
+        assert manager.stats()["topics"] == 0
+        assert manager.registry.unsubscribed == {waiter.session_id, legacy.session_id}
+
+    # Тест проверки подписок: только персонал и только известные темы
+    @pytest.mark.asyncio
+    async def test_subscribe_validation(self):
+        manager = ConnectionManager(RecordingBackplane())
+        client = await manager.connect("1", FakeWebSocket(), "Client")
+        cook = await manager.connect("2", FakeWebSocket(), "Cook")
+
+        await handle_event("1", {"type": "subscribe", "topics": ["table:1"]}, client)
+        await handle_event("2", {"type": "subscribe", "topics": ["station:grill"]}, cook)
+        await handle_event("2", {"type": "subscribe", "topics": ["station:kitchen"]}, cook)
+        await drain()
+
+        assert client.websocket.control[1]["type"] == "error" and not client.topics
+        assert cook.websocket.control[1]["payload"]["topics"] == ["station:grill"]
+        assert cook.websocket.control[2] == {"type": "subscribed", "payload": {"topics": ["station:kitchen"]}}
+
+    # Тест определения тем заказа по категориям позиций
+    @pytest.mark.asyncio
+    async def test_order_topics(self, test_db):
+        test_db.add_all([
+            MenuItem(item_id=1, name="Суп", price=200, category=MenuCategory.SOUP),
+            MenuItem(item_id=2, name="Чай", price=50, category=MenuCategory.DRINK),
+        ])
+        await test_db.commit()
+
+        order = {"order_id": 7, "table_number": 3, "items": [{"item_id": 1}, {"item_id": 2}]}
+        assert await order_topics(test_db, order) == ["order:7", "table:3", "station:bar", "station:kitchen"]
+        assert await order_topics(test_db, {**order, "items": [{"item_id": 2}]}) == ["order:7", "table:3", "station:bar"]
+
+    # Тест объединения всплеска обновлений позиций в событие заказа
+    @pytest.mark.asyncio
+    async def test_coalesce_window_folds_item_updates(self):
+        backplane = RecordingBackplane()
+        manager = ConnectionManager(backplane, coalesce_window_ms=20)
+        cook = await manager.connect("1", FakeWebSocket(), "Cook")
+
+        for order_item_id in (11, 12, 13):
+            await manager.publish({"type": "order_item_update", "payload": {
+                "action": "update", "order_id": 1, "order_item_id": order_item_id, "item_status": "Ready"
+            }}, ["order:1", "station:kitchen"])
+        await manager.publish({"type": "order_update", "payload": {
+            "action": "update", "order": {"order_id": 1, "status": "Ready"}
+        }}, ["order:1", "station:kitchen", "table:2"])
+        await drain()
+        assert cook.websocket.sent == []
+
+        await asyncio.sleep(0.05)
+        await drain()
+        assert cook.websocket.sent == [{"type": "order_update", "payload": {
+            "action": "update", "order": {"order_id": 1, "status": "Ready"}, "changed_items": [11, 12, 13]
+        }}]
+        assert len(backplane.published) == 1
+        assert manager.stats()["merged"] == 3
+
+    # Тест: позиции без события заказа уходят одним кадром, удаление сбрасывает накопленное раньше себя
+    @pytest.mark.asyncio
+    async def test_coalesce_window_batches_items_and_keeps_order(self):
+        manager = ConnectionManager(RecordingBackplane(), coalesce_window_ms=1000)
+        bar = await manager.connect("1", FakeWebSocket(), "Barkeeper")
+
+        for order_item_id, status in ((21, "In_progress"), (22, "Ready"), (21, "Ready")):
+            await manager.publish({"type": "order_item_update", "payload": {
+                "action": "update", "order_id": 2, "order_item_id": order_item_id, "item_status": status
+            }}, ["order:2", "station:bar"])
+        await manager.publish({"type": "order_delete", "payload": {"action": "delete", "order_id": 2}}, ["order:2"])
+        await drain()
+
+        assert bar.websocket.sent == [
+            {"type": "order_items_update", "payload": {"action": "update", "order_id": 2, "items": [
+                {"order_item_id": 21, "item_status": "Ready"},
+                {"order_item_id": 22, "item_status": "Ready"},
+            ]}},
+            {"type": "order_delete", "payload": {"action": "delete", "order_id": 2}},
+        ]
+
+    # Тест: события одной сущности для разных адресатов не поглощают друг друга
+    @pytest.mark.asyncio
+    async def test_coalesce_window_keeps_events_for_different_routes(self):
+        manager = ConnectionManager(RecordingBackplane(), coalesce_window_ms=20)
+        client = await manager.connect("3", FakeWebSocket(), "Client")
+        cook = await manager.connect("4", FakeWebSocket(), "Cook")
+
+        message = {"type": "order_update", "payload": {"action": "update", "order": {"order_id": 7, "status": "Ready"}}}
+        await manager.send_json("3", message)
+        await manager.broadcast(message, roles={"Barkeeper", "Waiter", "Cook"})
+        await asyncio.sleep(0.05)
+        await drain()
+
+        assert [frame["payload"]["order"] for frame in client.websocket.sent] == [{"order_id": 7, "status": "Ready"}]
+        assert [frame["payload"]["order"] for frame in cook.websocket.sent] == [{"order_id": 7, "status": "Ready"}]
+        assert manager.stats()["merged"] == 0
+
+    # Тест дельты заказа: только изменившиеся поля заказа и позиций
+    def test_diff_order(self):
+        previous = {"order_id": 1, "status": "Pending", "comment": None, "items": [
+            {"order_item_id": 11, "item_id": 1, "status": "Pending"},
+            {"order_item_id": 12, "item_id": 2, "status": "Pending"},
+        ]}
+        current = {"order_id": 1, "status": "In_progress", "comment": None, "items": [
+            {"order_item_id": 11, "item_id": 1, "status": "Ready"},
+            {"order_item_id": 12, "item_id": 2, "status": "Pending"},
+            {"order_item_id": 13, "item_id": 3, "status": "Pending"},
+        ]}
+
+        delta = diff_order(previous, current)
+        assert delta == {
+            "changes": {"status": "In_progress"},
+            "items": {"11": {"status": "Ready"}, "13": {"order_item_id": 13, "item_id": 3, "status": "Pending"}},
+        }
+        assert apply_delta(previous, delta) == current
+
+    # Тест склейки последовательных версий и отказа при пропуске версии
+    def test_combine_order_events(self):
+        snapshot = {"type": "order_update", "payload": {"action": "update", "version": 1, "order": {
+            "order_id": 1, "status": "Pending", "items": [{"order_item_id": 11, "status": "Pending"}]
+        }}}
+        first = {"type": "order_delta", "payload": {
+            "action": "delta", "order_id": 1, "base_version": 1, "version": 2,
+            "changes": {"status": "In_progress"}, "items": {}
+        }}
+        second = {"type": "order_delta", "payload": {
+            "action": "delta", "order_id": 1, "base_version": 2, "version": 3,
+            "changes": {}, "items": {"11": {"status": "Ready"}}
+        }}
+
+        merged = combine_events(first, second)
+        assert merged["payload"]["base_version"] == 1 and merged["payload"]["version"] == 3
+        assert merged["payload"]["changes"] == {"status": "In_progress"}
+        assert merged["payload"]["items"] == {"11": {"status": "Ready"}}
+
+        applied = combine_events(snapshot, first)
+        assert applied["type"] == "order_update"
+        assert applied["payload"]["version"] == 2
+        assert applied["payload"]["order"]["status"] == "In_progress"
+
+        assert combine_events(snapshot, second) is None
+
+    # Тест окна объединения для дельт: последовательные версии уходят одной дельтой, пропуск - отдельными кадрами
+    @pytest.mark.asyncio
+    async def test_coalesce_window_merges_deltas(self):
+        manager = ConnectionManager(RecordingBackplane(), coalesce_window_ms=1000)
+        waiter = await manager.connect("1", FakeWebSocket(), "Waiter")
+
+        def delta(base_version, changes):
+            return {"type": "order_delta", "payload": {
+                "action": "delta", "order_id": 3, "base_version": base_version, "version": base_version + 1,
+                "changes": changes, "items": {}
+            }}
+
+        await manager.publish(delta(4, {"status": "In_progress"}), ["order:3"])
+        await manager.publish(delta(5, {"comment": "без лука"}), ["order:3"])
+        await manager.publish(delta(7, {"status": "Ready"}), ["order:3"])
+        await manager.coalescer.flush_all()
+        await drain()
+
+        assert [message["payload"]["base_version"] for message in waiter.websocket.sent] == [4, 7]
+        assert waiter.websocket.sent[0]["payload"]["version"] == 6
+        assert waiter.websocket.sent[0]["payload"]["changes"] == {"status": "In_progress", "comment": "без лука"}
+        assert manager.stats()["merged"] == 1
+
+    # Тест догрузки пропущенных событий с учетом роли и подписок сессии
+    @pytest.mark.asyncio
+    async def test_resume_replays_missed_events(self):
+        manager = ConnectionManager(RecordingBackplane(), coalesce_window_ms=0)
+        await manager.broadcast({"type": "shift_update", "payload": {"shift_id": 1}}, roles={"Cook"})
+        await manager.broadcast({"type": "menu_update", "payload": {"item_id": 2}}, roles={"Client"})
+        await manager.publish({"type": "order_delete", "payload": {"action": "delete", "order_id": 3}}, ["order:3", "station:kitchen"])
+        await manager.publish({"type": "order_delete", "payload": {"action": "delete", "order_id": 4}}, ["order:4", "station:bar"])
+
+        cook = await manager.connect("1", FakeWebSocket(), "Cook")
+        manager.subscribe(cook, ["station:kitchen"])
+        await manager.resume(cook, 0)
+        await drain()
+
+        assert cook.websocket.seqs == [1, 3]
+        assert [message["type"] for message in cook.websocket.sent] == ["shift_update", "order_delete"]
+        assert cook.websocket.control[-1] == {"type": "resumed", "payload": {"last_seq": 0, "replayed": 2}}
+
+        await manager.resume(cook, 4)
+        await drain()
+        assert cook.websocket.control[-1] == {"type": "resumed", "payload": {"last_seq": 4, "replayed": 0}}
+        assert manager.stats()["last_seq"] == 4 and manager.stats()["replayed"] == 2
+
+    # Тест полной пересинхронизации, если журнал уже не хранит пропущенные события
+    @pytest.mark.asyncio
+    async def test_resume_falls_back_to_resync(self):
+        manager = ConnectionManager(RecordingBackplane(), coalesce_window_ms=0, event_log=LocalEventLog(maxlen=2), replay_limit=10)
+        for shift_id in range(4):
+            await manager.broadcast({"type": "shift_update", "payload": {"shift_id": shift_id}})
+        waiter = await manager.connect("1", FakeWebSocket(), "Waiter")
+
+        await manager.resume(waiter, 1)
+        await manager.resume(waiter, 9)
+        await handle_event("1", {"type": "resume", "last_seq": -1}, waiter)
+        await manager.resume(waiter, 2)
+        await drain()
+
+        assert [message["type"] for message in waiter.websocket.control[1:]] == [
+            "resync_required", "resync_required", "error", "resumed"
+        ]
+        assert waiter.websocket.seqs == [3, 4]
+        assert manager.stats()["resyncs"] == 2
+
+    # Тест heartbeat: ping отвечающим сессиям, отключение сессий без ответа и простаивающих
+    @pytest.mark.asyncio
+    async def test_heartbeat_reaps_unresponsive_and_idle_sessions(self):
+        manager = ConnectionManager(RecordingBackplane(), ping_interval=20, pong_timeout=10, idle_timeout=600)
+        alive = await manager.connect("1", FakeWebSocket(), "Waiter")
+        silent = await manager.connect("2", FakeWebSocket(), "Cook")
+        idle = await manager.connect("3", FakeWebSocket(), "Barkeeper")
+        legacy = await manager.connect("4", FakeWebSocket(), "Cook")
+
+        await handle_event("2", {"type": "pong"}, silent)
+        silent.last_seen -= 31
+        idle.last_active -= 601
+        # Клиент, не знающий о pong, по heartbeat приложения не отключается
+        legacy.last_seen -= 31
+        await handle_event("1", {"type": "pong"}, alive)
+        await manager.check_heartbeats()
+        await drain()
+
+        assert [message["type"] for message in alive.websocket.control] == ["connected", "ping"]
+        assert [message["type"] for message in legacy.websocket.control] == ["connected", "ping"]
+        assert silent.websocket.closed == 1001 and idle.websocket.closed == 1001
+        assert legacy.websocket.closed is None
+        assert set(manager.registry.sessions) == {alive.session_id, legacy.session_id}
+        stats = manager.stats()
+        assert stats["reaped"] == 2 and stats["live"] == 2 and stats["total"] == 2
+
+        # pong не считается активностью пользователя для отключения по простою
+        alive.last_active -= 601
+        await handle_event("1", {"type": "pong"}, alive)
+        await manager.check_heartbeats()
+        assert alive.websocket.closed == 1001
+
+    # Тест ограничения числа сессий пользователя: при превышении закрывается самая старая
+    @pytest.mark.asyncio
+    async def test_max_sessions_per_user(self):
+        manager = ConnectionManager(RecordingBackplane(), max_sessions_per_user=2)
+        first = await manager.connect("1", FakeWebSocket(), "Waiter")
+        second = await manager.connect("1", FakeWebSocket(), "Waiter")
+        other = await manager.connect("2", FakeWebSocket(), "Waiter")
+        third = await manager.connect("1", FakeWebSocket(), "Waiter")
+
+        assert first.websocket.closed == 1008
+        assert {connection.session_id for connection in manager.registry.for_user("1")} == {second.session_id, third.session_id}
+        assert other.websocket.closed is None
+        assert manager.stats()["evicted"] == 1